@@ -0,0 +1,284 @@
+import re
+import os
+import json
+import time
+import zlib
+import struct
+import random
+import tempfile
+import threading
+import subprocess
+from urllib.parse import urlparse, parse_qs
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+# Canned text the fake sites and the fake OpenAI return
+PARAGRAPH = (
+	"Researchers presented a new chip design that processes language models directly on the phone. "
+	"The company says the battery lasts twice as long while answers arrive in a fraction of a second. "
+	"Critics point out that the benchmarks were run by the manufacturer itself and have not been verified."
+)
+SCRIPT = " ".join([
+	"Hast du dich schon mal gefragt, wie schnell dein Handy wirklich denken kann?",
+	"Ein neuer Chip bringt Sprachmodelle direkt auf dein Smartphone, ganz ohne Cloud.",
+	"Laut Hersteller hält der Akku dabei doppelt so lange und Antworten kommen fast sofort.",
+	"Unabhängige Tests fehlen allerdings noch, die Zahlen stammen vom Hersteller selbst.",
+] * 4)
+
+# The structure of the websites the scraper knows, every site gets a front page with links and article pages
+SITES = {
+	"techcrunch": {
+		"url": "https://techcrunch.com/",
+		"front": '<main>{links}</main>',
+		"link": '<a href="https://techcrunch.com/2026/10/18/story-{i}/">Story {i}</a>',
+		"article": '<main><p>{text}</p><p>{text}</p></main>',
+	},
+	"politico": {
+		"url": "https://www.politico.eu/",
+		"front": '<main id="main" class="main--front-page">{links}</main>',
+		"link": '<a href="https://www.politico.eu/article/story-{i}/">Story {i}</a>',
+		"article": '<main><p>{text}</p><p>{text}</p></main>',
+	},
+	"historydaily": {
+		"url": "https://www.historydaily.com/episodes/",
+		"front": '<div class="row-wrapper">{links}</div>',
+		"link": '<a href="https://www.historydaily.com/episodes/story-{i}">Story {i}</a>',
+		"article": '<a href="#transcript">Transcript</a><p>{text}</p><p>{text}</p>',
+	},
+	"neverendingfootsteps": {
+		"url": "https://www.neverendingfootsteps.com/travel-guides/",
+		"front": '<main class="vw-content-main">{links}</main>',
+		"link": '<a href="https://www.neverendingfootsteps.com/travel-guides/story-{i}/">Story {i}</a>',
+		"article": '<main><p>{text}</p><p>{text}</p></main>',
+	},
+}
+
+def make_png(width: int, height: int) -> bytes:
+	"""
+	A plain PNG with random colored rows, small enough to be generated for every request
+	:return: the PNG file
+	"""
+	def chunk(kind: bytes, data: bytes) -> bytes:
+		return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data) & 0xffffffff)
+
+	color = bytes(random.randrange(256) for _ in range(3))
+	raw = b"".join(b"\x00" + color * width for _ in range(height))
+	return (
+		b"\x89PNG\r\n\x1a\n"
+		+ chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0))
+		+ chunk(b"IDAT", zlib.compress(raw))
+		+ chunk(b"IEND", b"")
+	)
+
+class FakeServices:
+	"""
+	Local stand-ins for OpenAI, ElevenLabs, Stability, the scraped websites and the YouTube upload,
+	all served by one HTTP server with a configurable latency per service
+	"""
+	def __init__(self, latency: dict = None, links_per_site: int = 20) -> None:
+		"""
+		:param latency: seconds every service waits before it answers, e.g. {"openai": 0.8}
+		:param links_per_site: how many article links every fake front page has
+		"""
+		self.latency = {"openai": 0.0, "elevenlabs": 0.0, "stability": 0.0, "sites": 0.0, "youtube": 0.0}
+		self.latency.update(latency or {})
+		self.links_per_site = links_per_site
+		self.requests = {name: 0 for name in self.latency}
+		self._lock = threading.Lock()
+		self._audio_dir = tempfile.mkdtemp(prefix="fake_elevenlabs_")
+		self._audio = {}
+		self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._make_handler())
+		self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+	@property
+	def base_url(self) -> str:
+		return f"http://127.0.0.1:{self._server.server_address[1]}"
+
+	def start(self) -> None:
+		self._thread.start()
+
+	def stop(self) -> None:
+		self._server.shutdown()
+		self._server.server_close()
+
+	def environment(self) -> dict:
+		"""
+		Environment variables that point main.py to the fakes
+		:return: dict of environment variables
+		"""
+		return {
+			"OPENAI_API_KEY": "fake",
+			"OPENAI_BASE_URL": f"{self.base_url}/v1",
+			"ELEVEN_LABS_API_1": "fake",
+			"ELEVEN_LABS_BASE_URL": self.base_url,
+			"STABLE_DIFFUSION_API_KEY": "fake",
+			"STABILITY_API_HOST": self.base_url,
+			"YOUTUBE_API_ENDPOINT": f"{self.base_url}/youtube/v3/",
+			"SHORTAUTOMATION_SITE_OVERRIDES": json.dumps({site["url"]: f"{self.base_url}/sites/{name}/" for name, site in SITES.items()}),
+		}
+
+	def _wait(self, service: str) -> None:
+		with self._lock:
+			self.requests[service] += 1
+		time.sleep(self.latency[service])
+
+	def speech(self, text: str) -> bytes:
+		"""
+		An MP3 with a sine tone that is as long as a speaker would need for the text
+		:param text: the text to speak
+		:return: the MP3 file
+		"""
+		seconds = max(1, round(len(text) / 15))
+		with self._lock:
+			path = self._audio.get(seconds)
+		if path is None:
+			path = os.path.join(self._audio_dir, f"{seconds}.mp3")
+			subprocess.run(
+				["ffmpeg", "-y", "-f", "lavfi", "-i", f"sine=frequency=220:duration={seconds}", "-c:a", "libmp3lame", "-q:a", "6", path],
+				stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True
+			)
+			with self._lock:
+				self._audio[seconds] = path
+		with open(path, "rb") as file:
+			return file.read()
+
+	def completion(self, body: dict) -> str:
+		"""
+		The canned answer to a chat completion, depending on what the prompt asks for
+		:param body: the request body
+		:return: the content of the answer
+		"""
+		prompt = body["messages"][-1]["content"]
+		wanted_prompts = re.search(r"(\d+) vivid", prompt)
+
+		# Structured answers have the properties of their schema
+		if body.get("response_format", {}).get("type") == "json_schema":
+			properties = body["response_format"]["json_schema"]["schema"]["properties"]
+			answer = {"script": SCRIPT, "title": "Neuer Chip bringt KI direkt aufs Handy"}
+			if wanted_prompts:
+				answer["image_prompts"] = [f"A glowing microchip floating above a city at night, scene {i}" for i in range(int(wanted_prompts.group(1)))]
+			return json.dumps({name: answer[name] for name in properties})
+		if wanted_prompts:
+			return "|".join(f"A glowing microchip floating above a city at night, scene {i}" for i in range(int(wanted_prompts.group(1))))
+		if "Überschrift" in prompt:
+			return "Neuer Chip bringt KI direkt aufs Handy"
+		return SCRIPT
+
+	def _make_handler(self):
+		services = self
+
+		class Handler(BaseHTTPRequestHandler):
+			protocol_version = "HTTP/1.1"
+
+			def log_message(self, format, *args) -> None:
+				pass
+
+			def _send(self, status: int, body: bytes, content_type: str, headers: dict = None) -> None:
+				self.send_response(status)
+				self.send_header("Content-Type", content_type)
+				self.send_header("Content-Length", str(len(body)))
+				for key, value in (headers or {}).items():
+					self.send_header(key, value)
+				self.end_headers()
+				self.wfile.write(body)
+
+			def _body(self) -> bytes:
+				length = int(self.headers.get("Content-Length") or 0)
+				return self.rfile.read(length) if length else b""
+
+			def do_GET(self) -> None:
+				path = urlparse(self.path).path
+
+				# ElevenLabs quota of the API key
+				if path == "/v1/user/subscription":
+					services._wait("elevenlabs")
+					quota = {"tier": "free", "character_count": 0, "character_limit": 100000, "next_character_count_reset_unix": int(time.time()) + 30 * 86400}
+					self._send(200, json.dumps(quota).encode(), "application/json")
+					return
+				match = re.match(r"/sites/(\w+)/(.*)", path)
+				if not match or match.group(1) not in SITES:
+					self._send(404, b"not found", "text/plain")
+					return
+				services._wait("sites")
+				site = SITES[match.group(1)]
+				if match.group(2) in ("", "/"):
+					links = "".join(site["link"].format(i=i) for i in range(services.links_per_site))
+					html = site["front"].format(links=links)
+				else:
+					# Every story has its own text, otherwise the duplicate check of the scraper keeps only one of them
+					words = PARAGRAPH.split()
+					random.Random(path).shuffle(words)
+					html = site["article"].format(text=" ".join(words))
+				body = f"<html><body>{html}</body></html>".encode()
+
+				# Pages are revalidated like on the real websites
+				etag = f'"{zlib.crc32(body):08x}"'
+				if self.headers.get("If-None-Match") == etag:
+					self._send(304, b"", "text/html; charset=utf-8", {"ETag": etag})
+					return
+				self._send(200, body, "text/html; charset=utf-8", {"ETag": etag})
+
+			def do_POST(self) -> None:
+				url = urlparse(self.path)
+				body = self._body()
+
+				# OpenAI chat completions, streamed ones send the first piece after a fifth of the latency and the rest over the remaining time
+				if url.path.endswith("/chat/completions") and json.loads(body).get("stream"):
+					request = json.loads(body)
+					with services._lock:
+						services.requests["openai"] += 1
+					latency = services.latency["openai"]
+					time.sleep(latency / 5)
+					content = services.completion(request)
+					pieces = [content[i:i + 20] for i in range(0, len(content), 20)]
+					self.send_response(200)
+					self.send_header("Content-Type", "text/event-stream")
+					self.send_header("Connection", "close")
+					self.end_headers()
+					for piece in pieces:
+						chunk = {"id": "chatcmpl-fake", "object": "chat.completion.chunk", "created": int(time.time()), "model": request["model"],
+							"choices": [{"index": 0, "delta": {"content": piece}, "finish_reason": None}]}
+						self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode())
+						self.wfile.flush()
+						time.sleep(latency * 4 / 5 / len(pieces))
+					usage = {"id": "chatcmpl-fake", "object": "chat.completion.chunk", "created": int(time.time()), "model": request["model"], "choices": [],
+						"usage": {"prompt_tokens": len(json.dumps(request["messages"])) // 4, "completion_tokens": len(content) // 4, "total_tokens": 0}}
+					self.wfile.write(f"data: {json.dumps(usage)}\n\ndata: [DONE]\n\n".encode())
+					self.wfile.flush()
+					self.close_connection = True
+				elif url.path.endswith("/chat/completions"):
+					services._wait("openai")
+					request = json.loads(body)
+					content = services.completion(request)
+					answer = {
+						"id": "chatcmpl-fake", "object": "chat.completion", "created": int(time.time()), "model": request["model"],
+						"choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+						"usage": {"prompt_tokens": len(json.dumps(request["messages"])) // 4, "completion_tokens": len(content) // 4, "total_tokens": 0},
+					}
+					self._send(200, json.dumps(answer).encode(), "application/json")
+
+				# ElevenLabs text to speech
+				elif url.path.startswith("/v1/text-to-speech/"):
+					services._wait("elevenlabs")
+					self._send(200, services.speech(json.loads(body)["text"]), "audio/mpeg")
+
+				# Stability image generation
+				elif url.path.endswith("/stable-image/generate/core"):
+					services._wait("stability")
+					self._send(200, make_png(288, 512), "image/png")
+
+				# YouTube resumable upload, first the metadata then the video with a PUT
+				elif url.path.endswith("/videos"):
+					services._wait("youtube")
+					if "resumable" in parse_qs(url.query).get("uploadType", []):
+						self._send(200, b"", "application/json", {"Location": f"{services.base_url}/youtube/session/{random.randrange(10**9)}"})
+					else:
+						self._send(200, json.dumps({"id": "fake-video", "kind": "youtube#video"}).encode(), "application/json")
+				else:
+					self._send(404, b"not found", "text/plain")
+
+			def do_PUT(self) -> None:
+				self._body()
+				services._wait("youtube")
+				self._send(200, json.dumps({"id": "fake-video", "kind": "youtube#video"}).encode(), "application/json")
+
+		return Handler
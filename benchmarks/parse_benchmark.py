@@ -0,0 +1,163 @@
+import sys
+import time
+import argparse
+import tracemalloc
+import statistics
+import urllib.request
+from pathlib import Path
+from colorama import Fore, Style, init
+from benchmarks.fake_services import SITES, PARAGRAPH
+from info_gathering.site_adapters import load_adapters, find_links
+
+# Initialize colorama
+init()
+
+# What the scraper does with every kind of page, the saved pages are named <site>_<kind>[_anything].html
+ADAPTERS = load_adapters()
+KINDS = {
+	"front": lambda site, html, **parse: ADAPTERS[site].find_links(html, **parse),
+	"episode": lambda site, html, **parse: ADAPTERS[site].passes(html, **parse),
+	"article": lambda site, html, **parse: ADAPTERS[site].find_paragraphs(html, **parse),
+	"links": lambda site, html, **parse: find_links(html, **parse),
+}
+
+# The way the scraper parsed every page before, the other variants have to return the same
+BASELINE = ("full page, html.parser", {"strained": False, "parser": "html.parser"})
+
+def variants() -> list[tuple[str, dict]]:
+	"""
+	The parse variants that are compared, lxml only if it is installed
+	"""
+	result = [BASELINE, ("strained, html.parser", {"strained": True, "parser": "html.parser"})]
+	try:
+		import lxml  # noqa: F401
+		result.append(("strained, lxml", {"strained": True, "parser": "lxml"}))
+	except ImportError:
+		print(Fore.YELLOW + "\nlxml is not installed, only html.parser is measured." + Style.RESET_ALL)
+	return result
+
+def boilerplate(links: int) -> tuple[str, str]:
+	"""
+	Head, navigation and footer like on the real websites, most of a real page is not the part the scraper needs
+	:return: (everything before the content, everything after it)
+	"""
+	head = "".join(f'<script src="/static/bundle_{i}.js"></script><link rel="stylesheet" href="/static/style_{i}.css">' for i in range(30))
+	script = "<script>" + "window.__STATE__ = {" + ",".join(f'"k{i}": "{"x" * 40}"' for i in range(400)) + "};</script>"
+	navigation = "<nav><ul>" + "".join(f'<li class="menu-item"><a href="/section/{i}/">Section {i}</a></li>' for i in range(links)) + "</ul></nav>"
+	footer = "<footer>" + "".join(f'<div class="col"><span>Footer {i}</span><a href="/about/{i}">About</a></div>' for i in range(links)) + "</footer>"
+	return f"<!DOCTYPE html><html><head>{head}{script}</head><body>{navigation}<div class=\"layout\">", f"</div>{footer}</body></html>"
+
+def generated_pages() -> list[tuple[str, str, str]]:
+	"""
+	Pages of the fake websites of the benchmark with realistic boilerplate around them
+	:return: list of (site, kind, html)
+	"""
+	before, after = boilerplate(300)
+	pages = []
+	for name, site in SITES.items():
+		links = "".join(site["link"].format(i=i) for i in range(40))
+		pages.append((name, "front", before + site["front"].format(links=links) + after))
+		pages.append((name, "article", before + site["article"].format(text=PARAGRAPH * 3) + after))
+	pages.append(("historydaily", "episode", before + SITES["historydaily"]["article"].format(text=PARAGRAPH) + after))
+	pages.append(("neverendingfootsteps", "links", before + SITES["neverendingfootsteps"]["article"].format(text=PARAGRAPH) + after))
+	return pages
+
+def saved_pages(directory: Path) -> list[tuple[str, str, str]]:
+	"""
+	Pages saved with --fetch or by hand, named <site>_<kind>[_anything].html
+	:return: list of (site, kind, html)
+	"""
+	pages = []
+	for path in sorted(directory.glob("*.html")):
+		site, _, rest = path.stem.partition("_")
+		kind = rest.split("_")[0]
+		if site in ADAPTERS and kind in KINDS:
+			pages.append((site, kind, path.read_text(errors="replace")))
+		else:
+			print(Fore.YELLOW + f"\nSkipping {path.name}, the name must be <site>_<kind>.html with a site of {sorted(ADAPTERS)} and a kind of {sorted(KINDS)}" + Style.RESET_ALL)
+	return pages
+
+def fetch_pages(directory: Path) -> None:
+	"""
+	Save the live front page and the first articles of every website for the benchmark
+	:param directory: where the pages are saved
+	:return:
+	"""
+	directory.mkdir(parents=True, exist_ok=True)
+
+	def download(url: str) -> str:
+		request = urllib.request.Request(url, headers={"User-Agent": "Mozilla/5.0"})
+		with urllib.request.urlopen(request, timeout=20) as response:
+			return response.read().decode(response.headers.get_content_charset() or "utf-8", errors="replace")
+
+	for name, adapter in ADAPTERS.items():
+		try:
+			front = download(adapter.front_page_url())
+			(directory / f"{name}_front.html").write_text(front)
+			for i, sublink in enumerate(adapter.find_links(front)[:2]):
+				article = download(sublink)
+				(directory / f"{name}_{'episode' if adapter.require else 'article'}_{i}.html").write_text(article)
+				if adapter.follows_random_link:
+					(directory / f"{name}_links_{i}.html").write_text(article)
+			print(Fore.GREEN + f"\nSaved the pages of {name}" + Style.RESET_ALL)
+		except OSError as e:
+			print(Fore.RED + f"\nCould not save the pages of {name}: {e}" + Style.RESET_ALL)
+
+def measure(extract, site: str, html: str, repeat: int, parse: dict) -> tuple[float, float, object]:
+	"""
+	Time the extraction and measure the peak memory of one extraction
+	:return: (median milliseconds, peak megabytes, result)
+	"""
+	times = []
+	for _ in range(repeat):
+		start = time.perf_counter()
+		result = extract(site, html, **parse)
+		times.append((time.perf_counter() - start) * 1000)
+	tracemalloc.start()
+	extract(site, html, **parse)
+	_, peak = tracemalloc.get_traced_memory()
+	tracemalloc.stop()
+	return statistics.median(times), peak / (1024 * 1024), result
+
+def main() -> None:
+	parser = argparse.ArgumentParser(description="Parse time and peak memory per page of the scraper with every parse variant")
+	parser.add_argument("--pages", help="directory with saved pages named <site>_<kind>.html, generated pages if not given")
+	parser.add_argument("--fetch", action="store_true", help="first save the live pages of every website into --pages")
+	parser.add_argument("--repeat", type=int, default=20, help="how often every page is parsed per variant")
+	options = parser.parse_args()
+
+	if options.fetch:
+		if not options.pages:
+			parser.error("--fetch needs --pages")
+		fetch_pages(Path(options.pages).expanduser())
+	pages = saved_pages(Path(options.pages).expanduser()) if options.pages else generated_pages()
+	if not pages:
+		print(Fore.RED + "\nNo pages to parse." + Style.RESET_ALL)
+		sys.exit(1)
+
+	compared = variants()
+	different = False
+	print(f"\n{'page':<34}{'KB':>8}" + "".join(f"{name:>28}" for name, _ in compared))
+	totals = {name: 0.0 for name, _ in compared}
+	for site, kind, html in pages:
+		row = f"{site + ' ' + kind:<34}{len(html.encode()) / 1024:>8.0f}"
+		baseline_result = None
+		for name, parse in compared:
+			ms, peak_mb, result = measure(KINDS[kind], site, html, options.repeat, parse)
+			totals[name] += ms
+			if baseline_result is None:
+				baseline_result = result
+			elif result != baseline_result:
+				different = True
+				row += Fore.RED
+			row += f"{f'{ms:.2f} ms {peak_mb:.1f} MB':>28}" + Style.RESET_ALL
+		print(row)
+
+	print(f"{'total':<42}" + "".join(f"{f'{totals[name]:.2f} ms':>28}" for name, _ in compared))
+	if different:
+		print(Fore.RED + "\nThe red variants extracted something else than the full page with html.parser." + Style.RESET_ALL)
+		sys.exit(1)
+	print(Fore.GREEN + "\nEvery variant extracted the same links and paragraphs as the full page with html.parser." + Style.RESET_ALL)
+
+if __name__ == "__main__":
+	main()
@@ -0,0 +1,209 @@
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import resource
+import tempfile
+import statistics
+import subprocess
+from pathlib import Path
+from colorama import Fore, Style, init
+from benchmarks.fake_services import FakeServices, SITES
+
+# Initialize colorama
+init()
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+
+def parse_latency(value: str) -> dict:
+	"""
+	Parse --latency openai=0.8,elevenlabs=1.5 into a dict
+	:param value: the option value
+	:return: seconds per service
+	"""
+	latency = {}
+	for part in filter(None, value.split(",")):
+		service, _, seconds = part.partition("=")
+		latency[service.strip()] = float(seconds)
+	return latency
+
+def read_spans(trace_path: Path) -> list[dict]:
+	"""
+	Read a trace of main.py and turn complete and async events into spans with a duration in milliseconds
+	:param trace_path: path of the trace
+	:return: list of spans with name, cat, ms and args
+	"""
+	with open(trace_path, "r") as file:
+		events = json.load(file)["traceEvents"]
+	spans = []
+	begins = {}
+	for event in events:
+		if event["ph"] == "X":
+			spans.append({"name": event["name"], "cat": event["cat"], "ms": event["dur"] / 1000, "args": event.get("args", {})})
+		elif event["ph"] == "b":
+			begins[event["id"]] = event
+		elif event["ph"] == "e" and event["id"] in begins:
+			begin = begins.pop(event["id"])
+			spans.append({"name": begin["name"], "cat": begin["cat"], "ms": (event["ts"] - begin["ts"]) / 1000, "args": begin.get("args", {})})
+	return spans
+
+def run_once(site: str, env: dict, work_dir: Path, index: int) -> dict:
+	"""
+	Run the real main.py once in the headless mode against the fakes
+	:param site: website to scrape
+	:param env: environment with the fake endpoints
+	:param work_dir: directory for the output and the trace
+	:param index: number of the run
+	:return: wall time, CPU time, peak RSS and the spans of the run
+	"""
+	output_dir = work_dir / f"run_{index}"
+	trace_path = work_dir / f"trace_{index}.json"
+	command = [
+		sys.executable, "main.py", str(output_dir), "firefox", "fake_german.json", "fake_english.json", site,
+		"--headless", "--trace", str(trace_path)
+	]
+
+	# Every run starts with an empty story index, otherwise the duplicate check skips the stories of the runs before,
+	# and with an empty LLM cache, otherwise the runs after the first one measure no completion at all
+	env = {
+		**env,
+		"SHORTAUTOMATION_STORY_INDEX": str(work_dir / f"stories_{index}.sqlite"),
+		"SHORTAUTOMATION_LLM_CACHE_DIR": str(work_dir / f"llm_cache_{index}"),
+	}
+
+	# The benchmark is the only parent of main.py, so the usage of all reaped children belongs to this run
+	before = resource.getrusage(resource.RUSAGE_CHILDREN)
+	start = time.perf_counter()
+	result = subprocess.run(command, cwd=REPO_ROOT, env=env, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True)
+	wall = time.perf_counter() - start
+	after = resource.getrusage(resource.RUSAGE_CHILDREN)
+	if result.returncode != 0:
+		print(Fore.RED + f"\nRun {index} failed with exit code {result.returncode}:\n{result.stdout[-3000:]}" + Style.RESET_ALL)
+		return None
+
+	return {
+		"wall_s": wall,
+		"cpu_s": (after.ru_utime + after.ru_stime) - (before.ru_utime + before.ru_stime),
+		"peak_rss_mb": after.ru_maxrss / 1024,
+		"spans": read_spans(trace_path),
+	}
+
+def summarize(runs: list[dict]) -> dict:
+	"""
+	Aggregate the runs into per stage, per external call and end to end numbers
+	:param runs: the results of run_once
+	:return: the report
+	"""
+	stages = {}
+	calls = {}
+	for run in runs:
+		per_call = {}
+		for span in run["spans"]:
+			if span["cat"] == "stage":
+				stage = stages.setdefault(span["name"], {"ms": [], "child_cpu_s": [], "peak_rss_kb": 0})
+				stage["ms"].append(span["ms"])
+				stage["child_cpu_s"].append(span["args"].get("child_cpu_s", 0))
+				stage["peak_rss_kb"] = max(stage["peak_rss_kb"], span["args"].get("peak_rss_kb", 0))
+			elif span["cat"] in ("api", "subprocess"):
+				call = per_call.setdefault(span["name"], {"count": 0, "ms": 0.0})
+				call["count"] += 1
+				call["ms"] += span["ms"]
+		for name, call in per_call.items():
+			total = calls.setdefault(name, {"count": [], "ms": []})
+			total["count"].append(call["count"])
+			total["ms"].append(call["ms"])
+
+	return {
+		"runs": len(runs),
+		"end_to_end": {
+			"wall_s_mean": statistics.mean(run["wall_s"] for run in runs),
+			"wall_s_min": min(run["wall_s"] for run in runs),
+			"wall_s_max": max(run["wall_s"] for run in runs),
+			"cpu_s_mean": statistics.mean(run["cpu_s"] for run in runs),
+			"peak_rss_mb": max(run["peak_rss_mb"] for run in runs),
+		},
+		"stages": {
+			name: {
+				"ms_mean": statistics.mean(stage["ms"]),
+				"ms_min": min(stage["ms"]),
+				"ms_max": max(stage["ms"]),
+				"child_cpu_s_mean": statistics.mean(stage["child_cpu_s"]),
+				"peak_rss_kb": stage["peak_rss_kb"],
+			}
+			for name, stage in stages.items()
+		},
+		"calls": {
+			name: {"count_mean": statistics.mean(call["count"]), "total_ms_mean": statistics.mean(call["ms"])}
+			for name, call in calls.items()
+		},
+	}
+
+def print_report(report: dict) -> None:
+	"""
+	Print the report as tables
+	:param report: the result of summarize
+	:return:
+	"""
+	end_to_end = report["end_to_end"]
+	print(Fore.GREEN + f"\nEnd to end over {report['runs']} run(s): {end_to_end['wall_s_mean']:.2f}s mean "
+		f"({end_to_end['wall_s_min']:.2f}s - {end_to_end['wall_s_max']:.2f}s), "
+		f"{end_to_end['cpu_s_mean']:.2f}s CPU, {end_to_end['peak_rss_mb']:.0f} MB peak RSS" + Style.RESET_ALL)
+
+	print(f"\n{'stage':<24}{'mean ms':>12}{'min ms':>12}{'max ms':>12}{'child cpu s':>14}{'peak rss MB':>14}")
+	for name, stage in sorted(report["stages"].items(), key=lambda item: -item[1]["ms_mean"]):
+		print(f"{name:<24}{stage['ms_mean']:>12.0f}{stage['ms_min']:>12.0f}{stage['ms_max']:>12.0f}{stage['child_cpu_s_mean']:>14.2f}{stage['peak_rss_kb'] / 1024:>14.0f}")
+
+	print(f"\n{'external call':<28}{'calls':>8}{'total ms':>12}")
+	for name, call in sorted(report["calls"].items(), key=lambda item: -item[1]["total_ms_mean"]):
+		print(f"{name:<28}{call['count_mean']:>8.0f}{call['total_ms_mean']:>12.0f}")
+
+def main() -> None:
+	parser = argparse.ArgumentParser(description="Benchmark the whole main.py pipeline against local stand-ins of every external API")
+	parser.add_argument("--runs", type=int, default=3, help="how often the pipeline runs")
+	parser.add_argument("--site", default="techcrunch", choices=sorted(SITES), help="which fake website is scraped")
+	parser.add_argument("--latency", type=parse_latency, default={}, help="seconds per service, e.g. openai=0.8,elevenlabs=1.5,stability=3,sites=0.1,youtube=0.5")
+	parser.add_argument("--output", help="also write the report as JSON to this file")
+	parser.add_argument("--keep", action="store_true", help="keep the traces and outputs of the runs")
+	options = parser.parse_args()
+
+	# Start the fakes and point main.py to them, whisper runs on the CPU with the smallest model unless set otherwise
+	services = FakeServices(options.latency)
+	services.start()
+	env = dict(os.environ)
+	env.update(services.environment())
+	env.setdefault("WHISPER_DEVICE", "cpu")
+	env.setdefault("WHISPER_MODEL", "tiny")
+	work_dir = Path(tempfile.mkdtemp(prefix="shortautomation_bench_"))
+
+	# The page cache is shared by the runs but not with real scrapes, the first run downloads the pages and the others use the cache
+	env.setdefault("SHORTAUTOMATION_HTTP_CACHE_DIR", str(work_dir / "http_cache"))
+	env.setdefault("SHORTAUTOMATION_LLM_DIR", str(work_dir / "llm"))
+
+	try:
+		runs = []
+		for index in range(options.runs):
+			print(Fore.GREEN + f"\nBenchmark run {index + 1} of {options.runs}..." + Style.RESET_ALL)
+			result = run_once(SITES[options.site]["url"], env, work_dir, index)
+			if result is not None:
+				runs.append(result)
+	finally:
+		services.stop()
+		if not options.keep:
+			shutil.rmtree(work_dir, ignore_errors=True)
+
+	if not runs:
+		print(Fore.RED + "\nNo run finished, nothing to report." + Style.RESET_ALL)
+		sys.exit(1)
+	report = summarize(runs)
+	report["latency"] = services.latency
+	report["requests"] = services.requests
+	print_report(report)
+	if options.output:
+		with open(options.output, "w") as file:
+			json.dump(report, file, indent=1)
+		print(Fore.GREEN + f"\nReport written to {options.output}" + Style.RESET_ALL)
+
+if __name__ == "__main__":
+	main()
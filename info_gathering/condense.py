@@ -0,0 +1,147 @@
+import os
+import re
+from collections import Counter
+from colorama import Fore, Style
+
+# The scraped text is condensed before it is sent to the LLM: boilerplate and repeated paragraphs are removed and the rest
+# is cut to a token budget by keeping the most informative sentences
+TOKEN_BUDGET_ENV = "SHORTAUTOMATION_TOKEN_BUDGET"
+DEFAULT_TOKEN_BUDGET = 1200
+
+# Paragraphs of the website around the article: cookie banners, newsletter and social media blurbs, teasers, ads.
+# The phrases are calls to the reader that news text does not use, so "Meta updated its privacy policy" or
+# "Netflix added 5 million subscribers" stay. A paragraph is only dropped if it is short, so it is mostly the phrase
+BOILERPLATE = re.compile(
+	r"\b(?:we use cookies|(?:accept|allow|manage|reject) (?:all )?cookies|cookie (?:settings|policy|preferences|consent)|"
+	r"(?:subscribe|sign up) (?:to|for) (?:our|the) newsletter|all rights reserved|log in to (?:continue|comment|read)|"
+	r"follow us on|share this (?:article|story|post)|click here|(?:read|see|view|accept|agree to) (?:our|the) (?:privacy policy|terms of (?:use|service)|terms and conditions)|"
+	r"enable javascript|your browser (?:is|does)|newsletter abonnieren|jetzt abonnieren|datenschutzerklärung|alle rechte vorbehalten)\b",
+	re.IGNORECASE
+)
+BOILERPLATE_MAX_WORDS = 25
+
+# Teasers and labels start with these, e.g. "Read more: ..." or "© 2026 ..."
+BOILERPLATE_START = re.compile(
+	r"(?:(?:read more|related (?:articles?|stories)|recommended for you|you may also like|advertisement|sponsored|"
+	r"lesen sie auch|weiterlesen|mehr zum thema|anzeige|werbung)\b|related:|©|\(c\)\s*\d{4})",
+	re.IGNORECASE
+)
+
+STOPWORDS = set("""
+a an and are as at be been but by for from has have he her his i if in into is it its of on or our she so than that the their them
+then there these they this to was we were what when which who will with would you your about after also can could do does more
+most not now only other over said says some such up very just like new one two der die das und ist in zu den von mit sich des auf
+für nicht ein eine als auch es an werden aus er hat dass sie nach wird bei einer um am sind noch wie einem über einen so zum war
+""".split())
+
+try:
+	import tiktoken
+	_encoding = tiktoken.get_encoding("o200k_base")
+
+	def count_tokens(text: str) -> int:
+		return len(_encoding.encode(text))
+except ImportError:
+	def count_tokens(text: str) -> int:
+		# About four characters per token for english and german text
+		return (len(text) + 3) // 4
+
+def token_budget(budget: int = None) -> int:
+	"""
+	The token budget of the scraped text, the given one, $SHORTAUTOMATION_TOKEN_BUDGET or 1200
+	"""
+	if budget is not None:
+		return budget
+	return int(os.environ.get(TOKEN_BUDGET_ENV) or DEFAULT_TOKEN_BUDGET)
+
+def _normalize(text: str) -> str:
+	return " ".join(re.findall(r"\w+", text.lower()))
+
+def strip_boilerplate(paragraphs: list[str]) -> list[str]:
+	"""
+	Remove boilerplate, paragraphs that are too short to say anything and paragraphs that were already seen
+	:param paragraphs: the scraped paragraphs
+	:return: the paragraphs of the articles
+	"""
+	kept = []
+	seen = set()
+	for paragraph in paragraphs:
+		paragraph = paragraph.strip()
+		normalized = _normalize(paragraph)
+		words = normalized.split()
+		if len(words) < 6 or normalized in seen:
+			continue
+		if (BOILERPLATE_START.match(paragraph) or BOILERPLATE.search(paragraph)) and len(words) <= BOILERPLATE_MAX_WORDS:
+			continue
+		seen.add(normalized)
+		kept.append(paragraph)
+	return kept
+
+def _sentences(paragraph: str) -> list[str]:
+	return [sentence.strip() for sentence in re.split(r"(?<=[.!?])\s+(?=[A-ZÄÖÜ0-9\"'])", paragraph) if sentence.strip()]
+
+def keep_informative(paragraphs: list[str], budget: int) -> list[str]:
+	"""
+	Keep the most informative sentences that fit into the budget, in their original order.
+	A sentence is informative if its content words are frequent in the whole text, the first sentence of a paragraph gets a bonus.
+	:param paragraphs: the paragraphs without boilerplate
+	:param budget: the token budget
+	:return: the paragraphs with only the kept sentences
+	"""
+	sentences = [(p, s, sentence) for p, paragraph in enumerate(paragraphs) for s, sentence in enumerate(_sentences(paragraph))]
+	frequencies = Counter(word for _, _, sentence in sentences for word in _normalize(sentence).split() if word not in STOPWORDS and len(word) > 2)
+
+	def score(item: tuple[int, int, str]) -> float:
+		_, s, sentence = item
+		words = [word for word in _normalize(sentence).split() if word not in STOPWORDS and len(word) > 2]
+		if not words:
+			return 0.0
+		return sum(frequencies[word] for word in words) / len(words) ** 0.5 * (1.5 if s == 0 else 1.0)
+
+	kept = set()
+	used = 0
+	for item in sorted(sentences, key=score, reverse=True):
+		tokens = count_tokens(item[2]) + 1
+		if used + tokens > budget:
+			continue
+		kept.add(item)
+		used += tokens
+
+	result = {}
+	for item in sentences:
+		if item in kept:
+			result.setdefault(item[0], []).append(item[2])
+	return [" ".join(result[p]) for p in sorted(result)]
+
+def _truncate(text: str, budget: int) -> str:
+	"""
+	The first words of the text that fit into the budget
+	"""
+	kept = []
+	used = 0
+	for word in text.split(" "):
+		used += count_tokens(word) + 1
+		if used > budget:
+			break
+		kept.append(word)
+	return " ".join(kept)
+
+def condense(scraped_text: str, budget: int = None) -> str:
+	"""
+	Condense the scraped text for the LLM
+	:param scraped_text: the text of Scraper.scrape, one paragraph per line
+	:param budget: the token budget, see token_budget
+	:return: the condensed text
+	:raises ValueError: if the scraped text has no words at all
+	"""
+	budget = token_budget(budget)
+	lines = [line.strip() for line in scraped_text.splitlines() if line.strip()]
+	if not lines:
+		raise ValueError(Fore.RED + "\nThe scraped text is empty, there is nothing to write a script about." + Style.RESET_ALL)
+	# Pages of lists or captions have only short paragraphs, they are sent as they are instead of nothing
+	paragraphs = strip_boilerplate(lines) or lines
+	text = "\n".join(paragraphs)
+	if count_tokens(text) > budget:
+		# If not even one sentence fits, the start of the text is sent
+		text = "\n".join(keep_informative(paragraphs, budget)) or _truncate(text, budget)
+	print(Fore.GREEN + f"\nCondensed the scraped text from {count_tokens(scraped_text)} to {count_tokens(text)} tokens (budget {budget})." + Style.RESET_ALL)
+	return text
@@ -1,67 +1,221 @@
 from concurrent.futures.thread import ThreadPoolExecutor
-from typing import overload
-from openai import OpenAI
 from dotenv import load_dotenv
 from colorama import Fore, Style
 import os
+import re
+import json
+from pipeline.console import console_lock
+from pipeline import llm, tracing
 
 # Load environment variables from .env file
 load_dotenv()
 
+# The script, its title and the image prompts come from one structured answer per language. About 150 words are about
+# 60 seconds of voice, the visuals need one image per 3 seconds plus 2, so a few more prompts than that are asked for
+IMAGE_PROMPTS = 24
+
+# A streamed script goes to the voice in pieces of whole sentences with at least this many characters
+MIN_SENTENCE_CHARS = 40
+SENTENCE_END = re.compile(r'[.!?…]+["\'»«“”)\]]*\s+')
+
+def split_sentences(text: str) -> tuple[list[str], str]:
+	"""
+	Split the complete sentences off a text that is still generated, a sentence is complete once whitespace follows it
+	:param text: the text so far
+	:return: (the complete sentences, joined to pieces of at least MIN_SENTENCE_CHARS, the rest of the text)
+	"""
+	pieces = []
+	start = 0
+	for match in SENTENCE_END.finditer(text):
+		if match.end() - start >= MIN_SENTENCE_CHARS:
+			pieces.append(text[start:match.end()].strip())
+			start = match.end()
+	return pieces, text[start:]
+
+def extras_path(script_path: str) -> str:
+	"""
+	The file next to a script with the title and the image prompts of its answer, script_english.txt -> script_english.json
+	"""
+	return os.path.splitext(os.path.expanduser(script_path))[0] + ".json"
+
+def read_extras(script_path: str) -> dict:
+	"""
+	The title and the image prompts generated with a script
+	:param script_path: path of the script
+	:return: dict with title and image_prompts, empty if there is no valid file
+	"""
+	try:
+		with open(extras_path(script_path), "r") as file:
+			extras = json.load(file)
+	except (OSError, ValueError):
+		return {}
+	return extras if isinstance(extras, dict) else {}
+
 class GPTCaller:
-	def __init__(self, default_paths: list[str], languages: list[str]) -> None:
+	def __init__(self, default_paths: list[str], languages: list[str], auto_accept: bool = False, image_prompts: bool = False, speculate=None) -> None:
+		"""
+		:param default_paths: where the script of every language is saved, the title and image prompts go next to it (see extras_path)
+		:param languages: the language of every script
+		:param auto_accept: accept the first script of every language without asking (headless mode)
+		:param image_prompts: also generate the image prompts of the visuals with the scripts
+		:param speculate: called with every answer before it is reviewed, starts the paid work that only depends on the answer
+			and returns a function that cancels it if the answer is rejected
+		"""
 		self._default_paths = default_paths
 		self._languages = languages
+		self._auto_accept = auto_accept
+		self._image_prompts = IMAGE_PROMPTS if image_prompts else 0
+		self._speculate = speculate
 		self._rewritten_text = None
 
+	def _schema(self) -> dict:
+		"""
+		JSON schema of the answer, strict structured outputs need every property required and no additional ones
+		"""
+		properties = {"script": {"type": "string"}, "title": {"type": "string"}}
+		if self._image_prompts:
+			properties["image_prompts"] = {"type": "array", "items": {"type": "string"}}
+		return {"type": "object", "properties": properties, "required": list(properties), "additionalProperties": False}
+
+	def _check(self, answer: dict) -> None:
+		if self._image_prompts and not answer["image_prompts"]:
+			raise llm.LLMResponseError("there are no image prompts")
+
+	def _messages(self, scraped_str: str, language: str) -> list[dict]:
+		"""
+		The messages that ask for the script of one language with its title and, if wanted, the image prompts
+		"""
+		extras = f"\n\n-Fasse das Skript außerdem in eine interessante Überschrift (title) zusammen. Der Text sollte nicht laenger als 10 Wörter sein. Es muss in der Sprache {language} sein!"
+		if self._image_prompts:
+			extras += f"\n\n-Also generate {self._image_prompts} vivid, symbolic image prompts (image_prompts) in English that visually represent the most important ideas and themes from the script. Only create prompts that are directly related to the main topic or its core concepts. Each prompt should be a clear, concise sentence describing a visually striking image."
+		return [
+			{"role": "system", "content": "Du bist ein professioneller Autor und haben die Aufgabe, den folgenden Text sachlich neu zu verfassen."},
+			{
+				"role": "user",
+				"content": scraped_str + f"\n\n-Erstelle ein Skript auf {language} mit ca. 150 Wörtern zu dem technischen Thema. Der Einstieg sollte eine spannende Frage oder Aussage enthalten, um die Zuschauer direkt zu fesseln. Der Text muss informativ, klar und prägnant formuliert sein und sollte den Zuschauer mit 'Du'ansprechen. Kein überflüssiger Fülltext, sondern direkt auf den Punkt. Emojis sollen nicht verwendet werden, die Sprache jedoch alltaeglich sein. Der Text soll sachlich und informativ bleiben, ohne spekulative oder reißerische Abschlüsse." + extras
+			}
+		]
+
+	def _generate(self, scraped_str: str, language: str, fresh: bool = False) -> dict:
+		"""
+		Generate the script of one language with its title and, if wanted, the image prompts in one call
+		:param scraped_str: The scraped text
+		:param language: the language of the script
+		:param fresh: never take the cached script, the user asked for a rewrite
+		:return: dict with script, title and image_prompts
+		"""
+		return llm.chat_json(
+			self._messages(scraped_str, language),
+			"script",
+			self._schema(),
+			self._check,
+			fresh=fresh,
+			language=language
+		)
+
 	def rewrite(self, scraped_str: str) -> list[str]:
 		"""
-		Rewrite the scraped text so that you can use it as your script
+		Rewrite the scraped text so that you can use it as your script.
+		The scripts of all languages are generated at the same time through pipeline.llm and reviewed once all of them are ready,
+		a rewrite only generates the script of its own language again.
 		:param scraped_str: The scraped text
-		:param output_path: The path to save the rewritten text
-		:return:
+		:return: the paths of the scripts
 		"""
+		print(Fore.GREEN + f"\nGenerating {len(self._default_paths)} script(s)." + Style.RESET_ALL)
+		with ThreadPoolExecutor(max_workers=max(len(self._languages), 1)) as executor:
+			futures = [tracing.submit_in_context(executor, self._generate, scraped_str, language) for language in self._languages]
+			generated = [future.result() for future in futures]
 
 		# loop trough the list of path and language at the same time
-		for i, (path, language) in enumerate(zip(self._default_paths, self._languages), start=1):
+		for i, (path, language, answer) in enumerate(zip(self._default_paths, self._languages, generated), start=1):
 			expanded_output_path = os.path.expanduser(path)
-			print(Fore.GREEN + f"\nGenerating script {i} of {len(self._default_paths)}." + Style.RESET_ALL)
-			
-			#generate the script
+			print(Fore.GREEN + f"\nReviewing script {i} of {len(self._default_paths)}." + Style.RESET_ALL)
+
 			while True:
-				client = OpenAI()
-				completion = client.chat.completions.create(
-					model="gpt-4o-mini-2024-07-18",
-					messages=[
-						{"role": "system", "content": "Du bist ein professioneller Autor und haben die Aufgabe, den folgenden Text sachlich neu zu verfassen."},
-						{
-							"role": "user",
-							"content": scraped_str + f"\n\n-Erstelle ein Skript auf {language} mit ca. 150 Wörtern zu dem technischen Thema. Der Einstieg sollte eine spannende Frage oder Aussage enthalten, um die Zuschauer direkt zu fesseln. Der Text muss informativ, klar und prägnant formuliert sein und sollte den Zuschauer mit 'Du'ansprechen. Kein überflüssiger Fülltext, sondern direkt auf den Punkt. Emojis sollen nicht verwendet werden, die Sprache jedoch alltaeglich sein. Der Text soll sachlich und informativ bleiben, ohne spekulative oder reißerische Abschlüsse."
-						}
-					]
-				)
-
-				# Print the generated text and ask the user if they want a rewrite
-				print(Fore.GREEN + f"\nGenerated Text:\n\n{completion.choices[0].message.content}" + Style.RESET_ALL)
-				user_input = input("\nDo you want a rewrite (y/ENTER) or rewrite it yourself(r)? (y/ENTER/r): ")
-
-				# Check the user input if n then write the text to the file and break the loop
-				if user_input.lower() == "":
-					print(Fore.GREEN + f"\nAttemting to write it into {expanded_output_path}" + Style.RESET_ALL)
-					self._rewritten_text = completion.choices[0].message.content
-					with open(expanded_output_path, 'w') as file:
-						file.write(completion.choices[0].message.content)
-					print(Fore.GREEN + "\nScript saved to " + expanded_output_path + "" + Style.RESET_ALL)
-					break
-				# If the user wants to rewrite the text then ask for the rewritten text and write it to the file
-				elif user_input.lower() == 'r':
-					user_rewritten_text = input("Enter the rewritten text: ")
-					self._rewritten_text = completion.choices[0].message.content
-					with open(expanded_output_path, 'w') as file:
-						file.write(user_rewritten_text)
-					print(Fore.GREEN + "\nScript saved to " + expanded_output_path + "" + Style.RESET_ALL)
-					break	
-				# If the user enters something else then ask again
-				elif user_input.lower() != "" and user_input.lower() != 'y':
-					print(Fore.YELLOW + "\nInvalid input. Please enter 'y' or 'n'." + Style.RESET_ALL)
+				text = answer["script"]
+				# The voice and the images of the answer are already made while the user reads it
+				cancel = self._speculate(answer) if self._speculate and not self._auto_accept else lambda: None
+				# Print the generated text and ask the user if they want a rewrite, other language tracks wait with their questions
+				with console_lock:
+					print(Fore.GREEN + f"\nGenerated Text:\n\n{text}\n\nTitle: {answer['title']}" + Style.RESET_ALL)
+					# In the headless mode the first script is accepted like pressing ENTER
+					if self._auto_accept:
+						user_input = ""
+					else:
+						user_input = input("\nDo you want a rewrite (y/ENTER) or rewrite it yourself(r)? (y/ENTER/r): ")
+
+					# Check the user input if n then write the text to the file and break the loop
+					if user_input.lower() == "":
+						print(Fore.GREEN + f"\nAttemting to write it into {expanded_output_path}" + Style.RESET_ALL)
+						self._rewritten_text = text
+						with open(expanded_output_path, 'w') as file:
+							file.write(text)
+						self.__save_extras_(path, answer)
+						print(Fore.GREEN + "\nScript saved to " + expanded_output_path + "" + Style.RESET_ALL)
+						break
+					# If the user wants to rewrite the text then ask for the rewritten text and write it to the file
+					elif user_input.lower() == 'r':
+						user_rewritten_text = input("Enter the rewritten text: ")
+						cancel()
+						self._rewritten_text = user_rewritten_text
+						with open(expanded_output_path, 'w') as file:
+							file.write(user_rewritten_text)
+						# The title and the image prompts of the answer describe the rejected script, without them the upload
+						# and the visuals make their own from the text of the user
+						self.__save_extras_(path, {})
+						print(Fore.GREEN + "\nScript saved to " + expanded_output_path + "" + Style.RESET_ALL)
+						break
+					# If the user enters something else then ask again, the same script is shown again
+					elif user_input.lower() != 'y':
+						print(Fore.YELLOW + "\nInvalid input. Please enter 'y', 'r' or ENTER." + Style.RESET_ALL)
+						continue
+
+				cancel()
+				# Generate only this language again, outside the console lock so other tracks can be reviewed meanwhile.
+				# The cached script is the one the user just rejected, so the new one is asked for and replaces it
+				answer = self._generate(scraped_str, language, fresh=True)
 		return self._default_paths
+
+	def stream_sentences(self, scraped_str: str, fresh: bool = False):
+		"""
+		Generate the script of the first language and yield its sentences as soon as they are complete, so the voice is
+		generated while the script is still written. There is no review, this is only for the headless mode.
+		:param scraped_str: The scraped text
+		:param fresh: never take the cached script, e.g. when the streamed one is made again
+		:return: generator of the sentences, the script and its title and image prompts are saved once the answer is complete
+		"""
+		path, language = self._default_paths[0], self._languages[0]
+		reader = llm.JsonStringReader("script")
+		pieces = []
+		pending = ""
+		print(Fore.GREEN + "\nStreaming the script to the voice." + Style.RESET_ALL)
+		for piece in llm.chat_stream(self._messages(scraped_str, language), "script", fresh=fresh, schema=self._schema(), language=language):
+			pieces.append(piece)
+			pending += reader.feed(piece)
+			sentences, pending = split_sentences(pending)
+			yield from sentences
+			# The last sentence is complete once the script is, the title and the image prompts still follow
+			if reader.done and pending.strip():
+				yield pending.strip()
+				pending = ""
+		if pending.strip():
+			yield pending.strip()
+
+		# The voice already has the script, an invalid answer can not be asked for again
+		try:
+			answer = json.loads("".join(pieces))
+		except ValueError:
+			raise llm.LLMResponseError("Invalid script answer: the answer is no JSON")
+		llm.validate(answer, self._schema())
+		self._check(answer)
+		with open(os.path.expanduser(path), 'w') as file:
+			file.write(answer["script"])
+		self.__save_extras_(path, answer)
+		print(Fore.GREEN + f"\nGenerated Text:\n\n{answer['script']}\n\nTitle: {answer['title']}" + Style.RESET_ALL)
+
+	def __save_extras_(self, path: str, answer: dict) -> None:
+		"""
+		Save the title and the image prompts of the accepted answer next to the script, an empty answer saves none of them
+		"""
+		with open(extras_path(path), 'w') as file:
+			json.dump({key: value for key, value in answer.items() if key != "script"}, file, indent=4, ensure_ascii=False)
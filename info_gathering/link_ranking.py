@@ -0,0 +1,72 @@
+import os
+import re
+import math
+from collections import Counter
+from urllib.parse import urlparse
+
+# The sublinks of all websites are ranked for the keywords with BM25 over their anchor text and the words of their url,
+# so only the articles that match are fetched
+TOP_LINKS = int(os.environ.get("SHORTAUTOMATION_TOP_LINKS", "20"))
+K1 = 1.5
+B = 0.75
+
+def terms(text: str) -> list[str]:
+	"""
+	The search terms of a text: lower case words, plural s removed, so "robots" finds "robot"
+	"""
+	words = re.findall(r"[^\W_]+", text.lower())
+	return [word[:-1] if len(word) > 3 and word.endswith("s") and not word.endswith("ss") else word for word in words if not word.isdigit()]
+
+def slug(url: str) -> str:
+	"""
+	The words in the path of a url, e.g. "openai launches new model" of https://techcrunch.com/2026/10/18/openai-launches-new-model/
+	"""
+	return re.sub(r"[/\-_.]+", " ", urlparse(url).path)
+
+class LinkIndex:
+	"""
+	In-memory inverted index of the sublinks of one scrape
+	"""
+	def __init__(self) -> None:
+		self._urls = []
+		self._documents = {}
+		self._lengths = []
+		self._postings = {}
+
+	def add(self, url: str, anchor_text: str = "") -> None:
+		"""
+		Index a sublink, a url that is already indexed is left as it is
+		:param url: the sublink
+		:param anchor_text: the text of the links to it
+		:return:
+		"""
+		if url in self._documents:
+			return
+		document = len(self._urls)
+		counts = Counter(terms(anchor_text) + terms(slug(url)))
+		self._urls.append(url)
+		self._documents[url] = document
+		self._lengths.append(sum(counts.values()))
+		for term, count in counts.items():
+			self._postings.setdefault(term, {})[document] = count
+
+	def search(self, keywords: list[str], top_n: int = None) -> list[tuple[str, float]]:
+		"""
+		The sublinks that match the keywords, best first
+		:param keywords: the keywords of the job
+		:param top_n: at most this many, all matches if None
+		:return: list of (url, BM25 score), only urls with a score above 0
+		"""
+		if not self._urls:
+			return []
+		average_length = sum(self._lengths) / len(self._urls) or 1
+		scores = Counter()
+		for term in set(terms(" ".join(keywords))):
+			postings = self._postings.get(term, {})
+			idf = math.log(1 + (len(self._urls) - len(postings) + 0.5) / (len(postings) + 0.5))
+			for document, count in postings.items():
+				norm = K1 * (1 - B + B * self._lengths[document] / average_length)
+				scores[document] += idf * count * (K1 + 1) / (count + norm)
+		# Equal scores keep the order of the websites
+		ranked = sorted(scores.items(), key=lambda item: (-item[1], item[0]))
+		return [(self._urls[document], score) for document, score in ranked[:top_n]]
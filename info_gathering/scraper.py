@@ -1,213 +1,369 @@
-import requests
+import os
+import json
+import time
 import random
-from random import randint
-from bs4 import BeautifulSoup
+import asyncio
+import aiohttp
 from colorama import Fore, Style, init
-from concurrent.futures import ThreadPoolExecutor, as_completed
-from urllib.parse import urljoin
+from pipeline import tracing
+from pipeline.console import console_lock
+from info_gathering.site_adapters import SiteAdapter, load_adapters, adapter_for, find_links
+from info_gathering.story_index import story_index, signature, similarity
+from info_gathering.link_ranking import LinkIndex, TOP_LINKS
+from pipeline.disk_cache import DiskCache
 
 # Initialize colorama
 init()
 
+# JSON object that maps the start of a website url to another one, e.g. {"https://techcrunch.com/": "http://127.0.0.1:8000/techcrunch/"}.
+# Only the request is redirected, the scraper still treats the page as the original website (used by the benchmarks)
+SITE_OVERRIDES_ENV = "SHORTAUTOMATION_SITE_OVERRIDES"
+
+# Limits of the scraper, all requests of one scrape share one connection pool
+PER_HOST_LIMIT = int(os.environ.get("SHORTAUTOMATION_SCRAPE_PER_HOST", "4"))
+TOTAL_LIMIT = 32
+TIMEOUT_S = float(os.environ.get("SHORTAUTOMATION_SCRAPE_TIMEOUT_S", "15"))
+RETRIES = 2
+
+# Pages are cached on the disk for every main.py on the machine. A cached page younger than the TTL is used without a request,
+# an older one is revalidated with If-None-Match/If-Modified-Since and only downloaded again if it changed
+HTTP_CACHE_ENV = "SHORTAUTOMATION_HTTP_CACHE"
+HTTP_CACHE_DIR = os.environ.get("SHORTAUTOMATION_HTTP_CACHE_DIR", os.path.join("~", ".cache", "shortautomation", "http"))
+HTTP_CACHE_TTL_S = float(os.environ.get("SHORTAUTOMATION_HTTP_CACHE_TTL_S", "600"))
+HTTP_CACHE_MAX_MB = float(os.environ.get("SHORTAUTOMATION_HTTP_CACHE_MAX_MB", "200"))
+
+_http_cache = None
+
+def http_cache() -> DiskCache:
+	"""
+	The page cache of this process, None if it is turned off with SHORTAUTOMATION_HTTP_CACHE=0
+	"""
+	global _http_cache
+	if os.environ.get(HTTP_CACHE_ENV) == "0":
+		return None
+	if _http_cache is None:
+		_http_cache = DiskCache(HTTP_CACHE_DIR, int(HTTP_CACHE_MAX_MB * 1024 * 1024))
+	return _http_cache
+
+def resolve_url(url: str) -> str:
+	"""
+	The url that is really requested, a local stand-in if one is configured for it
+	:param url: url of the website
+	:return: the url to request
+	"""
+	overrides = json.loads(os.environ.get(SITE_OVERRIDES_ENV) or "{}")
+	for prefix, replacement in overrides.items():
+		if url.startswith(prefix):
+			return replacement + url[len(prefix):]
+	return url
+
+def _decode(body: bytes, charset: str = None) -> str:
+	"""
+	Decode a page with its charset, UTF-8 if it has none or one Python does not know
+	"""
+	try:
+		return body.decode(charset or "utf-8", errors="replace")
+	except LookupError:
+		return body.decode("utf-8", errors="replace")
+
+async def fetch(session: aiohttp.ClientSession, url: str) -> tuple[int, str]:
+	"""
+	GET the url with retries for timeouts, connection errors, 429 and 5xx answers, served from the page cache if possible
+	:param session: the session of the scrape, its connector limits the connections per host
+	:param url: url to fetch
+	:return: (status code, html), status code 0 if the url could not be fetched at all
+	"""
+	request_url = resolve_url(url)
+	cache = http_cache()
+	cached = cache.get(request_url) if cache is not None else None
+	headers = {}
+	if cached is not None:
+		meta, body = cached
+		# The page is decoded with the charset it was served with, not every website uses UTF-8
+		if time.time() - meta["validated"] < HTTP_CACHE_TTL_S:
+			return 200, _decode(body, meta.get("charset"))
+		if meta.get("etag"):
+			headers["If-None-Match"] = meta["etag"]
+		if meta.get("last_modified"):
+			headers["If-Modified-Since"] = meta["last_modified"]
+
+	for attempt in range(RETRIES + 1):
+		try:
+			with tracing.span("site.get", "api", overlapping=True, url=url) as info:
+				async with session.get(request_url, headers=headers) as response:
+					body = await response.read()
+					info["status"] = response.status
+					info["bytes_received"] = len(body)
+			if (response.status == 429 or response.status >= 500) and attempt < RETRIES:
+				await asyncio.sleep(2 ** attempt)
+				continue
+
+			# Not modified, the cached page is valid for another TTL
+			if response.status == 304 and cached is not None:
+				cache.touch(request_url, validated=time.time())
+				return 200, _decode(cached[1], cached[0].get("charset"))
+			if response.status == 200 and cache is not None and "no-store" not in response.headers.get("Cache-Control", ""):
+				cache.put(request_url, {
+					"validated": time.time(),
+					"etag": response.headers.get("ETag"),
+					"last_modified": response.headers.get("Last-Modified"),
+					"charset": response.charset,
+				}, body)
+			return response.status, _decode(body, response.charset)
+		except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+			if attempt < RETRIES:
+				await asyncio.sleep(2 ** attempt)
+				continue
+			print(Fore.RED + f"\nCould not fetch {url}: {e!r}" + Style.RESET_ALL)
+	return 0, ""
+
+def _session() -> aiohttp.ClientSession:
+	"""
+	One pooled session per scrape with the per host limit and the timeout
+	"""
+	return aiohttp.ClientSession(
+		connector=aiohttp.TCPConnector(limit=TOTAL_LIMIT, limit_per_host=PER_HOST_LIMIT),
+		timeout=aiohttp.ClientTimeout(total=TIMEOUT_S)
+	)
+
 class Scraper:
 	"""
-	Web scraper class to scrape websites for keywords
+	Web scraper class to scrape websites for keywords, every website is scraped by its adapter in sites.json
 	"""
-	def __init__(self, targets: list[str], keywords: list[str]) -> None:
+	def __init__(self, targets: list[str], keywords: list[str], max_articles: int = None, job: str = None, distinct: bool = False) -> None:
 		"""
 		:param targets: target websites to scrape
 		:param keywords: keywords to search for in the websites
+		:param max_articles: if given the first max_articles sublinks are taken without asking the user (headless mode)
+		:param job: id of the job (see story_index.workspace_id), its own articles are no duplicates when it is resumed
+		:param distinct: every article becomes its own short (batch mode), so two articles about the same story are duplicates too.
+			Otherwise the articles are merged into one script and a second source of a story only adds to it
 		"""
 		self._targets = targets
 		self._keywords = keywords
+		self._max_articles = max_articles
+		self._job = job
+		self._distinct = distinct
+		self._adapters = load_adapters()
+		self._timings = {}
 
 	def scrape(self) -> str:
 		"""
 		Scrape the websites for the keywords provided
 		:return: string of the scraped text
 		"""
-		# List to store the sublinks to a specific topic
-		scrape_sublinks_result = []
-		# List to store the results that will be used to generate the script with chatgpt
-		scrape_text_results = []
-
-		# Loop through the websites in parallel
-		for target in self._targets:
-			sublinks = self.__fetch_links_(target)
-			scrape_sublinks_result.extend(sublinks)
-
-		# If no sublinks are found then return
-		if len(scrape_sublinks_result) == 0:
-			print(Fore.RED + "\nNo sublinks found. Please check your keywords." + Style.RESET_ALL)
-			return
-
-		# List all the scraped sublinks
-		print("")
-		for count, sublink in enumerate(scrape_sublinks_result):
-			print(Fore.GREEN + f"{count}: {sublink}" + Style.RESET_ALL)
-		print("")
-
-		# Ask the user if they which sublinks should be scraped
-		user_sublinks_result = []
-		while True:
-			try:
-				user_input = int(input(
-					f"Enter the number of the sublink to scrape (0-{len(scrape_sublinks_result) - 1}), or -1 to finish: "))
-				if user_input == -1:
-					break
-				if 0 <= user_input < len(scrape_sublinks_result):
-					user_sublinks_result.append(scrape_sublinks_result[user_input])
-				else:
-					print(
-						Fore.RED + f"Please enter a number between 0 and {len(scrape_sublinks_result) - 1}." + Style.RESET_ALL)
-			except ValueError:
-				print(Fore.RED + "Invalid input. Please enter a number." + Style.RESET_ALL)
-
-		# Loop through the sublinks in parallel and get the text from the paragraphs
-		with ThreadPoolExecutor() as executor:
-			futures = [
-				executor.submit(self.__fetch_texts_, self._targets, sublink) \
-				for sublink in user_sublinks_result
-			]
-			for future in as_completed(futures):
-				scrape_text_results.extend(future.result())
-
+		articles = self.scrape_articles()
+		if articles is None:
+			return None
 		# Send the scraped text to gpt_rewrite and then return the finished script
-		return "\n".join(scrape_text_results)
+		return "\n".join(articles.values())
 
-	def __fetch_links_(self, link: str) -> list[str]:
+	def scrape_articles(self) -> dict[str, str]:
 		"""
-		Fetch and process the link to extract sublinks.
-		:param link:
-		:param keywords:
-		:return:
+		Scrape the websites for the keywords provided and keep the articles apart, every article can become its own short
+		:return: dict of sublink -> text of the article, one paragraph per line, None if nothing was scraped
 		"""
-		sublinks = []
-		visited = set()
-		raw_html = requests.get(link)
-		if raw_html.status_code == 200:
-			print(Fore.GREEN + f"\nStatus Code of {raw_html.status_code} received." + Style.RESET_ALL)
-		else:
-			print(Fore.RED + f"\nStatus Code of {raw_html.status_code} received." + Style.RESET_ALL)
-		if raw_html.status_code == 200:
-			soup = BeautifulSoup(raw_html.text, 'html.parser')
-
-			# for techcrunch
-			if link == "https://techcrunch.com/":
-				main_section = soup.select_one("main")
-				if main_section:
-					links = main_section.find_all('a')
-					for a in links:
-						href = a.get('href')
-						if href and not href.startswith("http"):
-							href = urljoin(link, href)
-						if href and "/author" not in href and "/category" not in href and href not in sublinks and len(sublinks) < 20:
-							sublinks.append(href)
-
-			# for historydaily
-			elif not self._keywords and link == "https://www.historydaily.com/episodes/":
-				page_url = f"{link}?page={randint(1, 42)}"
-				if page_url not in visited:
-					visited.add(page_url)
-					raw_html = requests.get(page_url)
-					if raw_html.status_code == 200:
-						soup = BeautifulSoup(raw_html.text, 'html.parser')
-						div = soup.select_one("div.row-wrapper")
-						if div:
-							links = div.find_all('a')
-							for a in links:
-								href = a.get('href')
-								if href and not href.startswith("http"):
-									href = urljoin(link, href)
-								if href and href not in visited and len(sublinks) < 20:
-									visited.add(href)
-									sub_html = requests.get(href)
-									if sub_html.status_code == 200:
-										sub_soup = BeautifulSoup(sub_html.text, 'html.parser')
-										transcript_anchor = sub_soup.find('a', href='#transcript')
-										if transcript_anchor:
-											sublinks.append(href)
-
-			elif not self._keywords and link == "https://www.politico.eu/":
-					main_section = soup.select_one("main#main.main--front-page")
-					if main_section:
-						links = main_section.find_all('a')
-						for a in links:
-							href = a.get('href')
-							if href and href not in sublinks and len(sublinks) < 20:
-								sublinks.append(href)
-								
-			elif not self._keywords and link == "https://www.neverendingfootsteps.com/travel-guides/":
-				main_section = soup.select_one("main.vw-content-main")
-				if main_section:
-					links = main_section.find_all('a')
-					for link in links:
-						href = link.get('href')
-						sublinks.append(href)
+		return asyncio.run(self._scrape())
 
+	async def _scrape(self) -> dict[str, str]:
+		"""
+		Run the adapters of all websites at the same time, then fetch all picked sublinks at the same time, with one connection pool
+		:return: dict of sublink -> text of the article
+		"""
+		async with _session() as session:
+			# The sublinks keep the order of the websites, every sublink is read by the adapter that found it
+			adapter_of = {}
+			link_index = LinkIndex()
+			for adapter, anchors in await asyncio.gather(*(self.__fetch_links_(session, target) for target in self._targets)):
+				for sublink, anchor_text in anchors:
+					adapter_of.setdefault(sublink, adapter)
+					link_index.add(sublink, anchor_text)
+			scrape_sublinks_result = self.__rank_(link_index, list(adapter_of))
+
+			# If no sublinks are found then return
+			if len(scrape_sublinks_result) == 0:
+				print(Fore.RED + "\nNo sublinks found. Please check your keywords." + Style.RESET_ALL)
+				return
+
+			# In the headless mode the first sublinks are taken and the next ones replace duplicates, otherwise the user picks them
+			if self._max_articles is not None:
+				articles = await self.__fetch_new_stories_(session, adapter_of, scrape_sublinks_result, self._max_articles)
+				print(Fore.GREEN + f"\nTaking the first {len(articles)} new sublink(s): {list(articles)}" + Style.RESET_ALL)
 			else:
-				print(Fore.RED + "\nNo known website found. Please write your own scraper." + Style.RESET_ALL)
-
-		return sublinks
-
-	def __fetch_texts_(self, website: list[str], sublink: str) -> list[str]:
-		"""
-        Fetch and process the sublink to extract paragraphs.
-        :param sublink: URL of the sublink to fetch
-        :return: List of paragraphs' text
-        """
-		paragraphs_text = []
-
-		if sublink == "https://techcrunch.com/":
-			raw_html = requests.get(sublink)
-			if raw_html.status_code == 200:
-				soup = BeautifulSoup(raw_html.text, 'html.parser')
-				main_content = soup.find('main')
-				if main_content:
-					paragraphs = main_content.find_all('p')
-					for paragraph in paragraphs:
-						paragraphs_text.append(paragraph.get_text(separator="\n", strip=True))
-
-		elif website[0] == "https://www.historydaily.com/episodes/":
-			raw_html = requests.get(sublink)
-			if raw_html.status_code == 200:
-				soup = BeautifulSoup(raw_html.text, 'html.parser')
-				parapgraphs = soup.find_all('p')
-				for paragraph in paragraphs:
-						paragraphs_text.append(paragraph.get_text(separator="\n", strip=True))
-
-		elif website[0] == "https://www.politico.eu/":
-			raw_html = requests.get(sublink)
-			if raw_html.status_code == 200:
-				soup = BeautifulSoup(raw_html.text, 'html.parser')
-				parapgraphs = soup.find_all('p')
-				for paragraph in paragraphs:
-						paragraphs_text.append(paragraph.get_text(separator="\n", strip=True))
-
-		elif website[0] == "https://www.neverendingfootsteps.com/travel-guides/":
-			raw_html = requests.get(sublink)
-			if raw_html.status_code == 200:
-				soup = BeautifulSoup(raw_html.text, 'html.parser')
-				links = soup.find_all('a')
-				anchor_hrefs = [a.get('href') for a in links if a.get('href')]
-				if anchor_hrefs:
-					chosen_href = random.choice(anchor_hrefs)
-					sub_html = requests.get(chosen_href)
-					if sub_html.status_code == 200:
-						sub_soup = BeautifulSoup(sub_html.text, 'html.parser')
-						paragraphs = sub_soup.find_all('p')
-						for paragraph in paragraphs:
-							paragraphs_text.append(paragraph.get_text(separator="\n", strip=True))
+				user_sublinks_result = self.__ask_for_sublinks_(scrape_sublinks_result)
+				articles = await self.__fetch_new_stories_(session, adapter_of, user_sublinks_result, len(user_sublinks_result))
+			self.__print_timings_()
+			if not articles:
+				print(Fore.RED + "\nEvery article was already used for a short, nothing new to scrape." + Style.RESET_ALL)
+				return
 
+			# Every paragraph of the picked articles
+			return {sublink: "\n".join(paragraphs_text) for sublink, paragraphs_text in articles.items()}
+
+	def __rank_(self, link_index: LinkIndex, sublinks: list[str]) -> list[str]:
+		"""
+		Rank the sublinks for the keywords by their anchor text and url, before any article is fetched
+		:param link_index: index of all sublinks
+		:param sublinks: all sublinks in the order of the websites
+		:return: the best TOP_LINKS matches, all sublinks if there are no keywords or nothing matches
+		"""
+		if not self._keywords or not sublinks:
+			return sublinks
+		ranked = link_index.search(self._keywords, TOP_LINKS)
+		if not ranked:
+			print(Fore.YELLOW + f"\nNo sublink matches the keywords {' '.join(self._keywords)}, showing all of them." + Style.RESET_ALL)
+			return sublinks
+		print(Fore.GREEN + f"\n{len(ranked)} of {len(sublinks)} sublinks match the keywords {' '.join(self._keywords)}:" + Style.RESET_ALL)
+		for sublink, score in ranked:
+			print(f"{score:>6.2f}  {sublink}")
+		return [sublink for sublink, _ in ranked]
+
+	def __ask_for_sublinks_(self, scrape_sublinks_result: list[str]) -> list[str]:
+		"""
+		List all sublinks and let the user pick the ones to scrape
+		:param scrape_sublinks_result: all found sublinks
+		:return: the picked sublinks
+		"""
+		# The song selection runs at the same time and asks its own questions, so the list and the questions are not mixed with them
+		with console_lock:
+			# List all the scraped sublinks
+			print("")
+			for count, sublink in enumerate(scrape_sublinks_result):
+				print(Fore.GREEN + f"{count}: {sublink}" + Style.RESET_ALL)
+			print("")
+
+			# Ask the user if they which sublinks should be scraped
+			user_sublinks_result = []
+			while True:
+				try:
+					user_input = int(input(
+						f"Enter the number of the sublink to scrape (0-{len(scrape_sublinks_result) - 1}), or -1 to finish: "))
+					if user_input == -1:
+						break
+					if 0 <= user_input < len(scrape_sublinks_result):
+						user_sublinks_result.append(scrape_sublinks_result[user_input])
+					else:
+						print(
+							Fore.RED + f"Please enter a number between 0 and {len(scrape_sublinks_result) - 1}." + Style.RESET_ALL)
+				except ValueError:
+					print(Fore.RED + "Invalid input. Please enter a number." + Style.RESET_ALL)
+		return user_sublinks_result
+
+	async def __fetch_new_stories_(self, session: aiohttp.ClientSession, adapter_of: dict, candidates: list[str], wanted: int) -> dict:
+		"""
+		Fetch the paragraphs of the candidates in parallel and leave out the stories that were already used by an earlier
+		job (story index) or, if the articles are distinct, by another candidate of this one. Duplicates are replaced by the next candidates.
+		The stories are only remembered once their short is made, see story_index.remember
+		:param session: the session of the scrape
+		:param adapter_of: adapter of every sublink
+		:param candidates: the sublinks in the order they are wanted
+		:param wanted: how many articles are wanted
+		:return: dict of sublink -> paragraphs of the new stories
+		"""
+		index = await asyncio.to_thread(story_index)
+		articles = {}
+		stories = []
+		remaining = list(candidates)
+		while remaining and len(articles) < wanted:
+			batch, remaining = remaining[:wanted - len(articles)], remaining[wanted - len(articles):]
+			texts = await asyncio.gather(*(self.__fetch_texts_(session, adapter_of[sublink], sublink) for sublink in batch))
+			for sublink, paragraphs_text in zip(batch, texts):
+				story = signature("\n".join(paragraphs_text)) if index is not None else None
+				if story is not None:
+					duplicate = await asyncio.to_thread(index.find_duplicate, story, self._job)
+					if self._distinct:
+						duplicate = duplicate or next(((url, score) for url, other in stories if (score := similarity(story, other)) >= index.threshold), None)
+					if duplicate:
+						print(Fore.YELLOW + f"\n{sublink} is the same story as {duplicate[0]} ({duplicate[1]:.0%} similar), skipping it." + Style.RESET_ALL)
+						continue
+					stories.append((sublink, story))
+				articles[sublink] = paragraphs_text
+		return articles
+
+	async def __get_(self, session: aiohttp.ClientSession, adapter: SiteAdapter, url: str) -> tuple[int, str]:
+		"""
+		Fetch a page for an adapter and add the time to its timings
+		"""
+		start = time.perf_counter()
+		result = await fetch(session, url)
+		self.__add_timing_(adapter, "fetch", start)
+		return result
+
+	async def __parse_(self, adapter: SiteAdapter, extract, *args):
+		"""
+		Run an extraction of an adapter in a thread, so the requests of the other adapters go on meanwhile
+		"""
+		start = time.perf_counter()
+		result = await asyncio.to_thread(extract, *args)
+		self.__add_timing_(adapter, "parse", start)
+		return result
+
+	def __add_timing_(self, adapter: SiteAdapter, kind: str, start: float) -> None:
+		timing = self._timings.setdefault(adapter.name, {"fetch": 0, "fetch_ms": 0.0, "parse": 0, "parse_ms": 0.0})
+		timing[kind] += 1
+		timing[f"{kind}_ms"] += (time.perf_counter() - start) * 1000
+
+	def __print_timings_(self) -> None:
+		"""
+		Print how many pages every adapter fetched and parsed and how long it took in total
+		"""
+		print(f"\n{'adapter':<24}{'fetches':>8}{'fetch ms':>12}{'parses':>8}{'parse ms':>12}")
+		for name, timing in self._timings.items():
+			print(f"{name:<24}{timing['fetch']:>8}{timing['fetch_ms']:>12.0f}{timing['parse']:>8}{timing['parse_ms']:>12.0f}")
+
+	async def __fetch_links_(self, session: aiohttp.ClientSession, link: str) -> tuple[SiteAdapter, list[tuple[str, str]]]:
+		"""
+		Fetch the front page of a website and extract the sublinks with its adapter.
+		:param session: the session of the scrape
+		:param link: the website
+		:return: the adapter and the sublinks with their anchor text
+		"""
+		adapter = adapter_for(link, self._adapters)
+		if adapter is None:
+			print(Fore.RED + f"\nNo adapter for {link} found. Please add one to info_gathering/sites.json." + Style.RESET_ALL)
+			return None, []
+
+		page_url = adapter.front_page_url()
+		status, html = await self.__get_(session, adapter, page_url)
+		if status == 200:
+			print(Fore.GREEN + f"\nStatus Code of {status} received from {adapter.name}." + Style.RESET_ALL)
 		else:
-			raw_html = requests.get(sublink)
-			if raw_html.status_code == 200:
-				soup = BeautifulSoup(raw_html.text, 'html.parser')
-				# You could scrape a variety of elements; here we collect all <p> tags
-				paragraphs = soup.find_all('p')
-				for paragraph in paragraphs:
-					text = paragraph.get_text(separator="\n", strip=True)
-					if text:
-						paragraphs_text.append(text)
-
-		return paragraphs_text
+			print(Fore.RED + f"\nStatus Code of {status} received from {adapter.name}." + Style.RESET_ALL)
+			return adapter, []
+		candidates = await self.__parse_(adapter, adapter.find_anchors, html, page_url)
+		if not adapter.require:
+			return adapter, candidates
+
+		# Only linked pages that match the require selector are kept, all of them are checked at the same time
+		checks = await asyncio.gather(*(self.__passes_(session, adapter, href) for href, _ in candidates))
+		sublinks = [anchor for anchor, passed in zip(candidates, checks) if passed]
+		return adapter, sublinks[:adapter.max_links] if adapter.max_links is not None else sublinks
+
+	async def __passes_(self, session: aiohttp.ClientSession, adapter: SiteAdapter, href: str) -> bool:
+		"""
+		Check if a linked page matches the require selector of the adapter
+		"""
+		status, html = await self.__get_(session, adapter, href)
+		return status == 200 and await self.__parse_(adapter, adapter.passes, html)
+
+	async def __fetch_texts_(self, session: aiohttp.ClientSession, adapter: SiteAdapter, sublink: str) -> list[str]:
+		"""
+		Fetch and process the sublink to extract paragraphs.
+		:param session: the session of the scrape
+		:param adapter: the adapter of the website the sublink is from
+		:param sublink: URL of the sublink to fetch
+		:return: List of paragraphs' text
+		"""
+		status, html = await self.__get_(session, adapter, sublink)
+		if status != 200:
+			return []
+
+		# Some websites only link to the text from the page the sublink points to
+		if adapter.follows_random_link:
+			anchor_hrefs = await self.__parse_(adapter, find_links, html)
+			if not anchor_hrefs:
+				return []
+			status, html = await self.__get_(session, adapter, random.choice(anchor_hrefs))
+			if status != 200:
+				return []
+		return await self.__parse_(adapter, adapter.find_paragraphs, html)
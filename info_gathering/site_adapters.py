@@ -0,0 +1,183 @@
+import os
+import re
+import json
+import random
+from pathlib import Path
+from urllib.parse import urljoin
+from bs4 import BeautifulSoup, SoupStrainer
+
+# Every website the scraper knows is an adapter in sites.json, a JSON file in $SHORTAUTOMATION_SITES can add more or replace them:
+# url           the front page, the website="" value of a block
+# front_page    optional, the page the links are taken from, {url} and {random:1:42} are filled in
+# links         select: CSS selector of the element with the links, absolute: make relative links absolute,
+#               exclude: links containing one of these are left out, unique: every link only once, max: at most this many,
+#               require: CSS selector that has to match on the linked page (all linked pages are checked at the same time)
+# article       select: optional CSS selector of the element with the paragraphs, paragraphs: CSS selector of the paragraphs,
+#               skip_empty: leave out paragraphs without text, follow: "random_link" reads a random linked page instead
+SITES_PATH = Path(__file__).with_name("sites.json")
+SITES_ENV = "SHORTAUTOMATION_SITES"
+
+# Only the elements an adapter looks at are parsed, with lxml if it is installed (benchmarks/parse_benchmark.py compares them).
+# SHORTAUTOMATION_HTML_PARSER=html.parser forces the parser of the standard library
+try:
+	import lxml  # noqa: F401
+	PARSER = os.environ.get("SHORTAUTOMATION_HTML_PARSER", "lxml")
+except ImportError:
+	PARSER = os.environ.get("SHORTAUTOMATION_HTML_PARSER", "html.parser")
+
+ONLY_LINKS = SoupStrainer("a", href=True)
+
+def strainer(selector: str) -> SoupStrainer:
+	"""
+	A SoupStrainer for the first element of a CSS selector, e.g. main#main.main--front-page or a[href='#transcript'].
+	It can match more than the selector, the selector is applied to the parsed elements afterwards.
+	:param selector: the CSS selector
+	:return: the strainer, None if the selector does not start with a tag
+	"""
+	match = re.match(r"([a-zA-Z][\w-]*)(#[\w-]+)?((?:\.[\w-]+)*)", selector.strip())
+	if not match:
+		return None
+	tag, element_id, classes = match.groups()
+	attrs = {}
+	if element_id:
+		attrs["id"] = element_id[1:]
+	if classes:
+		attrs["class"] = classes.split(".")[1]
+	return SoupStrainer(tag, attrs=attrs)
+
+def parse(html: str, only: SoupStrainer = None, parser: str = None) -> BeautifulSoup:
+	"""
+	Parse a page
+	:param html: the page
+	:param only: the elements to parse, the whole page if None
+	:param parser: the BeautifulSoup parser, PARSER if None
+	:return: the parsed elements
+	"""
+	return BeautifulSoup(html, parser or PARSER, parse_only=only)
+
+def find_links(html: str, strained: bool = True, parser: str = None) -> list[str]:
+	"""
+	Every href of the page
+	"""
+	return [a.get('href') for a in parse(html, ONLY_LINKS if strained else None, parser).find_all('a') if a.get('href')]
+
+class SiteAdapter:
+	"""
+	How the links and the paragraphs of one website are found, defined by its entry in sites.json
+	"""
+	def __init__(self, name: str, config: dict) -> None:
+		"""
+		:param name: name of the website
+		:param config: the entry in sites.json
+		"""
+		self.name = name
+		self.url = config["url"]
+		self._front_page = config.get("front_page", "{url}")
+		self._links = config.get("links", {})
+		self._article = config.get("article", {"paragraphs": "p"})
+		self._links_strainer = strainer(self._links["select"]) if self._links.get("select") else None
+		self._require_strainer = strainer(self._links["require"]) if self._links.get("require") else None
+		self._article_strainer = strainer(self._article.get("select") or self._article.get("paragraphs", "p"))
+
+	@property
+	def require(self) -> str:
+		"""
+		The CSS selector that has to match on every linked page, None if the links are taken as they are
+		"""
+		return self._links.get("require")
+
+	@property
+	def max_links(self) -> int:
+		return self._links.get("max")
+
+	@property
+	def follows_random_link(self) -> bool:
+		return self._article.get("follow") == "random_link"
+
+	def front_page_url(self) -> str:
+		"""
+		The page the links are taken from
+		"""
+		url = self._front_page.replace("{url}", self.url)
+		return re.sub(r"\{random:(\d+):(\d+)\}", lambda match: str(random.randint(int(match.group(1)), int(match.group(2)))), url)
+
+	def find_anchors(self, html: str, page_url: str = None, strained: bool = True, parser: str = None) -> list[tuple[str, str]]:
+		"""
+		The links on the front page with their anchor text, the keywords are matched against it
+		:param html: the front page
+		:param page_url: url of the page, it is never a link of itself
+		:param strained: only parse the element with the links (False parses the whole page)
+		:param parser: the BeautifulSoup parser, PARSER if None
+		:return: list of (link, anchor text), before the require check
+		"""
+		soup = parse(html, self._links_strainer if strained else None, parser)
+		section = soup.select_one(self._links["select"]) if self._links.get("select") else soup
+		if not section:
+			return []
+		anchors = []
+		position = {}
+		for a in section.find_all('a'):
+			href = a.get('href')
+			if not href:
+				continue
+			if self._links.get("absolute") and not href.startswith("http"):
+				href = urljoin(self.url, href)
+			if href == page_url or any(part in href for part in self._links.get("exclude", [])):
+				continue
+			text = a.get_text(separator=" ", strip=True)
+			# Websites often link an article twice (image and headline), the texts of both belong to the one link
+			if self._links.get("unique") and href in position:
+				if text:
+					anchors[position[href]] = (href, f"{anchors[position[href]][1]} {text}".strip())
+				continue
+			# Links that need the require check are limited after the check
+			if not self.require and self.max_links is not None and len(anchors) >= self.max_links:
+				break
+			position.setdefault(href, len(anchors))
+			anchors.append((href, text))
+		return anchors
+
+	def find_links(self, html: str, page_url: str = None, strained: bool = True, parser: str = None) -> list[str]:
+		"""
+		The links on the front page, see find_anchors
+		"""
+		return [href for href, _ in self.find_anchors(html, page_url, strained, parser)]
+
+	def passes(self, html: str, strained: bool = True, parser: str = None) -> bool:
+		"""
+		Check if a linked page matches the require selector
+		"""
+		return parse(html, self._require_strainer if strained else None, parser).select_one(self.require) is not None
+
+	def find_paragraphs(self, html: str, strained: bool = True, parser: str = None) -> list[str]:
+		"""
+		The text of every paragraph of an article
+		:param html: the article
+		:param strained: only parse the element with the paragraphs (False parses the whole page)
+		:param parser: the BeautifulSoup parser, PARSER if None
+		:return: the text of the paragraphs
+		"""
+		soup = parse(html, self._article_strainer if strained else None, parser)
+		root = soup.select_one(self._article["select"]) if self._article.get("select") else soup
+		if not root:
+			return []
+		paragraphs_text = [paragraph.get_text(separator=" ", strip=True) for paragraph in root.select(self._article.get("paragraphs", "p"))]
+		return [text for text in paragraphs_text if text] if self._article.get("skip_empty") else paragraphs_text
+
+def load_adapters() -> dict[str, SiteAdapter]:
+	"""
+	The adapters of sites.json and of the file in $SHORTAUTOMATION_SITES
+	:return: dict of name -> adapter
+	"""
+	with open(SITES_PATH, "r") as file:
+		config = json.load(file)
+	if os.environ.get(SITES_ENV):
+		with open(os.path.expanduser(os.environ[SITES_ENV]), "r") as file:
+			config.update(json.load(file))
+	return {name: SiteAdapter(name, entry) for name, entry in config.items()}
+
+def adapter_for(url: str, adapters: dict[str, SiteAdapter]) -> SiteAdapter:
+	"""
+	The adapter of a website="" value, None if no adapter knows it
+	"""
+	return next((adapter for adapter in adapters.values() if adapter.url == url), None)
@@ -0,0 +1,155 @@
+import os
+import re
+import time
+import array
+import random
+import sqlite3
+import hashlib
+import threading
+import uuid
+
+# Every article that was turned into a short is remembered by its MinHash signature, articles about the same story
+# (from another website or from the same one on another day) are found with LSH buckets before anything is paid for
+STORY_INDEX_ENV = "SHORTAUTOMATION_STORY_INDEX"
+DEDUP_ENV = "SHORTAUTOMATION_DEDUP"
+THRESHOLD = float(os.environ.get("SHORTAUTOMATION_DEDUP_THRESHOLD", "0.35"))
+
+# 64 bands of 2 rows find articles from a similarity of about 0.2 on, the signatures decide about the threshold
+NUM_PERM = 128
+BANDS = 64
+ROWS = NUM_PERM // BANDS
+_PRIME = (1 << 61) - 1
+_rng = random.Random(20240611)
+_PERMUTATIONS = [(_rng.randrange(1, _PRIME), _rng.randrange(0, _PRIME)) for _ in range(NUM_PERM)]
+
+def _hash64(data: bytes) -> int:
+	return int.from_bytes(hashlib.blake2b(data, digest_size=8).digest(), "little")
+
+def shingles(text: str) -> set[int]:
+	"""
+	Hashes of every pair of neighbouring words, pairs still match when a story is told with other sentences
+	"""
+	words = re.findall(r"\w+", text.lower())
+	return {_hash64(f"{first} {second}".encode()) for first, second in zip(words, words[1:])}
+
+def signature(text: str) -> list[int]:
+	"""
+	MinHash signature of a text
+	:param text: the text of the article
+	:return: NUM_PERM values, None if the text is too short to compare
+	"""
+	hashes = shingles(text)
+	if len(hashes) < 10:
+		return None
+	return [min((a * h + b) % _PRIME for h in hashes) for a, b in _PERMUTATIONS]
+
+def similarity(first: list[int], second: list[int]) -> float:
+	"""
+	Estimated Jaccard similarity of the texts of two signatures
+	"""
+	return sum(1 for x, y in zip(first, second) if x == y) / NUM_PERM
+
+def _bucket(band: int, values: list[int]) -> int:
+	# SQLite integers are signed 64 bit
+	return _hash64(array.array("Q", [band, *values]).tobytes()) - (1 << 63)
+
+class StoryIndex:
+	"""
+	Persistent index of the articles of all runs in SQLite, shared by every main.py on the machine
+	"""
+	def __init__(self, path: str = None, threshold: float = THRESHOLD) -> None:
+		"""
+		:param path: the SQLite file, $SHORTAUTOMATION_STORY_INDEX or ~/.cache/shortautomation/stories.sqlite
+		:param threshold: from which similarity on two articles are the same story
+		"""
+		path = os.path.expanduser(path or os.environ.get(STORY_INDEX_ENV) or os.path.join("~", ".cache", "shortautomation", "stories.sqlite"))
+		os.makedirs(os.path.dirname(path), exist_ok=True)
+		self.threshold = threshold
+		self._lock = threading.Lock()
+		self._connection = sqlite3.connect(path, timeout=30, check_same_thread=False)
+		with self._lock, self._connection:
+			self._connection.execute("PRAGMA journal_mode=WAL")
+			self._connection.execute("CREATE TABLE IF NOT EXISTS articles (id INTEGER PRIMARY KEY, url TEXT, job TEXT, added REAL, signature BLOB)")
+			self._connection.execute("CREATE TABLE IF NOT EXISTS buckets (bucket INTEGER, article INTEGER)")
+			self._connection.execute("CREATE INDEX IF NOT EXISTS buckets_by_bucket ON buckets (bucket)")
+
+	def find_duplicate(self, story: list[int], job: str = None) -> tuple[str, float]:
+		"""
+		The most similar known article above the threshold
+		:param story: signature of the article
+		:param job: articles of this job are left out, a job that runs again is no duplicate of itself
+		:return: (url, similarity) or None
+		"""
+		buckets = [_bucket(band, story[band * ROWS:(band + 1) * ROWS]) for band in range(BANDS)]
+		with self._lock:
+			rows = self._connection.execute(
+				f"SELECT DISTINCT articles.url, articles.job, articles.signature FROM buckets JOIN articles ON articles.id = buckets.article "
+				f"WHERE buckets.bucket IN ({','.join('?' * len(buckets))})",
+				buckets
+			).fetchall()
+		best = None
+		for url, article_job, blob in rows:
+			if job is not None and article_job == job:
+				continue
+			score = similarity(story, array.array("Q", blob).tolist())
+			if score >= self.threshold and (best is None or score > best[1]):
+				best = (url, score)
+		return best
+
+	def add(self, url: str, story: list[int], job: str = None) -> None:
+		"""
+		Remember an article
+		:param url: url of the article
+		:param story: signature of the article
+		:param job: the job the article was used in
+		:return:
+		"""
+		with self._lock, self._connection:
+			cursor = self._connection.execute(
+				"INSERT INTO articles (url, job, added, signature) VALUES (?, ?, ?, ?)",
+				(url, job, time.time(), array.array("Q", story).tobytes())
+			)
+			self._connection.executemany(
+				"INSERT INTO buckets (bucket, article) VALUES (?, ?)",
+				[(_bucket(band, story[band * ROWS:(band + 1) * ROWS]), cursor.lastrowid) for band in range(BANDS)]
+			)
+
+def workspace_id(path: str) -> str:
+	"""
+	A random id of the output directory of a job, it stays the same while a failed job is resumed and is new once the
+	directory was deleted, so a job that runs again the next day is checked against its earlier articles
+	:param path: the output directory
+	:return: the id
+	"""
+	id_path = os.path.join(os.path.expanduser(path), ".job_id")
+	try:
+		with open(id_path, "r") as file:
+			return file.read().strip()
+	except FileNotFoundError:
+		job_id = uuid.uuid4().hex
+		with open(id_path, "w") as file:
+			file.write(job_id)
+		return job_id
+
+def story_index() -> StoryIndex:
+	"""
+	The story index, None if the duplicate check is turned off with SHORTAUTOMATION_DEDUP=0
+	"""
+	if os.environ.get(DEDUP_ENV) == "0":
+		return None
+	return StoryIndex()
+
+def remember(articles: dict[str, str], job: str = None) -> None:
+	"""
+	Remember the articles of a finished short, so later jobs skip their stories. A job that fails before remembers nothing.
+	:param articles: dict of url -> text of the article
+	:param job: id of the job, see workspace_id
+	:return:
+	"""
+	index = story_index()
+	if index is None:
+		return
+	for url, text in articles.items():
+		story = signature(text)
+		if story is not None:
+			index.add(url, story, job)
@@ -1,17 +1,20 @@
-from info_gathering.scraper import Scraper
-from info_gathering.gpt_rewrite import GPTCaller
 from colorama import Fore, Style, init
-from voice_gathering.get_voice import VoiceCaller
-from visuals_gathering.get_visuals import VideoDownloader
-from music_selection.selection import MusicSelection
-from yt_upload.upload_to_youtube import YoutubeUploader
-from subtitles_gathering.subtitles import SubtitleGenerator
-from shorts_fusion.shorts_fusion import ShortFusion
+from pipeline.scheduler import Stage, StageScheduler, StageError
+from pipeline.languages import Language, get_language
+from pipeline.checkpoints import CheckpointStore
+from pipeline.console import console_lock
+from pipeline import tracing
+from pipeline import llm
+from pipeline.speculation import Speculation
+from pipeline.slots import heavy_slot
+from pipeline.retention import RetentionManager
+from pipeline.startup import print_import_report
 from pathlib import Path
+import os
+import json
 import shutil
 import sys
-import time
-import asyncio
+import argparse
 
 # What the color codes mean:
 # WHITE: user input needed
@@ -24,90 +27,95 @@ init()
 
 # This class will be used to organize the brainrot project and will only be used for cleaning, organizing and managing the project not storing any data
 class Main_Organizer:
-	def __init__(self, path: str, browser: str, websites_to_scrape: list[str]) -> None:
+	def __init__(self, path: str, browser: str, websites_to_scrape: list[str], keywords: str = None, cleanup_delay: float = None) -> None:
 		self._path = path
 		self._browser = browser
 		self._websites_to_scrape = websites_to_scrape
+		self._keywords = keywords
+		self._cleanup_delay = cleanup_delay
 	
-	def get_keywords(self) -> None:
-		# Ask the user for the keywords
-		keywords = input("\nEnter topic related keywords or press ENTER to show every topic: ").lower()
-		splitted_keywords = keywords.split(" ")
+	def get_keywords(self) -> list[str]:
+		# Take the keywords of the job or ask the user for them
+		if self._keywords is not None:
+			keywords = self._keywords.lower()
+		else:
+			with console_lock:
+				keywords = input("\nEnter topic related keywords or press ENTER to show every topic: ").lower()
+		splitted_keywords = keywords.split()
 		return splitted_keywords
 	
-	def create_folders(self) -> None:
+	def create_folders(self, path: str = None) -> None:
 		"""
 		Create folders for the output files.
+		:param path: the output path of one short of a batch, the output path of the job if None
 		:return:
 		"""
-		print(Fore.GREEN + f"\nCreate folders for the output files called\n{self._path}/audio,\n{self._path}/visuals,\n{self._path}/visuals/images,\n{self._path}/visuals/videos,\n{self._path}/script\n{self._path}/upload" + Style.RESET_ALL)
-		directory = Path(f"{self._path}/audio").expanduser()
+		path = path or self._path
+		print(Fore.GREEN + f"\nCreate folders for the output files called\n{path}/audio,\n{path}/visuals,\n{path}/visuals/images,\n{path}/visuals/videos,\n{path}/script\n{path}/upload" + Style.RESET_ALL)
+		directory = Path(f"{path}/audio").expanduser()
 		directory.mkdir(parents=True, exist_ok=True)
-		directory = Path(f"{self._path}/visuals").expanduser()
+		directory = Path(f"{path}/visuals").expanduser()
 		directory.mkdir(parents=True, exist_ok=True)
-		directory = Path(f"{self._path}/visuals/images").expanduser()
+		directory = Path(f"{path}/visuals/images").expanduser()
 		directory.mkdir(parents=True, exist_ok=True)
-		directory = Path(f"{self._path}/visuals/videos").expanduser()
+		directory = Path(f"{path}/visuals/videos").expanduser()
 		directory.mkdir(parents=True, exist_ok=True)
-		directory = Path(f"{self._path}/visuals/final_images").expanduser()
+		directory = Path(f"{path}/visuals/final_images").expanduser()
 		directory.mkdir(parents=True, exist_ok=True)
-		directory = Path(f"{self._path}/visuals/final_videos").expanduser()
+		directory = Path(f"{path}/visuals/final_videos").expanduser()
 		directory.mkdir(parents=True, exist_ok=True)
-		directory = Path(f"{self._path}/script").expanduser()
+		directory = Path(f"{path}/script").expanduser()
 		directory.mkdir(parents=True, exist_ok=True)
-		directory = Path(f"{self._path}/upload").expanduser()
+		directory = Path(f"{path}/upload").expanduser()
 		directory.mkdir(parents=True, exist_ok=True)
 	
-	def _get_sleep_duration(self) -> int:
+	def _get_keep_duration(self) -> int:
 		"""
-		Get and validate sleep duration from user input
-		:return: Sleep duration in seconds
+		Get and validate how long the output is kept from user input
+		:return: Keep duration in seconds
 		"""
-		DEFAULT_SLEEP = 0  # 0 minutes in seconds
-		MAX_SLEEP = 120 * 60     # 2 hours max sleep time
+		DEFAULT_KEEP = 0  # 0 minutes in seconds
+		MAX_KEEP = 120 * 60     # 2 hours max keep time
 		
 		try:
-			sleep_input = input("\nTime to sleep before cleaning up the resources (in minutes) or ENTER for default (delete everything now): ").strip()
+			# In the headless mode the delay comes from the job
+			if self._cleanup_delay is not None:
+				return int(min(max(self._cleanup_delay, 0) * 60, MAX_KEEP))
+
+			keep_input = input("\nTime to keep the output before it is deleted (in minutes) or ENTER for default (delete everything now): ").strip()
 			
 			# Handle empty input
-			if not sleep_input:
-				print(Fore.GREEN + "\nUsing default sleep time of 30 minutes." + Style.RESET_ALL)
-				return DEFAULT_SLEEP
+			if not keep_input:
+				print(Fore.GREEN + "\nThe output is deleted now." + Style.RESET_ALL)
+				return DEFAULT_KEEP
 				
 			# Convert and validate input
-			minutes = float(sleep_input)
+			minutes = float(keep_input)
 			if minutes <= 0:
-				print(Fore.YELLOW + "\nInvalid sleep time. Using default of 30 minutes." + Style.RESET_ALL)
-				return DEFAULT_SLEEP
-			if minutes * 60 > MAX_SLEEP:
-				print(Fore.YELLOW + f"\nSleep time too long. Limiting to {MAX_SLEEP//60} minutes." + Style.RESET_ALL)
-				return MAX_SLEEP
+				print(Fore.YELLOW + "\nInvalid keep time. The output is deleted now." + Style.RESET_ALL)
+				return DEFAULT_KEEP
+			if minutes * 60 > MAX_KEEP:
+				print(Fore.YELLOW + f"\nKeep time too long. Limiting to {MAX_KEEP//60} minutes." + Style.RESET_ALL)
+				return MAX_KEEP
 				
 			return int(minutes * 60)
 			
 		except ValueError:
-			print(Fore.YELLOW + "\nInvalid input. Using default sleep time of 30 minutes." + Style.RESET_ALL)
-			return DEFAULT_SLEEP
+			print(Fore.YELLOW + "\nInvalid input. The output is deleted now." + Style.RESET_ALL)
+			return DEFAULT_KEEP
 
 	def clean_up_everything(self) -> None:
 		"""
-		Clean up all the resources used by the brainrot project
+		Hand the output over to the retention manager, it is deleted in the background once the keep time is over
+		or earlier if the disk fills up, so this returns right away
 		:return: 
 		"""
-		time_to_sleep = self._get_sleep_duration()
-		
-		try:
-			print(Fore.GREEN + f"\nSleeping for {time_to_sleep//60} minute(s) before cleaning up resources..." + Style.RESET_ALL)
-			time.sleep(time_to_sleep)
-		except KeyboardInterrupt:
-			print(Fore.YELLOW + "\nSleep interrupted. Starting cleanup..." + Style.RESET_ALL)
-		except Exception as e:
-			print(Fore.RED + f"\nError during sleep: {e}" + Style.RESET_ALL)
-
-		print(Fore.GREEN + "\nCleaning up resources." + Style.RESET_ALL)
+		time_to_keep = self._get_keep_duration()
 		
-		# Clean the main brainrot output directory
-		shutil.rmtree(Path(self._path).expanduser(), ignore_errors=True)
+		print(Fore.GREEN + f"\nThe output is deleted in the background in {time_to_keep//60} minute(s)." + Style.RESET_ALL)
+		retention = RetentionManager()
+		retention.register(self._path, time_to_keep)
+		retention.start_collector()
 		
 		# Remove all __pycache__ directories in voice_gathering and info_gathering and video_gathering
 		for folder in ["voice_gathering", "info_gathering", "visuals_gathering", "shorts_fusion", "music_selection", "yt_upload", "subtitles_gathering"]:
@@ -116,12 +124,18 @@ class Main_Organizer:
 	
 	def check_if_error_exit(self, returned_str: str) -> None:
 		"""
-		Exit the program with an error message
+		Exit the program with an error message.
+		The output is kept, running the same job again resumes at the first stage that is not up to date.
 		:return:
 		"""
 		if returned_str is None:
 			print(Fore.RED + "\nNothing -> (None) returned. Exiting..." + Style.RESET_ALL)
-			self.clean_up_everything()
+			print(Fore.YELLOW + f"\nThe finished stages are kept in {self._path}, run the same job again to resume." + Style.RESET_ALL)
+
+			# Failed runs are kept for the maximum age of the retention manager unless the disk fills up first
+			retention = RetentionManager()
+			retention.register(self._path)
+			retention.start_collector()
 			sys.exit(1)
 
 	# Signal handler function to catch SIGINT and SIGTERM
@@ -144,81 +158,338 @@ class Main_Organizer:
 		sys.exit(0)
 
 
-# In the main function we ask the user for the keywords and then call the scrape function
-def main() -> None:
+# In the batch mode every short has its own output folder inside the output path of the job
+def short_paths(path: str, shorts: int = None) -> list[str]:
+	"""
+	The output paths of the shorts of a job
+	:param path: output path of the job
+	:param shorts: how many shorts the batch mode makes, None for one short in the output path itself
+	:return: list of output paths
+	"""
+	if shorts is None:
+		return [path]
+	return [f"{path}/short_{number}" for number in range(1, shorts + 1)]
+
+# Build the stages of the pipeline with the files every stage reads and writes, the scheduler derives the order from them
+def build_stages(main_org: Main_Organizer, tracks: list[tuple[Language, str]], job: argparse.Namespace, speculated: Speculation = None) -> list[Stage]:
+	"""
+	Declare every stage of the pipeline with its inputs and outputs.
+	Scraping and the song selection are shared, the visuals are shared by the languages of a short, everything else runs once per language track.
+	In the batch mode (--shorts K) every scraped article becomes its own short, the K shorts share the scrape and the song.
+	The stage modules and their heavy dependencies are imported inside the stages, so skipped stages cost nothing at startup.
+	:param main_org: the main organizer of this run
+	:param tracks: every language with the client json of its youtube channel
+	:param job: the parsed command line with the decisions of the headless mode
+	:param speculated: where the voices and images made during the review of the scripts are kept, None to make nothing during it
+	:return: list of stages
+	"""
+	path = main_org._path
+	scraped_text = f"{path}/script/scraped.txt"
+	articles_json = f"{path}/script/articles.json"
+	selected_song = f"{path}/audio/selected_song.mp3"
+
+	# Create the scraper object that scrapes the websites. Then call the scrape function and check for return value
+	def scrape() -> None:
+		from info_gathering.scraper import Scraper
+		from info_gathering.story_index import workspace_id
+		scraper = Scraper(main_org._websites_to_scrape, main_org.get_keywords(), job.articles, workspace_id(main_org._path), distinct=job.shorts is not None)
+		articles = scraper.scrape_articles()
+		if articles is None:
+			raise ValueError("Nothing was scraped.")
+		# The articles are kept apart in both modes, so the stories of a finished short can be remembered
+		Path(articles_json).expanduser().write_text(json.dumps([{"url": url, "text": text} for url, text in articles.items()], indent=4))
+		if job.shorts is None:
+			Path(scraped_text).expanduser().write_text("\n".join(articles.values()))
+		elif len(articles) < job.shorts:
+			print(Fore.YELLOW + f"\nOnly {len(articles)} article(s) for {job.shorts} shorts were scraped." + Style.RESET_ALL)
+
+	# The stories of a short are remembered once every language of it is uploaded, a failed short can use them again
+	def remember_stories(number: int = None) -> None:
+		from info_gathering.story_index import remember, workspace_id
+		articles = json.loads(Path(articles_json).expanduser().read_text())
+		if number is not None:
+			articles = articles[number - 1:number]
+		remember({article["url"]: article["text"] for article in articles}, workspace_id(main_org._path))
+
+	# Select the background_music once, every language of every short cuts it to the length of its voice
+	def select_music() -> None:
+		from music_selection.selection import MusicSelection
+		music = MusicSelection(f"{path}/audio", job.music)
+		music.get_song()
+
+	stages = [
+		Stage("scrape", scrape, outputs=[scraped_text, articles_json] if job.shorts is None else [articles_json], params={"websites": main_org._websites_to_scrape, "keywords": job.keywords, "articles": job.articles}),
+		Stage("music", select_music, outputs=[selected_song], params={"music": job.music}),
+	]
+	if job.shorts is None:
+		uploaded = [f"{path}/upload/{language.name}_uploaded.json" for language, _ in tracks]
+		stages.append(Stage("remember", remember_stories, inputs=[articles_json] + uploaded))
+		return stages + build_short_stages(path, "", tracks, job, scraped_text, selected_song, speculated)
+
+	for number, short_path in enumerate(short_paths(path, job.shorts), start=1):
+		short_text = f"{short_path}/script/scraped.txt"
+
+		# Every short gets the text of one article
+		def take_article(number: int = number, short_text: str = short_text) -> None:
+			articles = json.loads(Path(articles_json).expanduser().read_text())
+			if number > len(articles):
+				raise ValueError(f"Only {len(articles)} article(s) were scraped, there is none for short {number}.")
+			print(Fore.GREEN + f"\nShort {number} is made from {articles[number - 1]['url']}" + Style.RESET_ALL)
+			Path(short_text).expanduser().write_text(articles[number - 1]["text"])
+
+		stages.append(Stage(f"article@short_{number}", take_article, inputs=[articles_json], outputs=[short_text]))
+		uploaded = [f"{short_path}/upload/{language.name}_uploaded.json" for language, _ in tracks]
+		stages.append(Stage(f"remember@short_{number}", lambda number=number: remember_stories(number), inputs=[articles_json] + uploaded))
+		stages.extend(build_short_stages(short_path, f"@short_{number}", tracks, job, short_text, selected_song, speculated))
+	return stages
+
+# Every short condenses its text, gets its own visuals and has a chain of stages per language
+def build_short_stages(path: str, suffix: str, tracks: list[tuple[Language, str]], job: argparse.Namespace, scraped_text: str, selected_song: str, speculated: Speculation = None) -> list[Stage]:
+	"""
+	Declare the stages of one short
+	:param path: output path of the short
+	:param suffix: added to every stage name, tells the shorts of a batch apart ("" for a single short)
+	:param tracks: every language with the client json of its youtube channel
+	:param job: the parsed command line with the decisions of the headless mode
+	:param scraped_text: path to the scraped text of the short
+	:param selected_song: path to the shared background music
+	:param speculated: see build_stages
+	:return: list of stages
+	"""
+	condensed_text = f"{path}/script/condensed.txt"
+	images = f"{path}/visuals/final_images"
+	visual_video = f"{path}/visuals/final_videos/final_visual.mp4"
+	scripts = {language.name: f"{path}/script/script_{language.name}.txt" for language, _ in tracks}
+	answers = {language.name: f"{path}/script/script_{language.name}.json" for language, _ in tracks}
+	voices = {language.name: f"{path}/audio/cleaned_output_{language.name}.mp3" for language, _ in tracks}
+
+	# Remove the boilerplate of the websites and cut the text to the token budget, every language sends only this to the LLM
+	def condense_text() -> None:
+		from info_gathering.condense import condense
+		Path(condensed_text).expanduser().write_text(condense(Path(scraped_text).expanduser().read_text(), job.token_budget))
+
+	# The images only need the english script and the length of the german voice
+	def visuals() -> None:
+		import asyncio
+		from visuals_gathering.get_visuals import VideoDownloader
+		shutil.rmtree(Path(images).expanduser(), ignore_errors=True)
+		Path(images).expanduser().mkdir(parents=True, exist_ok=True)
+		visual = VideoDownloader([f"{path}/visuals", path], scripts["english"], speculated)
+		asyncio.run(visual.orchastrate_image_getting())
+
+	# Fuse all images into one video that every language cuts to its own length
+	def visual_fusion() -> None:
+		from shorts_fusion.shorts_fusion import ShortFusion
+		fusion = ShortFusion(path)
+		with heavy_slot():
+			fusion.generate_video()
+
+	stages = [
+		Stage(f"condense{suffix}", condense_text, inputs=[scraped_text], outputs=[condensed_text], params={"token_budget": job.token_budget or os.environ.get("SHORTAUTOMATION_TOKEN_BUDGET")}),
+		Stage(f"visuals{suffix}", visuals, inputs=[scripts["english"], answers["english"], voices["german"]], outputs=[images]),
+		Stage(f"visual_fusion{suffix}", visual_fusion, inputs=[images], outputs=[visual_video]),
+	]
+	for language, youtube_account in tracks:
+		stages.extend(build_language_stages(path, suffix, language, youtube_account, job, condensed_text, selected_song, visual_video, speculated))
+	return stages
+
+# Every language track is its own chain of stages, so the tracks run at the same time once the shared files exist
+def build_language_stages(path: str, suffix: str, language: Language, youtube_account: str, job: argparse.Namespace, condensed_text: str, selected_song: str, visual_video: str, speculated: Speculation = None) -> list[Stage]:
+	"""
+	Declare the stages of one language track
+	:param path: output path of the short
+	:param suffix: added to every stage name, see build_short_stages
+	:param language: the language of the track
+	:param youtube_account: client json of the youtube channel of the language
+	:param job: the parsed command line with the decisions of the headless mode
+	:param condensed_text: path to the shared scraped text without boilerplate
+	:param selected_song: path to the shared background music
+	:param visual_video: path to the shared video made from all images
+	:param speculated: see build_stages
+	:return: list of stages
+	"""
+	name = language.name
+	script = f"{path}/script/script_{name}.txt"
+	answer = f"{path}/script/script_{name}.json"
+	voice = f"{path}/audio/cleaned_output_{name}.mp3"
+	song = f"{path}/audio/cut_song_{name}.mp3"
+	subtitle = f"{path}/subtitles/cleaned_output_{name}.srt"
+	video = f"{path}/upload/{name}_video.mp4"
+	uploaded = f"{path}/upload/{name}_uploaded.json"
+
+	# While a script is reviewed its voice and (if it has image prompts) its images are already made,
+	# the voice and the visuals stage adopt them if the script is accepted
+	def speculate(answer: dict):
+		from voice_gathering.get_voice import speculate_voice
+		result_keys = speculate_voice(speculated, answer["script"])
+		if answer.get("image_prompts"):
+			from visuals_gathering.get_visuals import speculate_images
+			result_keys += speculate_images(speculated, answer["script"], answer["image_prompts"])
+		return lambda: speculated.discard(result_keys)
+
+	# Call the gpt_rewrite function, the title and (for the english script that the visuals use) the image prompts come with it
+	def rewrite() -> None:
+		from info_gathering.gpt_rewrite import GPTCaller
+		gpt = GPTCaller([script], [language.prompt_name], auto_accept=job.headless, image_prompts=name == "english", speculate=speculate if speculated else None)
+		gpt.rewrite(Path(condensed_text).expanduser().read_text())
+
+	# Stream the script into the voice, the voice of the first sentences is generated while the rest is still written
+	def rewrite_and_voice() -> None:
+		from info_gathering.gpt_rewrite import GPTCaller
+		from voice_gathering.get_voice import VoiceCaller
+		gpt = GPTCaller([script], [language.prompt_name], auto_accept=True, image_prompts=name == "english")
+		audio = VoiceCaller([script], [f"{path}/audio/output_{name}.mp3"])
+		audio.get_voice_streamed(gpt.stream_sentences(Path(condensed_text).expanduser().read_text()))
+
+	# Generate the ai-voice
+	def get_voice() -> None:
+		from voice_gathering.get_voice import VoiceCaller
+		audio = VoiceCaller([script], [f"{path}/audio/output_{name}.mp3"], speculated)
+		audio.get_voice()
+
+	# Cut the background_music, it only needs the length of the voice
+	def cut_music() -> None:
+		from music_selection.selection import MusicSelection
+		music = MusicSelection(f"{path}/audio")
+		music.cut_song_len(name, selected_song)
+
+	# Get the subtitles as a .srt file to later use it with ffmpeg
+	def get_subtitles() -> None:
+		from subtitles_gathering.subtitles import SubtitleGenerator
+		subtitles = SubtitleGenerator([language], path)
+		subtitles.get_subtitles()
+
+	# Here we call the fusion class that uses ffmpeg to fuse everything from audio over subtitles over visuals together in one mp4 video.
+	def fusion() -> None:
+		from shorts_fusion.shorts_fusion import ShortFusion
+		fusion = ShortFusion(path)
+		fusion.fuse_language(name, os.path.expanduser(visual_video))
+
+	# Call the upload_to_youtube functions that automatically uploads the video as you like
+	def upload() -> None:
+		from yt_upload.upload_to_youtube import YoutubeUploader
+		uploader = YoutubeUploader(f"{path}/upload", [youtube_account], [script], [language], job.publish_in_days)
+		video_ids = uploader.upload_to_youtube()
+		Path(uploaded).expanduser().write_text(json.dumps({"video_ids": video_ids}))
+
+	if job.stream_voice:
+		script_stages = [Stage(f"rewrite_voice:{name}{suffix}", rewrite_and_voice, inputs=[condensed_text], outputs=[script, answer, voice], params={"language": language.prompt_name})]
+	else:
+		script_stages = [
+			Stage(f"rewrite:{name}{suffix}", rewrite, inputs=[condensed_text], outputs=[script, answer], params={"language": language.prompt_name}),
+			Stage(f"voice:{name}{suffix}", get_voice, inputs=[script], outputs=[voice]),
+		]
+	return script_stages + [
+		Stage(f"music:{name}{suffix}", cut_music, inputs=[voice, selected_song], outputs=[song]),
+		Stage(f"subtitles:{name}{suffix}", get_subtitles, inputs=[voice], outputs=[subtitle], params={"code": language.code}),
+		Stage(f"fusion:{name}{suffix}", fusion, inputs=[voice, song, subtitle, visual_video], outputs=[video]),
+		Stage(f"upload:{name}{suffix}", upload, inputs=[video, script, answer], outputs=[uploaded], params={"account": youtube_account}),
+	]
+
+# Read the command line, the german and english channel are positional, every other language is added with --language
+def parse_args(argv: list[str] = None) -> argparse.Namespace:
+	"""
+	Parse the command line arguments of main.py
+	:param argv: the arguments, sys.argv[1:] if not given
+	:return: the parsed arguments
+	"""
+	parser = argparse.ArgumentParser(prog="main.py", description="Create one short per language from the scraped websites")
+	parser.add_argument("path", help="where all the output is saved")
+	parser.add_argument("browser", help="chrome or firefox")
+	parser.add_argument("youtube_german", help="client json of the german channel")
+	parser.add_argument("youtube_english", help="client json of the english channel")
+	parser.add_argument("websites", nargs="+", help="websites to scrape")
+	parser.add_argument("--trace", metavar="PATH", help="write a Chrome trace of every stage and external call to PATH")
+	parser.add_argument("--language", action="append", default=[], metavar="LANGUAGE=CLIENT_JSON", help="additional language track and the client json of its channel, can be given more than once")
+
+	# Every decision that is otherwise asked with input(), the headless mode fills in the ones that are not given
+	parser.add_argument("--headless", action="store_true", help="never ask, use the options below or the automatic defaults")
+	parser.add_argument("--keywords", help="topic related keywords, separated by spaces")
+	parser.add_argument("--articles", type=int, help="take the first N sublinks instead of picking them")
+	parser.add_argument("--music", help="file name of the background song, 'random' or 'default'")
+	parser.add_argument("--publish-in-days", type=int, help="publish the videos in N days (0-6)")
+	parser.add_argument("--cleanup-delay", type=float, help="minutes to keep the output before it is deleted in the background")
+	parser.add_argument("--shorts", type=int, metavar="K", help="batch mode, make K shorts from K articles of one scrape, each in <path>/short_<n>")
+	parser.add_argument("--stream-voice", action="store_true", help="headless only, generate the voice sentence by sentence while the script is streamed")
+	parser.add_argument("--token-budget", type=int, help="how many tokens of the scraped text are sent to the LLM (default $SHORTAUTOMATION_TOKEN_BUDGET or 1200)")
+	args = parser.parse_args(argv)
+	if args.shorts is not None and args.shorts < 1:
+		parser.error("--shorts needs at least 1")
+	if args.stream_voice and not args.headless:
+		# The script has to be reviewed before the voice is generated
+		print(Fore.YELLOW + "\n--stream-voice only works with --headless, the script is reviewed first." + Style.RESET_ALL)
+		args.stream_voice = False
+
+	if args.headless:
+		args.keywords = "" if args.keywords is None else args.keywords
+		# Without keywords the top links are about unrelated topics, merged into one script they make no sense
+		if args.articles is None:
+			args.articles = args.shorts or (3 if args.keywords.strip() else 1)
+		args.music = "default" if args.music is None else args.music
+		args.publish_in_days = 0 if args.publish_in_days is None else args.publish_in_days
+		args.cleanup_delay = 0 if args.cleanup_delay is None else args.cleanup_delay
+	return args
+
+# In the main function we build the stages and let the scheduler run them
+def main(argv: list[str] = None) -> None:
 	"""
 	Main function to run the brainrot project
+	:param argv: the command line arguments, sys.argv[1:] if not given (the worker passes the ones of the job)
 	:return:
 	"""
 	try:
-		#read the args and safe them in the main organizer object. Create the main organizer object that helps to organize the main func. 
-		args = sys.argv[1:]
-		if len(args) < 2:
-			print(Fore.RED + "Usage of the program: python3 main.py <path_of_where_to_safe_it> <from here on websites to scrape> ..." + Style.RESET_ALL)
+		# Only print what the imports cost, needs no other arguments
+		if "--import-report" in (sys.argv[1:] if argv is None else argv):
+			print_import_report()
 			return
-		main_org = Main_Organizer(sys.argv[1], sys.argv[2], sys.argv[5:])
-		
-		# Call the create_folders function
-		main_org.create_folders()
 
-		# Create the scraper object that scrapes the websites. Then call the scrape function and check for return value
-		scraper = Scraper(main_org._websites_to_scrape, main_org.get_keywords())
-		script = scraper.scrape()
-		main_org.check_if_error_exit(script)
+		#read the args and safe them in the main organizer object. Create the main organizer object that helps to organize the main func. 
+		args = parse_args(argv)
+		main_org = Main_Organizer(args.path, args.browser, args.websites, args.keywords, args.cleanup_delay)
+		tracks = [(get_language("german"), args.youtube_german), (get_language("english"), args.youtube_english)]
+		for extra in args.language:
+			language, _, youtube_account = extra.partition("=")
+			tracks.append((get_language(language), youtube_account))
 		
-		# Call the gpt_rewrite function and check for return value
-		gpt = GPTCaller([main_org._path + "/script/script_german.txt", main_org._path + "/script/script_english.txt"], ["deutsch", "englisch"])
-		paths_to_scripts = gpt.rewrite(script)
+		# Record every stage and external call if a trace is wanted, the trace is written however the run ends
+		if args.trace:
+			tracing.current().enable(f"main.py {args.path}")
 
-		# Do all the audio related stuff like generating the ai-voices, preparing the background_music
 		try:
-			audio = VoiceCaller(paths_to_scripts, [main_org._path + "/audio/output_german.mp3", main_org._path + "/audio/output_english.mp3"])
-			audio.get_voice()
-			music = MusicSelection(main_org._path + "/audio")
-			music.get_song()
-		except Exception as e:
-			print(Fore.RED + f"\n{e}\n" + Style.RESET_ALL)
-			main_org.check_if_error_exit(None)
-			return
-		
-		# Get the subtitles as a .srt file to later use it with ffmpeg
-		try:
-			subtitles = SubtitleGenerator(["de", "en"], main_org._path)
-			subtitles.get_subtitles()
-		except Exception as e:
-			print(Fore.RED + f"\n{e}\n" + Style.RESET_ALL)
-			main_org.check_if_error_exit(None)
-			return
-		
-		# Call the get_cc_vids function
-		try:
-			visual = VideoDownloader([main_org._path + "/visuals", main_org._path] , paths_to_scripts[1])
-			asyncio.run(visual.orchastrate_image_getting())
-		except Exception as e:
-			print(Fore.RED + f"\n{e}\n" + Style.RESET_ALL)
-			main_org.check_if_error_exit(None)
-			return
+			# A workspace that is kept from an earlier run must not be deleted while this run resumes it
+			RetentionManager().release(args.path)
 
-		# Here we call the fusion class that uses ffmpeg to fuse everything from audio over subtitles over visuals together in one mp4 video.	
-		try:
-			fusion = ShortFusion(main_org._path)
-			fusion.orchestrate_fusion() #(need to move the finished file into uploads with the names language_output.mp4)
-		except Exception as e:
-			print(Fore.RED + f"\n{e}\n" + Style.RESET_ALL)
-			main_org.check_if_error_exit(None)
-			return
-		
-		# Call the upload_to_youtube functions that automatically uploads the video as you like
-		try:
-			uploader = YoutubeUploader(main_org._path + "/upload", [sys.argv[3], sys.argv[4]], main_org._path + "/script/script_english.txt")
-			uploader.upload_to_youtube()
-		except Exception as e:
-			print(Fore.RED + f"\n{e}\n" + Style.RESET_ALL)
-			main_org.check_if_error_exit(None)
-			return
-		
-		# Clean up the resources
-		main_org.clean_up_everything()
+			# Call the create_folders function
+			main_org.create_folders()
+			if args.shorts is not None:
+				for short_path in short_paths(args.path, args.shorts):
+					main_org.create_folders(short_path)
+
+			# Run every stage as soon as the stages it depends on are finished, the language tracks run next to each other.
+			# Stages that already finished in an earlier run of the same job with the same inputs are skipped
+			llm_usage = llm.usage()
+			speculated = Speculation()
+			try:
+				stages = build_stages(main_org, tracks, args, speculated)
+				# The shorts of a batch are independent, a failed short does not stop the others
+				scheduler = StageScheduler(stages, max_workers=len(stages), checkpoints=CheckpointStore(main_org._path), keep_going=args.shorts is not None)
+				with tracing.span("pipeline", "run"):
+					scheduler.run()
+			except StageError as e:
+				print(Fore.RED + f"\n{e}\n" + Style.RESET_ALL)
+				speculated.close()
+				llm.print_usage(llm_usage)
+				main_org.check_if_error_exit(None)
+				return
+			speculated.close()
+			llm.print_usage(llm_usage)
+			
+			# Clean up the resources
+			with tracing.span("cleanup", "run"):
+				main_org.clean_up_everything()
+		finally:
+			if args.trace:
+				tracing.current().save(args.trace)
 
 	except KeyboardInterrupt:
 		pass
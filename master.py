@@ -1,9 +1,18 @@
+import os
 import re
+import json
 import signal
+import argparse
+import tempfile
+import threading
 import subprocess
 import sys
 import shutil
 from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+from pipeline.slots import HEAVY_SLOTS_ENV, SLOT_DIR_ENV
+from pipeline import tracing
+from pipeline.retention import RetentionManager
 from colorama import Fore, Style, init
 
 # Initialize colorama
@@ -16,6 +25,10 @@ class MasterOrganizer:
 		self._youtube_german = []
 		self._youtube_english = []
 		self._websites = []
+		self._languages = []
+		self._options = []
+		self._processes = []
+		self._lock = threading.RLock()
 
 	# Load the program arguments into the master organizer object
 	def load_args_into_master_org(self) -> None:
@@ -33,6 +46,8 @@ class MasterOrganizer:
 				block_youtube_german = None
 				block_youtube_english = None
 				block_websites = []
+				block_languages = []
+				block_options = []
 
 				# Parse each line with the regex
 				for line in block.strip().splitlines():
@@ -58,6 +73,16 @@ class MasterOrganizer:
 							if block_youtube_english is not None:
 								raise ValueError("Error: Block contains more than one YouTube English parameter.")
 							block_youtube_english = value
+						elif key == "headless":  # Never ask anything, see main.py --headless
+							if value.lower() in ("true", "yes", "1"):
+								block_options.append("--headless")
+						elif key == "stream_voice":  # Voice while the script is generated, see main.py --stream-voice
+							if value.lower() in ("true", "yes", "1"):
+								block_options.append("--stream-voice")
+						elif key in ("keywords", "articles", "music", "publish_in_days", "cleanup_delay", "token_budget", "shorts"):
+							block_options.extend([f"--{key.replace('_', '-')}", value])
+						elif key.startswith("youtube_"):  # Every other language track, e.g. youtube_french
+							block_languages.append(f"{key[len('youtube_'):]}={value}")
 
 				# Check for missing dir
 				if block_dir is None:
@@ -73,6 +98,126 @@ class MasterOrganizer:
 				self._youtube_german.append(block_youtube_german)
 				self._youtube_english.append(block_youtube_english)
 				self._websites.append(block_websites)
+				self._languages.append(block_languages)
+				self._options.append(block_options)
+
+	# Run main.py for one block and return its exit code
+	def run_block(self, i: int, log_dir: Path = None, trace_dir: Path = None) -> int:
+		"""
+		Run main.py for the block at index i.
+		:param i: index of the block
+		:param log_dir: if given the output of the block is written into its own log file instead of the terminal
+		:param trace_dir: if given main.py writes its trace into this directory
+		:return: exit code of main.py
+		"""
+		path = self._directory[i]
+		print(Fore.GREEN + f"\nRunning main.py with path={path},\nbrowser={self._browser[i]},\nYouTube German={self._youtube_german[i]},\nYouTube English={self._youtube_english[i]}\nand website(s)={self._websites[i]}" + Style.RESET_ALL)
+
+		# Build command with all parameters, in the concurrent mode nobody can answer prompts so every block runs headless
+		command = [sys.executable, "main.py", *self.block_arguments(i, log_dir is not None, trace_dir)]
+
+		# Run command, in the concurrent mode nobody can answer prompts so stdin is closed
+		if log_dir is None:
+			process = subprocess.Popen(command)
+		else:
+			log_path = log_dir / f"{i}_{Path(path).expanduser().name}.log"
+			with open(log_path, "w") as log_file:
+				process = subprocess.Popen(command, stdin=subprocess.DEVNULL, stdout=log_file, stderr=subprocess.STDOUT)
+			print(Fore.GREEN + f"\nOutput of {path} is written to {log_path}" + Style.RESET_ALL)
+		with self._lock:
+			self._processes.append(process)
+		with tracing.span(f"block {path}", "block") as info:
+			exit_code = process.wait()
+			info["exit_code"] = exit_code
+
+		if exit_code == 0:
+			print(Fore.GREEN + f"\nmain.py finished processing {path}." + Style.RESET_ALL)
+		else:
+			print(Fore.RED + f"\nmain.py failed processing {path} with exit code {exit_code}." + Style.RESET_ALL)
+		return exit_code
+
+	def block_arguments(self, i: int, headless: bool = False, trace_dir: Path = None) -> list[str]:
+		"""
+		The arguments of main.py for the block at index i
+		:param i: index of the block
+		:param headless: run the block headless even if the block does not say so
+		:param trace_dir: if given main.py writes its trace into this directory
+		:return: the arguments without the interpreter and main.py
+		"""
+		arguments = [
+			self._directory[i],
+			self._browser[i] or "",
+			self._youtube_german[i] or "",
+			self._youtube_english[i] or ""
+		]
+
+		# Add all websites
+		arguments.extend(self._websites[i])
+
+		# Add every additional language track
+		for language in self._languages[i]:
+			arguments.extend(["--language", language])
+
+		# Add the decisions of the job
+		arguments.extend(self._options[i])
+		if headless and "--headless" not in arguments:
+			arguments.append("--headless")
+		if trace_dir is not None:
+			arguments.extend(["--trace", str(self.trace_path(i, trace_dir))])
+		return arguments
+
+	# Let a running worker (worker.py) run every block and return their exit codes
+	def run_blocks_on_worker(self, socket_path: str, log_dir: Path, trace_dir: Path = None) -> list[int]:
+		"""
+		Submit every block to the worker at once, the worker decides how many run at the same time.
+		The worker keeps its imports, connections and the whisper model warm between the blocks.
+		:param socket_path: the socket of the worker
+		:param log_dir: where the output of every block is written
+		:param trace_dir: if given main.py writes its trace into this directory
+		:return: exit code of every block
+		"""
+		from worker import request
+
+		jobs = []
+		for i, path in enumerate(self._directory):
+			log_path = log_dir.resolve() / f"{i}_{Path(path).expanduser().name}.log"
+			jobs.append(request(socket_path, {"cmd": "submit", "argv": self.block_arguments(i, True, trace_dir and trace_dir.resolve()), "log": str(log_path)}))
+			print(Fore.GREEN + f"\nSubmitted {path} as job {jobs[-1]['id']}, its output is written to {log_path}" + Style.RESET_ALL)
+
+		exit_codes = []
+		for path, job in zip(self._directory, jobs):
+			with tracing.span(f"block {path}", "block") as info:
+				exit_code = request(socket_path, {"cmd": "wait", "id": job["id"]})["exit_code"]
+				info["exit_code"] = exit_code
+			if exit_code == 0:
+				print(Fore.GREEN + f"\nThe worker finished processing {path}." + Style.RESET_ALL)
+			else:
+				print(Fore.RED + f"\nThe worker failed processing {path} with exit code {exit_code}." + Style.RESET_ALL)
+			exit_codes.append(exit_code)
+		return exit_codes
+
+	def trace_path(self, i: int, trace_dir: Path) -> Path:
+		"""
+		Where main.py of the block at index i writes its trace
+		"""
+		return trace_dir / f"{i}_{Path(self._directory[i]).expanduser().name}.json"
+
+	def aggregate_traces(self, trace_dir: Path) -> None:
+		"""
+		Put the traces of all blocks and the one of master.py into one trace file, every block is its own process in it
+		:param trace_dir: directory with the traces of the blocks
+		:return:
+		"""
+		events = tracing.tracer.events()
+		for i in range(len(self._directory)):
+			try:
+				with open(self.trace_path(i, trace_dir), "r") as file:
+					events.extend(json.load(file)["traceEvents"])
+			except (FileNotFoundError, json.JSONDecodeError, KeyError):
+				print(Fore.YELLOW + f"\nNo trace found for {self._directory[i]}, skipping it." + Style.RESET_ALL)
+		with open(trace_dir / "master.json", "w") as file:
+			json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, file)
+		print(Fore.GREEN + f"\nTrace of all blocks written to {trace_dir / 'master.json'}" + Style.RESET_ALL)
 
 	# Signal handler function to catch SIGINT and SIGTERM
 	def signal_handler(self, sig, frame):
@@ -84,15 +229,25 @@ class MasterOrganizer:
 		"""
 		print(Fore.GREEN + "\n\nSIGINT or SIGTERM received. Cleaning up resources." + Style.RESET_ALL)
 
-		# Clean the directories from self._directory
+		# Stop every main.py that is still running
+		with self._lock:
+			for process in self._processes:
+				if process.poll() is None:
+					process.terminate()
+			for process in self._processes:
+				try:
+					process.wait(timeout=10)
+				except subprocess.TimeoutExpired:
+					process.kill()
+
+		# The directories are kept so the blocks can be resumed from their checkpoints, the retention manager deletes them
+		# once they are too old or the disk fills up
+		retention = RetentionManager()
 		for directory in self._directory:
-			try:
-				shutil.rmtree(Path(directory).expanduser())
-				print(Fore.GREEN + f"\nDeleted directory: {directory}" + Style.RESET_ALL)
-			except FileNotFoundError:
-				print(Fore.YELLOW + f"\nDirectory not found: {directory}, skipping." + Style.RESET_ALL)
-			except PermissionError:
-				print(Fore.RED + f"\nInsufficient permissions to delete: {directory}" + Style.RESET_ALL)
+			if Path(directory).expanduser().is_dir():
+				retention.register(directory)
+				print(Fore.GREEN + f"\nKept directory: {directory}, run the same block again to resume it." + Style.RESET_ALL)
+		retention.start_collector()
 
 		# Remove __pycache__ directories
 		for folder in ["voice_gathering", "info_gathering", "visuals_gathering", "shorts_fusion", "music_selection", "subtitles_gathering", "yt_upload"]:
@@ -103,6 +258,20 @@ class MasterOrganizer:
 
 def master() -> None:
 
+    # Parse the options for the concurrent mode
+    parser = argparse.ArgumentParser(description="Run main.py for every block in program_args.txt")
+    parser.add_argument("--workers", type=int, default=1, help="how many blocks run at the same time (1 = one after another like before)")
+    parser.add_argument("--heavy-workers", type=int, default=1, help="how many ffmpeg/whisper heavy steps may run at the same time across all blocks")
+    parser.add_argument("--log-dir", default="logs", help="where the output of every block is written when more than one worker is used")
+    parser.add_argument("--trace-dir", help="write a Chrome trace of every block and one of all blocks together (master.json) into this directory")
+    parser.add_argument("--worker", metavar="SOCKET", help="let the worker listening on this socket run the blocks (see worker.py), --workers and --heavy-workers are then set by the worker")
+    options = parser.parse_args()
+    trace_dir = None
+    if options.trace_dir:
+        trace_dir = Path(options.trace_dir).expanduser()
+        trace_dir.mkdir(parents=True, exist_ok=True)
+        tracing.tracer.enable("master.py")
+
     # Create an instance of the MasterOrganizer class
     master_org = MasterOrganizer()
     master_org.load_args_into_master_org()
@@ -111,27 +280,44 @@ def master() -> None:
     signal.signal(signal.SIGINT, master_org.signal_handler)
     signal.signal(signal.SIGTERM, master_org.signal_handler)
 
-    # Run main.py with the paths, browser, YouTube links and websites
-    for i, path in enumerate(master_org._directory):
-        print(Fore.GREEN + f"\nRunning main.py with path={path},\nbrowser={master_org._browser[i]},\nYouTube German={master_org._youtube_german[i]},\nYouTube English={master_org._youtube_english[i]}\nand website(s)={master_org._websites[i]}" + Style.RESET_ALL)
-        
-        # Build command with all parameters
-        command = [
-            "python3", 
-            "main.py", 
-            path, 
-            master_org._browser[i] or "",
-            master_org._youtube_german[i] or "",
-            master_org._youtube_english[i] or ""
-        ]
-        
-        # Add all websites
-        command.extend(master_org._websites[i])
-        
-        # Run command
-        subprocess.run(command)
-        
-        print(Fore.GREEN + f"\nmain.py finished processing {path}." + Style.RESET_ALL)
+    # The heavy slots are lock files that every spawned main.py shares
+    slot_dir = tempfile.mkdtemp(prefix="shortautomation_slots_")
+    os.environ[HEAVY_SLOTS_ENV] = str(max(1, options.heavy_workers))
+    os.environ[SLOT_DIR_ENV] = slot_dir
+
+    # Run main.py with the paths, browser, YouTube links and websites, in parallel if wanted
+    try:
+        if options.worker:
+            log_dir = Path(options.log_dir).expanduser()
+            log_dir.mkdir(parents=True, exist_ok=True)
+            try:
+                exit_codes = master_org.run_blocks_on_worker(options.worker, log_dir, trace_dir)
+            except (ConnectionRefusedError, FileNotFoundError):
+                print(Fore.RED + f"\nNo worker is listening on {options.worker}, start one with: python3 worker.py serve" + Style.RESET_ALL)
+                sys.exit(1)
+        elif options.workers <= 1:
+            exit_codes = [master_org.run_block(i, trace_dir=trace_dir) for i in range(len(master_org._directory))]
+        else:
+            log_dir = Path(options.log_dir).expanduser()
+            log_dir.mkdir(parents=True, exist_ok=True)
+            with ThreadPoolExecutor(max_workers=options.workers) as executor:
+                exit_codes = list(executor.map(lambda i: master_org.run_block(i, log_dir, trace_dir), range(len(master_org._directory))))
+    finally:
+        shutil.rmtree(slot_dir, ignore_errors=True)
+
+    # Put the traces of all blocks together
+    if trace_dir is not None:
+        master_org.aggregate_traces(trace_dir)
+
+    # Report how every block ended
+    print(Fore.GREEN + "\nSummary of all blocks:" + Style.RESET_ALL)
+    for path, exit_code in zip(master_org._directory, exit_codes):
+        if exit_code == 0:
+            print(Fore.GREEN + f"{path}: finished (exit code 0)" + Style.RESET_ALL)
+        else:
+            print(Fore.RED + f"{path}: failed (exit code {exit_code})" + Style.RESET_ALL)
+    if any(exit_code != 0 for exit_code in exit_codes):
+        sys.exit(1)
 
 if __name__ == "__main__":
-	master()
\ No newline at end of file
+	master()
@@ -1,81 +1,101 @@
 import os
+import random
 from pathlib import Path
 from colorama import Fore, Style
 import subprocess
+from pipeline.slots import heavy_slot
+from pipeline import tracing
+from pipeline.console import console_lock
 
 class MusicSelection:
-	def __init__(self, output_path: str) -> None:
+	def __init__(self, output_path: str, song: str = None) -> None:
+		"""
+		:param output_path: the audio folder of the job
+		:param song: rule for the headless mode, the file name of a song, "random" or "default", None asks the user
+		"""
 		self._output_path = Path(output_path).expanduser()
+		self._song = song
 	
 	def cp_song_to_output(self, music_file: str) -> None:
 		"""
-		Copy the selected song to the output path.
+		Copy the selected song to the output path as selected_song.mp3 so every language track can cut it.
 		"""
 		# Copy the selected song to the output path
 		command = [
 			"cp",
 			music_file,
-			self._output_path
+			self._output_path / "selected_song.mp3"
 		]
 		try:
-			subprocess.run(command, check=True)
+			tracing.run(command, check=True)
 		except subprocess.CalledProcessError as e:
 			print(Fore.RED + f"\nFailed to copy {music_file} to {self._output_path}." + Style.RESET_ALL)
 			return
 		print(Fore.GREEN + f"\nSong copied: {music_file} -> {self._output_path}" + Style.RESET_ALL)
 
-	def cut_song_len(self, song: str) -> None:
+	def cut_song_len(self, language: str, selected_song: str = None) -> None:
 		"""
-		Get the duration of the voice_audio and cut the song accordingly.
+		Get the duration of the voice_audio of one language and cut the selected song accordingly.
+		:param language: name of the language track, e.g. german
+		:param selected_song: the song to cut, selected_song.mp3 of the output path if None (shorts of a batch share one song)
 		:return: None
 		"""
-		voice_files = [self._output_path / "cleaned_output_german.mp3", self._output_path / "cleaned_output_english.mp3"]
-		output_file_names = ["cut_song_german.mp3", "cut_song_english.mp3"]
+		voice_file = self._output_path / f"cleaned_output_{language}.mp3"
+		output_file_name = f"cut_song_{language}.mp3"
 		duration = 0
-		cut_success = True  # Track if all cuts were successful
 
 		# Get the duration of the voice_audio to then cut the song to the same length
-		for voice_file, output_file_name in zip(voice_files, output_file_names):
-			result = subprocess.run(
-				[
-					"ffprobe",
-					"-v", "error",
-					"-show_entries", "format=duration",
-					"-of", "default=noprint_wrappers=1:nokey=1",
-					voice_file
-				],
-				stdout=subprocess.PIPE,
-				stderr=subprocess.STDOUT,
-				text=True
-			)
-			try:
-				tmp_duration = float(result.stdout.strip())
-				duration = int(tmp_duration)
-			except ValueError:
-				print("Could not retrieve duration.")
-			
-			# Cut the song to the duration of the voice_audio
-			command = [
-				"ffmpeg",
-				"-i", str(self._output_path / song),
-				"-t", str(duration),
-				"-y",
-				str(self._output_path / output_file_name)
-			]
-			try:
-				subprocess.run(command, check=True)
-			except subprocess.CalledProcessError as e:
-				print(Fore.RED + f"\nFailed to cut {song} to {duration} seconds." + Style.RESET_ALL)
-				cut_success = False
+		result = tracing.run(
+			[
+				"ffprobe",
+				"-v", "error",
+				"-show_entries", "format=duration",
+				"-of", "default=noprint_wrappers=1:nokey=1",
+				voice_file
+			],
+			stdout=subprocess.PIPE,
+			stderr=subprocess.STDOUT,
+			text=True
+		)
+		try:
+			tmp_duration = float(result.stdout.strip())
+			duration = int(tmp_duration)
+		except ValueError:
+			print("Could not retrieve duration.")
 		
-		# Delete original file only after all cuts are complete and successful
-		if cut_success and os.path.exists(self._output_path / song):
-			os.remove(self._output_path / song)
-			print(Fore.GREEN + f"\nDeleted original file: {self._output_path / song}" + Style.RESET_ALL)
+		# Cut the song to the duration of the voice_audio
+		command = [
+			"ffmpeg",
+			"-i", str(Path(selected_song).expanduser() if selected_song else self._output_path / "selected_song.mp3"),
+			"-t", str(duration),
+			"-y",
+			str(self._output_path / output_file_name)
+		]
+		try:
+			with heavy_slot():
+				tracing.run(command, check=True)
+		except subprocess.CalledProcessError as e:
+			print(Fore.RED + f"\nFailed to cut the song to {duration} seconds for {language}." + Style.RESET_ALL)
 		
+	def __pick_song_by_rule_(self, songs: list[str]) -> str:
+		"""
+		Pick a song without asking, by file name, at random or the default one (the same as pressing ENTER)
+		:param songs: all songs in the music folder
+		:return: the file name of the picked song
+		"""
+		if self._song == "random":
+			return random.choice(songs)
+		for song in songs:
+			if self._song in (song, Path(song).stem):
+				return song
+		if self._song != "default":
+			print(Fore.YELLOW + f"\nSong {self._song} not found, using the default music." + Style.RESET_ALL)
+		return songs[-1]
+
 	def get_song(self) -> str:
 		"""
 		Lists all songs in the music folder and asks the user to select one.
+		The selected song is copied to the output path, every language track cuts it with cut_song_len.
 		Returns the full path of the selected song.
 		"""
 		# Define the music folder path relative to this file
@@ -90,24 +110,31 @@ class MusicSelection:
 			print(Fore.YELLOW + "\nNo songs found in the music folder." + Style.RESET_ALL)
 			return ""
 
-		# Display the songs with index numbers
-		print(Fore.GREEN + "\nAvailable songs:\n" + Style.RESET_ALL)
-		for idx, song in enumerate(songs):
-			print(Fore.GREEN + f"{idx}. {song}" + Style.RESET_ALL)
+		# In the headless mode the song comes from the rule of the job
+		if self._song is not None:
+			selected_song = music_folder / self.__pick_song_by_rule_(songs)
+			self.cp_song_to_output(selected_song)
+			return str(selected_song)
+
+		# Display the songs and ask, other language tracks wait with their questions
+		with console_lock:
+			# Display the songs with index numbers
+			print(Fore.GREEN + "\nAvailable songs:\n" + Style.RESET_ALL)
+			for idx, song in enumerate(songs):
+				print(Fore.GREEN + f"{idx}. {song}" + Style.RESET_ALL)
 
-		# Ask user for selection
-		while True:
-			try:
-				choice = input("\nEnter the number of the song to select or press ENTER for default music: ")
-				if (choice == ""):
-					choice = len(songs) - 1
-				index = int(choice)
-				if 0 <= index < len(songs):
-					selected_song = music_folder / songs[index]
-					self.cp_song_to_output(selected_song)
-					self.cut_song_len(songs[index])
-					break
-				else:
-					print("\nInvalid selection. Please choose a valid number.")
-			except ValueError:
-				print("\nPlease enter a number.")
+			# Ask user for selection
+			while True:
+				try:
+					choice = input("\nEnter the number of the song to select or press ENTER for default music: ")
+					if (choice == ""):
+						choice = len(songs) - 1
+					index = int(choice)
+					if 0 <= index < len(songs):
+						selected_song = music_folder / songs[index]
+						self.cp_song_to_output(selected_song)
+						return str(selected_song)
+					else:
+						print("\nInvalid selection. Please choose a valid number.")
+				except ValueError:
+					print("\nPlease enter a number.")
@@ -0,0 +1,116 @@
+import os
+import json
+import hashlib
+import threading
+from colorama import Fore, Style
+
+class CheckpointStore:
+	"""
+	Remembers for every finished stage a hash of its inputs and parameters and the hashes of its outputs.
+	The manifest lives inside the output directory, so rerunning the same job skips every stage that is still up to date.
+	"""
+	def __init__(self, path: str) -> None:
+		"""
+		:param path: output directory of the job
+		"""
+		self._manifest_path = os.path.join(os.path.expanduser(path), ".checkpoints.json")
+		self._lock = threading.Lock()
+		self._hashes = {}
+		try:
+			with open(self._manifest_path, "r") as file:
+				self._manifest = json.load(file)
+		except (FileNotFoundError, json.JSONDecodeError):
+			self._manifest = {}
+
+	def _hash_file(self, path: str) -> str:
+		"""
+		Hash the content of a file, the result is remembered as long as size and modification time stay the same
+		:param path: path of the file
+		:return: hex digest
+		"""
+		stat = os.stat(path)
+		key = (path, stat.st_size, stat.st_mtime_ns)
+		with self._lock:
+			if key in self._hashes:
+				return self._hashes[key]
+		digest = hashlib.sha256()
+		with open(path, "rb") as file:
+			for chunk in iter(lambda: file.read(1024 * 1024), b""):
+				digest.update(chunk)
+		with self._lock:
+			self._hashes[key] = digest.hexdigest()
+		return self._hashes[key]
+
+	def hash_path(self, path: str) -> str:
+		"""
+		Hash a file or a whole directory, a missing path has its own hash
+		:param path: file or directory
+		:return: hex digest
+		"""
+		if os.path.isfile(path):
+			return self._hash_file(path)
+		if not os.path.isdir(path):
+			return "missing"
+		digest = hashlib.sha256()
+		for root, dirs, files in os.walk(path):
+			dirs.sort()
+			for name in sorted(files):
+				file_path = os.path.join(root, name)
+				digest.update(os.path.relpath(file_path, path).encode())
+				digest.update(self._hash_file(file_path).encode())
+		return digest.hexdigest()
+
+	def fingerprint(self, stage) -> str:
+		"""
+		Hash of everything a stage depends on: its name, its parameters and the content of its inputs
+		:param stage: the stage
+		:return: hex digest
+		"""
+		digest = hashlib.sha256()
+		digest.update(stage.name.encode())
+		digest.update(json.dumps(stage.params, sort_keys=True, default=str).encode())
+		for path in stage.inputs:
+			digest.update(path.encode())
+			digest.update(self.hash_path(path).encode())
+		return digest.hexdigest()
+
+	def is_up_to_date(self, stage, fingerprint: str) -> bool:
+		"""
+		A stage is up to date if it finished with the same fingerprint and its outputs are still unchanged
+		:param stage: the stage
+		:param fingerprint: the current fingerprint of the stage
+		:return: True if the stage can be skipped
+		"""
+		with self._lock:
+			entry = self._manifest.get(stage.name)
+		if not entry or entry["fingerprint"] != fingerprint:
+			return False
+		return all(
+			os.path.exists(path) and self.hash_path(path) == entry["outputs"].get(path)
+			for path in stage.outputs
+		)
+
+	def record(self, stage, fingerprint: str) -> None:
+		"""
+		Remember that the stage finished with this fingerprint and these outputs
+		:param stage: the stage
+		:param fingerprint: the fingerprint the stage ran with
+		:return:
+		"""
+		outputs = {path: self.hash_path(path) for path in stage.outputs}
+		with self._lock:
+			self._manifest[stage.name] = {"fingerprint": fingerprint, "outputs": outputs}
+			self._save()
+
+	def _save(self) -> None:
+		"""
+		Write the manifest, first into a temporary file so a crash never leaves half a manifest behind
+		:return:
+		"""
+		tmp_path = self._manifest_path + ".tmp"
+		try:
+			with open(tmp_path, "w") as file:
+				json.dump(self._manifest, file, indent=1)
+			os.replace(tmp_path, self._manifest_path)
+		except OSError as e:
+			print(Fore.YELLOW + f"\nCould not save the checkpoints: {e}" + Style.RESET_ALL)
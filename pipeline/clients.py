@@ -0,0 +1,41 @@
+import os
+import threading
+from functools import lru_cache
+
+# Clients are created once per process and reused by every stage, in the worker (worker.py) also by every job,
+# so connection pools and loaded models stay warm. The libraries are imported here lazily like in main.py.
+
+_whisper_lock = threading.Lock()
+
+@lru_cache(maxsize=None)
+def openai_client():
+	"""
+	One OpenAI client with its keep-alive connection pool for the whole process, pipeline.llm retries the calls
+	"""
+	from openai import OpenAI
+	return OpenAI(max_retries=0)
+
+@lru_cache(maxsize=None)
+def elevenlabs_client(api_key: str):
+	"""
+	One ElevenLabs client per API key
+	:param api_key: the ElevenLabs API key
+	"""
+	from elevenlabs.client import ElevenLabs
+	return ElevenLabs(api_key=api_key, base_url=os.getenv("ELEVEN_LABS_BASE_URL"))
+
+@lru_cache(maxsize=None)
+def whisper_model(name: str, device: str):
+	"""
+	A loaded whisper model, loading it takes longer than transcribing a short
+	:param name: name of the model, e.g. small
+	:param device: cuda or cpu
+	"""
+	import whisper
+	return whisper.load_model(name, device=device)
+
+def whisper_lock() -> threading.Lock:
+	"""
+	A loaded model must not transcribe two files at the same time
+	"""
+	return _whisper_lock
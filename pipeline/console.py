@@ -0,0 +1,5 @@
+import threading
+
+# Stages of different language tracks run at the same time, whoever asks the user something holds this lock
+# so that the prompt and the answer of one question don't get mixed up with another one
+console_lock = threading.RLock()
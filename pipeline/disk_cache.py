@@ -0,0 +1,111 @@
+import os
+import json
+import time
+import fcntl
+import hashlib
+import tempfile
+
+class DiskCache:
+	"""
+	Size bounded cache of byte values on the disk, shared by every process on the machine.
+	Every entry is one file that is replaced atomically, so readers never see half an entry. When the cache is
+	over its size the least recently used entries are deleted.
+	"""
+	def __init__(self, directory: str, max_bytes: int) -> None:
+		"""
+		:param directory: where the entries are stored
+		:param max_bytes: how much all entries may take together
+		"""
+		self._directory = os.path.expanduser(directory)
+		self._max_bytes = max_bytes
+		os.makedirs(self._directory, exist_ok=True)
+
+	def _path(self, key: str) -> str:
+		return os.path.join(self._directory, hashlib.sha256(key.encode()).hexdigest())
+
+	def get(self, key: str) -> tuple[dict, bytes]:
+		"""
+		Read an entry and mark it as recently used
+		:param key: key of the entry
+		:return: (metadata, value) or None if there is no entry
+		"""
+		path = self._path(key)
+		try:
+			with open(path, "rb") as file:
+				meta = json.loads(file.readline())
+				value = file.read()
+			os.utime(path)
+		except (OSError, ValueError):
+			return None
+		if meta.get("key") != key:
+			return None
+		return meta, value
+
+	def put(self, key: str, meta: dict, value: bytes) -> None:
+		"""
+		Store an entry, then delete the least recently used entries if the cache got too big
+		:param key: key of the entry
+		:param meta: JSON serializable metadata stored with the value
+		:param value: the value
+		:return:
+		"""
+		meta = {**meta, "key": key}
+		fd, tmp_path = tempfile.mkstemp(dir=self._directory, prefix=".tmp_")
+		try:
+			with os.fdopen(fd, "wb") as file:
+				file.write(json.dumps(meta).encode() + b"\n")
+				file.write(value)
+			os.replace(tmp_path, self._path(key))
+		except OSError:
+			try:
+				os.unlink(tmp_path)
+			except OSError:
+				pass
+			return
+		self._evict()
+
+	def touch(self, key: str, **meta) -> None:
+		"""
+		Update the metadata of an entry without changing its value
+		:param key: key of the entry
+		:param meta: the metadata to change
+		:return:
+		"""
+		entry = self.get(key)
+		if entry is not None:
+			self.put(key, {**entry[0], **meta}, entry[1])
+
+	def _evict(self) -> None:
+		"""
+		Delete the least recently used entries until the cache fits, only one process evicts at a time
+		:return:
+		"""
+		with open(os.path.join(self._directory, ".lock"), "a") as lock_file:
+			try:
+				fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+			except BlockingIOError:
+				return
+			entries = []
+			for entry in os.scandir(self._directory):
+				if entry.name.startswith("."):
+					# Temporary files of writers that crashed
+					try:
+						if entry.name.startswith(".tmp_") and time.time() - entry.stat().st_mtime > 3600:
+							os.unlink(entry.path)
+					except OSError:
+						pass
+					continue
+				try:
+					stat = entry.stat()
+				except OSError:
+					continue
+				entries.append((stat.st_mtime, stat.st_size, entry.path))
+			total = sum(size for _, size, _ in entries)
+			for _, size, path in sorted(entries):
+				if total <= self._max_bytes:
+					break
+				try:
+					os.unlink(path)
+				except OSError:
+					pass
+				total -= size
@@ -0,0 +1,35 @@
+class Language:
+	"""
+	Everything the pipeline needs to know about one language track
+	"""
+	def __init__(self, name: str, prompt_name: str, code: str, upload_port: int) -> None:
+		"""
+		:param name: name used in every file name of the track, e.g. script_<name>.txt
+		:param prompt_name: name of the language inside the (german) gpt prompts
+		:param code: language code for whisper
+		:param upload_port: port of the local OAuth server for the youtube upload, every language needs its own
+		"""
+		self.name = name
+		self.prompt_name = prompt_name
+		self.code = code
+		self.upload_port = upload_port
+
+# All supported languages, to add one add it here and give its channel json with --language <name>=<json>
+LANGUAGES = {
+	"german": Language("german", "deutsch", "de", 8081),
+	"english": Language("english", "englisch", "en", 8080),
+	"french": Language("french", "französisch", "fr", 8082),
+	"spanish": Language("spanish", "spanisch", "es", 8083),
+	"italian": Language("italian", "italienisch", "it", 8084),
+}
+
+def get_language(name: str) -> Language:
+	"""
+	Look up a supported language by its name
+	:param name: name of the language, e.g. german
+	:return: the language
+	"""
+	try:
+		return LANGUAGES[name.lower()]
+	except KeyError:
+		raise ValueError(f"Unsupported language '{name}', supported are: {', '.join(LANGUAGES)}") from None
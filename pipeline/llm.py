@@ -0,0 +1,424 @@
+import os
+import re
+import json
+import time
+import fcntl
+import random
+import threading
+from colorama import Fore, Style
+from pipeline import tracing
+from pipeline.clients import openai_client
+from pipeline.disk_cache import DiskCache
+
+# Every chat completion of the pipeline goes through chat(). The calls of all main.py processes on the machine share one
+# rate limit (requests and tokens per minute, tuned to our OpenAI tier), the calls of one process share a concurrency limit,
+# and rate limited or failed calls are retried with backoff. A 429 pauses every process, not only the one that got it.
+MODEL = os.environ.get("SHORTAUTOMATION_LLM_MODEL", "gpt-4o-mini-2024-07-18")
+RPM = float(os.environ.get("SHORTAUTOMATION_LLM_RPM", "500"))
+TPM = float(os.environ.get("SHORTAUTOMATION_LLM_TPM", "200000"))
+CONCURRENCY = int(os.environ.get("SHORTAUTOMATION_LLM_CONCURRENCY", "4"))
+RETRIES = int(os.environ.get("SHORTAUTOMATION_LLM_RETRIES", "5"))
+LIMIT_DIR = os.environ.get("SHORTAUTOMATION_LLM_DIR", os.path.join("~", ".cache", "shortautomation", "llm"))
+
+# How many requests and tokens may start at once before the limit spaces them out
+BURST_S = 5.0
+
+# Answers are cached on the disk by model and messages, a rerun of the same job with the same text gets them for free.
+# Entries older than the TTL are asked again, the least recently used ones are deleted when the cache is full
+CACHE_ENV = "SHORTAUTOMATION_LLM_CACHE"
+CACHE_DIR = os.environ.get("SHORTAUTOMATION_LLM_CACHE_DIR", os.path.join("~", ".cache", "shortautomation", "llm_cache"))
+CACHE_TTL_H = float(os.environ.get("SHORTAUTOMATION_LLM_CACHE_TTL_H", "168"))
+CACHE_MAX_MB = float(os.environ.get("SHORTAUTOMATION_LLM_CACHE_MAX_MB", "50"))
+
+class LLMResponseError(ValueError):
+	"""
+	Raised when a structured answer is no valid JSON or does not match its schema
+	"""
+
+_concurrency = threading.Semaphore(CONCURRENCY)
+_usage_lock = threading.Lock()
+_usage = {}
+
+class RateLimit:
+	"""
+	Requests and tokens per minute shared by every process on the machine, kept as the time at which the next request
+	and the next token are free again (GCRA) in a small JSON file under flock
+	"""
+	def __init__(self, directory: str = LIMIT_DIR, rpm: float = RPM, tpm: float = TPM) -> None:
+		"""
+		:param directory: where the state file is kept
+		:param rpm: requests per minute
+		:param tpm: tokens per minute, prompt and expected answer together
+		"""
+		self._directory = os.path.expanduser(directory)
+		self._rpm = rpm
+		self._tpm = tpm
+		os.makedirs(self._directory, exist_ok=True)
+		self._path = os.path.join(self._directory, "rate_limit.json")
+
+	def _update(self, change) -> float:
+		"""
+		Change the state under the lock
+		:param change: function of (state, now) that changes the state and returns a float
+		:return: what change returned
+		"""
+		with open(self._path, "a+") as file:
+			fcntl.flock(file, fcntl.LOCK_EX)
+			try:
+				file.seek(0)
+				try:
+					state = json.loads(file.read() or "{}")
+				except ValueError:
+					state = {}
+				result = change(state, time.time())
+				file.seek(0)
+				file.truncate()
+				file.write(json.dumps(state))
+				return result
+			finally:
+				fcntl.flock(file, fcntl.LOCK_UN)
+
+	def reserve(self, tokens: int) -> float:
+		"""
+		Reserve one request with its tokens
+		:param tokens: the expected tokens of the request
+		:return: seconds to wait before the request may be sent
+		"""
+		def change(state: dict, now: float) -> float:
+			requests_free = max(state.get("requests", 0.0), now) + 60.0 / self._rpm
+			tokens_free = max(state.get("tokens", 0.0), now) + tokens * 60.0 / self._tpm
+			state["requests"] = requests_free
+			state["tokens"] = tokens_free
+			return max(requests_free - BURST_S, tokens_free - BURST_S, state.get("paused_until", 0.0)) - now
+		return max(self._update(change), 0.0)
+
+	def pause(self, seconds: float) -> None:
+		"""
+		Nobody sends a request for the next seconds, used when the API answered with 429
+		"""
+		def change(state: dict, now: float) -> float:
+			state["paused_until"] = max(state.get("paused_until", 0.0), now + seconds)
+			return 0.0
+		self._update(change)
+
+_rate_limit = None
+_rate_limit_lock = threading.Lock()
+_cache = None
+
+def rate_limit() -> RateLimit:
+	"""
+	The machine wide rate limit, created once per process
+	"""
+	global _rate_limit
+	with _rate_limit_lock:
+		if _rate_limit is None:
+			_rate_limit = RateLimit()
+		return _rate_limit
+
+def cache() -> DiskCache:
+	"""
+	The answer cache of this process, None if it is turned off with SHORTAUTOMATION_LLM_CACHE=0
+	"""
+	global _cache
+	if os.environ.get(CACHE_ENV) == "0":
+		return None
+	with _rate_limit_lock:
+		if _cache is None:
+			_cache = DiskCache(CACHE_DIR, int(CACHE_MAX_MB * 1024 * 1024))
+		return _cache
+
+def _estimate_tokens(messages: list[dict]) -> int:
+	# About four characters per token, plus the answer
+	return sum(len(message["content"]) for message in messages) // 4 + 400
+
+def _retry_after(error: Exception) -> float:
+	"""
+	The Retry-After of an API error in seconds, None if the answer has none
+	"""
+	response = getattr(error, "response", None)
+	try:
+		return float(response.headers.get("retry-after"))
+	except (AttributeError, TypeError, ValueError):
+		return None
+
+def _record(purpose: str, seconds: float, waited: float = 0.0, retries: int = 0, prompt_tokens: int = 0, completion_tokens: int = 0, cached: bool = False) -> None:
+	with _usage_lock:
+		usage = _usage.setdefault(purpose, {"calls": 0, "cached": 0, "seconds": 0.0, "waited": 0.0, "retries": 0, "prompt_tokens": 0, "completion_tokens": 0})
+		usage["calls"] += 1
+		usage["cached"] += cached
+		usage["seconds"] += seconds
+		usage["waited"] += waited
+		usage["retries"] += retries
+		usage["prompt_tokens"] += prompt_tokens
+		usage["completion_tokens"] += completion_tokens
+
+def chat(messages: list[dict], purpose: str, model: str = MODEL, fresh: bool = False, schema: dict = None, **span_args) -> str:
+	"""
+	One chat completion through the shared client, rate limit and concurrency limit, or the cached answer
+	:param messages: the messages of the completion
+	:param purpose: what the text is for, e.g. script, recorded in the trace and the usage
+	:param model: the model
+	:param fresh: ask the API even if the answer is cached (a rewrite the user asked for), the new answer replaces it
+	:param schema: JSON schema of a structured answer (strict structured outputs), see chat_json
+	:param span_args: more arguments for the trace span, e.g. language
+	:return: the content of the answer
+	"""
+	start = time.perf_counter()
+	answers = cache()
+	options = {}
+	if schema is not None:
+		options["response_format"] = {"type": "json_schema", "json_schema": {"name": purpose, "strict": True, "schema": schema}}
+	key = json.dumps({"model": model, "messages": messages, **options}, sort_keys=True, ensure_ascii=False)
+	if answers is not None and not fresh:
+		with tracing.span("llm.cache", "cache", purpose=purpose, **span_args) as info:
+			cached = answers.get(key)
+			info["hit"] = cached is not None and time.time() - cached[0]["created"] < CACHE_TTL_H * 3600
+		if info["hit"]:
+			_record(purpose, time.perf_counter() - start, cached=True)
+			return cached[1].decode()
+
+	import openai
+	client = openai_client()
+	waited = 0.0
+	with tracing.span("openai.chat.completions", "api", purpose=purpose, **span_args) as info:
+		for attempt in range(RETRIES + 1):
+			wait_s = rate_limit().reserve(_estimate_tokens(messages))
+			if wait_s > 0:
+				waited += wait_s
+				time.sleep(wait_s)
+			try:
+				with _concurrency:
+					completion = client.chat.completions.create(model=model, messages=messages, **options)
+				break
+			except (openai.RateLimitError, openai.APITimeoutError, openai.APIConnectionError, openai.InternalServerError) as e:
+				if attempt == RETRIES:
+					raise
+				backoff = _retry_after(e) or min(2 ** attempt, 30) * (0.5 + random.random())
+				if isinstance(e, openai.RateLimitError):
+					rate_limit().pause(backoff)
+				print(Fore.YELLOW + f"\nOpenAI call for {purpose} failed ({type(e).__name__}), retrying in {backoff:.1f}s." + Style.RESET_ALL)
+				waited += backoff
+				time.sleep(backoff)
+		info["prompt_tokens"] = completion.usage.prompt_tokens
+		info["completion_tokens"] = completion.usage.completion_tokens
+		info["retries"] = attempt
+		info["waited_s"] = round(waited, 3)
+	_record(purpose, time.perf_counter() - start, waited, attempt, completion.usage.prompt_tokens, completion.usage.completion_tokens)
+	content = completion.choices[0].message.content
+	if answers is not None and content is not None:
+		answers.put(key, {"created": time.time(), "purpose": purpose}, content.encode())
+	return content
+
+def chat_stream(messages: list[dict], purpose: str, model: str = MODEL, fresh: bool = False, schema: dict = None, **span_args):
+	"""
+	A chat completion that yields the answer while it is generated, with the same limits, retries and cache as chat.
+	Calls are only retried until the first piece arrived, a cached answer is yielded as one piece.
+	The concurrency limit is only held while the stream is opened, never while the caller works on a piece.
+	:param messages: the messages of the completion
+	:param purpose: what the text is for, e.g. script, recorded in the trace and the usage
+	:param model: the model
+	:param fresh: ask the API even if the answer is cached, see chat
+	:param schema: JSON schema of a structured answer, the JSON is streamed as it is generated
+	:param span_args: more arguments for the trace span, e.g. language
+	:return: generator of the pieces of the content
+	"""
+	start = time.perf_counter()
+	answers = cache()
+	options = {}
+	if schema is not None:
+		options["response_format"] = {"type": "json_schema", "json_schema": {"name": purpose, "strict": True, "schema": schema}}
+	key = json.dumps({"model": model, "messages": messages, **options}, sort_keys=True, ensure_ascii=False)
+	if answers is not None and not fresh:
+		cached = answers.get(key)
+		if cached is not None and time.time() - cached[0]["created"] < CACHE_TTL_H * 3600:
+			_record(purpose, time.perf_counter() - start, cached=True)
+			yield cached[1].decode()
+			return
+
+	import openai
+	client = openai_client()
+	waited = 0.0
+	pieces = []
+	usage_chunk = None
+	with tracing.span("openai.chat.completions", "api", purpose=purpose, stream=True, **span_args) as info:
+		for attempt in range(RETRIES + 1):
+			wait_s = rate_limit().reserve(_estimate_tokens(messages))
+			if wait_s > 0:
+				waited += wait_s
+				time.sleep(wait_s)
+			try:
+				with _concurrency:
+					stream = client.chat.completions.create(model=model, messages=messages, stream=True, stream_options={"include_usage": True}, **options)
+				# The connection is closed as well if the caller stops reading early
+				try:
+					for chunk in stream:
+						if chunk.usage is not None:
+							usage_chunk = chunk.usage
+						if chunk.choices and chunk.choices[0].delta.content:
+							if not pieces:
+								info["first_piece_s"] = round(time.perf_counter() - start, 3)
+							pieces.append(chunk.choices[0].delta.content)
+							yield pieces[-1]
+				finally:
+					stream.close()
+				break
+			except (openai.RateLimitError, openai.APITimeoutError, openai.APIConnectionError, openai.InternalServerError) as e:
+				if attempt == RETRIES or pieces:
+					raise
+				backoff = _retry_after(e) or min(2 ** attempt, 30) * (0.5 + random.random())
+				if isinstance(e, openai.RateLimitError):
+					rate_limit().pause(backoff)
+				print(Fore.YELLOW + f"\nOpenAI call for {purpose} failed ({type(e).__name__}), retrying in {backoff:.1f}s." + Style.RESET_ALL)
+				waited += backoff
+				time.sleep(backoff)
+		prompt_tokens = usage_chunk.prompt_tokens if usage_chunk is not None else 0
+		completion_tokens = usage_chunk.completion_tokens if usage_chunk is not None else 0
+		info["prompt_tokens"] = prompt_tokens
+		info["completion_tokens"] = completion_tokens
+		info["retries"] = attempt
+		info["waited_s"] = round(waited, 3)
+	_record(purpose, time.perf_counter() - start, waited, attempt, prompt_tokens, completion_tokens)
+	if answers is not None and pieces:
+		answers.put(key, {"created": time.time(), "purpose": purpose}, "".join(pieces).encode())
+
+class JsonStringReader:
+	"""
+	Reads the value of one string property out of a JSON object while the object is streamed
+	"""
+	_ESCAPES = {'"': '"', "\\": "\\", "/": "/", "b": "\b", "f": "\f", "n": "\n", "r": "\r", "t": "\t"}
+
+	def __init__(self, name: str) -> None:
+		"""
+		:param name: name of the property
+		"""
+		self._start = re.compile(r'"' + re.escape(name) + r'"\s*:\s*"')
+		self._raw = ""
+		self._position = None
+		self.done = False
+
+	def feed(self, piece: str) -> str:
+		"""
+		Add the next piece of the JSON
+		:param piece: the piece
+		:return: the new text of the value, escape sequences that are cut in half are returned with the next piece
+		"""
+		self._raw += piece
+		if self.done:
+			return ""
+		if self._position is None:
+			match = self._start.search(self._raw)
+			if not match:
+				return ""
+			self._position = match.end()
+		text = []
+		raw = self._raw
+		i = self._position
+		while i < len(raw):
+			char = raw[i]
+			if char == '"':
+				self.done = True
+				i += 1
+				break
+			if char != "\\":
+				text.append(char)
+				i += 1
+				continue
+			# An escape sequence, wait for the rest of it if it is not complete yet
+			if i + 1 >= len(raw):
+				break
+			if raw[i + 1] != "u":
+				text.append(self._ESCAPES.get(raw[i + 1], raw[i + 1]))
+				i += 2
+				continue
+			if i + 6 > len(raw):
+				break
+			code = int(raw[i + 2:i + 6], 16)
+			if 0xD800 <= code < 0xDC00:
+				# The first half of a surrogate pair, the second half is the next escape
+				if i + 12 > len(raw):
+					break
+				code = 0x10000 + ((code - 0xD800) << 10) + (int(raw[i + 8:i + 12], 16) - 0xDC00)
+				i += 6
+			text.append(chr(code))
+			i += 6
+		self._position = i
+		return "".join(text)
+
+def validate(value, schema: dict, where: str = "answer") -> None:
+	"""
+	Check a parsed answer against the part of JSON schema the pipeline uses (object, array, string, integer)
+	:param value: the parsed answer
+	:param schema: the schema
+	:param where: path of the value for the error message
+	:return:
+	"""
+	kind = schema.get("type")
+	if kind == "object":
+		if not isinstance(value, dict):
+			raise LLMResponseError(f"{where} is no object")
+		for name in schema.get("required", []):
+			if name not in value:
+				raise LLMResponseError(f"{where} has no {name}")
+		for name, property_schema in schema.get("properties", {}).items():
+			if name in value:
+				validate(value[name], property_schema, f"{where}.{name}")
+	elif kind == "array":
+		if not isinstance(value, list):
+			raise LLMResponseError(f"{where} is no list")
+		for i, item in enumerate(value):
+			validate(item, schema.get("items", {}), f"{where}[{i}]")
+	elif kind == "string":
+		if not isinstance(value, str) or not value.strip():
+			raise LLMResponseError(f"{where} is no text")
+	elif kind == "integer" and (not isinstance(value, int) or isinstance(value, bool)):
+		raise LLMResponseError(f"{where} is no integer")
+
+def chat_json(messages: list[dict], purpose: str, schema: dict, check=None, model: str = MODEL, fresh: bool = False, **span_args) -> dict:
+	"""
+	One structured chat completion, the answer is parsed and validated. An invalid answer is asked for once more.
+	:param messages: the messages of the completion
+	:param purpose: what the answer is for, also the name of the schema
+	:param schema: JSON schema of the answer, every property required and no additional ones (strict structured outputs)
+	:param check: optional function that raises LLMResponseError for answers the schema can not rule out, e.g. too few items
+	:param model: the model
+	:param fresh: ask the API even if the answer is cached, see chat
+	:param span_args: more arguments for the trace span, e.g. language
+	:return: the parsed answer
+	"""
+	for attempt in range(2):
+		content = chat(messages, purpose, model, fresh or attempt > 0, schema, **span_args)
+		try:
+			try:
+				answer = json.loads(content or "")
+			except ValueError:
+				raise LLMResponseError("the answer is no JSON")
+			validate(answer, schema)
+			if check is not None:
+				check(answer)
+			return answer
+		except LLMResponseError as e:
+			if attempt > 0:
+				raise LLMResponseError(f"Invalid {purpose} answer: {e}")
+			print(Fore.YELLOW + f"\nInvalid {purpose} answer ({e}), asking again." + Style.RESET_ALL)
+
+def usage() -> dict:
+	"""
+	Calls, cached answers, seconds, waited seconds, retries and tokens per purpose since the process started
+	"""
+	with _usage_lock:
+		return {purpose: dict(values) for purpose, values in _usage.items()}
+
+def print_usage(since: dict = None) -> None:
+	"""
+	Print the usage table, nothing if there was no call
+	:param since: the usage at the start of the job, the worker runs many jobs in one process
+	"""
+	current = usage()
+	for purpose, values in (since or {}).items():
+		current[purpose] = {key: current[purpose][key] - value for key, value in values.items()}
+	current = {purpose: values for purpose, values in current.items() if values["calls"]}
+	if not current:
+		return
+	print(f"\n{'LLM purpose':<16}{'calls':>6}{'cached':>8}{'seconds':>10}{'waited':>10}{'retries':>8}{'prompt tok':>12}{'answer tok':>12}")
+	for purpose, values in current.items():
+		print(f"{purpose:<16}{values['calls']:>6}{values['cached']:>8}{values['seconds']:>10.1f}{values['waited']:>10.1f}{values['retries']:>8}{values['prompt_tokens']:>12}{values['completion_tokens']:>12}")
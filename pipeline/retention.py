@@ -0,0 +1,231 @@
+import os
+import sys
+import json
+import time
+import fcntl
+import shutil
+import subprocess
+from contextlib import contextmanager
+from colorama import Fore, Style
+
+# Finished and failed workspaces are not deleted by main.py itself, they are registered here with the time until
+# they may be deleted and a background collector (python3 -m pipeline.retention) deletes them once they expire
+# or when the scratch disk fills up, the least recently used first
+RETENTION_DIR_ENV = "SHORTAUTOMATION_RETENTION_DIR"
+MAX_AGE_ENV = "SHORTAUTOMATION_RETENTION_MAX_AGE_H"
+QUOTA_ENV = "SHORTAUTOMATION_RETENTION_QUOTA_GB"
+MIN_FREE_ENV = "SHORTAUTOMATION_RETENTION_MIN_FREE_GB"
+
+GB = 1024 ** 3
+
+# A workspace that is still marked as being deleted after this long belongs to a collector that died meanwhile
+DELETING_STALE_S = 3600
+
+def _directory_size(path: str) -> int:
+	"""
+	Bytes of all files below path
+	"""
+	size = 0
+	for root, _, files in os.walk(path):
+		for name in files:
+			try:
+				size += os.lstat(os.path.join(root, name)).st_size
+			except OSError:
+				continue
+	return size
+
+def _deleting(entry: dict) -> bool:
+	"""
+	Check if a collector is deleting the workspace of a registry entry right now
+	"""
+	return bool(entry.get("deleting")) and time.time() - entry["deleting"] < DELETING_STALE_S
+
+class RetentionManager:
+	"""
+	Registry of the workspaces that are waiting to be deleted, shared by every main.py, master.py and worker.py on the machine
+	"""
+	def __init__(self, directory: str = None, max_age_s: float = None, quota_bytes: int = None, min_free_bytes: int = None) -> None:
+		"""
+		:param directory: where the registry lives, $SHORTAUTOMATION_RETENTION_DIR or ~/.cache/shortautomation
+		:param max_age_s: how long a workspace is kept at most, also the time a failed run can be resumed (default 7 days)
+		:param quota_bytes: how much all registered workspaces may take together (default 20 GB)
+		:param min_free_bytes: how much has to stay free on the disk of a workspace (default 5 GB)
+		"""
+		directory = directory or os.environ.get(RETENTION_DIR_ENV) or os.path.join("~", ".cache", "shortautomation")
+		self._directory = os.path.expanduser(directory)
+		self._registry_path = os.path.join(self._directory, "retention.json")
+		self._lock_path = os.path.join(self._directory, "retention.lock")
+		self._collector_lock_path = os.path.join(self._directory, "collector.lock")
+		self.max_age_s = max_age_s if max_age_s is not None else float(os.environ.get(MAX_AGE_ENV, "168")) * 3600
+		self.quota_bytes = quota_bytes if quota_bytes is not None else int(float(os.environ.get(QUOTA_ENV, "20")) * GB)
+		self.min_free_bytes = min_free_bytes if min_free_bytes is not None else int(float(os.environ.get(MIN_FREE_ENV, "5")) * GB)
+		os.makedirs(self._directory, exist_ok=True)
+
+	@contextmanager
+	def _registry(self):
+		"""
+		Read the registry under a lock that every process shares and write it back when the with block ends
+		:return: dict of workspace path -> entry
+		"""
+		with open(self._lock_path, "a") as lock_file:
+			fcntl.flock(lock_file, fcntl.LOCK_EX)
+			try:
+				try:
+					with open(self._registry_path, "r") as file:
+						registry = json.load(file)
+				except (FileNotFoundError, json.JSONDecodeError):
+					registry = {}
+				yield registry
+				tmp_path = self._registry_path + ".tmp"
+				with open(tmp_path, "w") as file:
+					json.dump(registry, file, indent=1)
+				os.replace(tmp_path, self._registry_path)
+			finally:
+				fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+	def register(self, path: str, keep_s: float = None) -> None:
+		"""
+		Hand a workspace over, it is deleted after keep_s seconds or earlier if the disk fills up
+		:param path: the workspace
+		:param keep_s: seconds to keep it, max_age_s if not given
+		:return:
+		"""
+		path = os.path.abspath(os.path.expanduser(path))
+		if not os.path.isdir(path):
+			return
+		now = time.time()
+		keep_s = self.max_age_s if keep_s is None else min(max(keep_s, 0), self.max_age_s)
+		size = _directory_size(path)
+		with self._registry() as registry:
+			entry = registry.get(path, {})
+			if _deleting(entry):
+				return
+			registry[path] = {"registered": entry.get("registered", now), "last_used": now, "expires": now + keep_s, "bytes": size}
+
+	def release(self, path: str) -> None:
+		"""
+		Take a workspace back because a job uses it again (e.g. to resume). It counts as used now and is not deleted while
+		the job runs, unless the job never registers it again and it reaches the maximum age.
+		If the collector is deleting it right now this waits until it is gone, the job starts from scratch then.
+		:param path: the workspace
+		:return:
+		"""
+		path = os.path.abspath(os.path.expanduser(path))
+		while True:
+			with self._registry() as registry:
+				entry = registry.get(path)
+				if entry is None:
+					return
+				if not _deleting(entry):
+					now = time.time()
+					entry.pop("deleting", None)
+					entry.update(in_use=True, last_used=now, expires=now + self.max_age_s)
+					return
+			time.sleep(0.5)
+
+	def collect(self) -> list[str]:
+		"""
+		Delete every expired workspace, then the least recently used ones until the quota and the free disk space are fine again.
+		The workspaces are picked under the lock of the registry and deleted after it is released, so other processes can
+		register and release meanwhile.
+		:return: the deleted workspaces
+		"""
+		now = time.time()
+		victims = []
+		with self._registry() as registry:
+			# Workspaces deleted by someone else are forgotten
+			for path in [path for path in registry if not os.path.isdir(path)]:
+				del registry[path]
+			candidates = {path: entry for path, entry in registry.items() if not _deleting(entry)}
+			freed = {}
+
+			def pick(path: str) -> None:
+				candidates.pop(path)["deleting"] = now
+				victims.append(path)
+				device = os.stat(path).st_dev
+				freed[device] = freed.get(device, 0) + registry[path]["bytes"]
+
+			for path in [path for path, entry in candidates.items() if entry["expires"] <= now]:
+				pick(path)
+
+			# The least recently used go first while all of them together are over the quota or their disk is too full,
+			# workspaces a job is using right now stay
+			for path in sorted(candidates, key=lambda path: candidates[path]["last_used"]):
+				if candidates[path].get("in_use"):
+					continue
+				total = sum(entry["bytes"] for entry in candidates.values())
+				if total > self.quota_bytes or shutil.disk_usage(path).free + freed.get(os.stat(path).st_dev, 0) < self.min_free_bytes:
+					pick(path)
+
+		for path in victims:
+			shutil.rmtree(path, ignore_errors=True)
+		with self._registry() as registry:
+			for path in victims:
+				registry.pop(path, None)
+		return victims
+
+	def next_expiry(self) -> float:
+		"""
+		When the next workspace expires, None if nothing is registered
+		"""
+		with self._registry() as registry:
+			return min((entry["expires"] for entry in registry.values()), default=None)
+
+	def start_collector(self) -> None:
+		"""
+		Start the background collector if none is running, it exits once nothing is registered anymore.
+		The collector runs in its own session so it outlives main.py and master.py.
+		:return:
+		"""
+		with open(self._collector_lock_path, "a") as lock_file:
+			try:
+				fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+			except BlockingIOError:
+				return
+			fcntl.flock(lock_file, fcntl.LOCK_UN)
+		subprocess.Popen(
+			[sys.executable, "-m", "pipeline.retention", "--directory", self._directory],
+			cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+			stdin=subprocess.DEVNULL,
+			stdout=subprocess.DEVNULL,
+			stderr=subprocess.DEVNULL,
+			start_new_session=True
+		)
+
+	def run_collector(self, poll_s: float = 60) -> None:
+		"""
+		Collect until nothing is registered, only one collector runs at a time
+		:param poll_s: how often the disk space is checked between two expiries
+		:return:
+		"""
+		while True:
+			with open(self._collector_lock_path, "a") as lock_file:
+				try:
+					fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+				except BlockingIOError:
+					return
+				while True:
+					for path in self.collect():
+						print(Fore.GREEN + f"Deleted workspace: {path}" + Style.RESET_ALL)
+					next_expiry = self.next_expiry()
+					if next_expiry is None:
+						break
+					time.sleep(min(max(next_expiry - time.time(), 1), poll_s))
+
+			# Whoever registered while this collector was stopping saw it still running and did not start another one
+			if self.next_expiry() is None:
+				return
+
+if __name__ == "__main__":
+	import argparse
+
+	parser = argparse.ArgumentParser(description="Delete the registered workspaces once they expire or the disk fills up")
+	parser.add_argument("--directory", help="where the registry lives")
+	parser.add_argument("--once", action="store_true", help="collect once and exit instead of waiting for the next expiry")
+	options = parser.parse_args()
+	manager = RetentionManager(options.directory)
+	if options.once:
+		for path in manager.collect():
+			print(Fore.GREEN + f"Deleted workspace: {path}" + Style.RESET_ALL)
+	else:
+		manager.run_collector()
@@ -0,0 +1,165 @@
+import os
+from typing import Callable
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from colorama import Fore, Style
+from pipeline.checkpoints import CheckpointStore
+from pipeline import tracing
+
+class StageError(Exception):
+	"""
+	Raised when a stage of the pipeline fails or does not produce its declared outputs
+	"""
+	def __init__(self, stage_name: str, message: str) -> None:
+		super().__init__(f"Stage '{stage_name}' failed: {message}")
+		self.stage_name = stage_name
+
+class Stage:
+	"""
+	One step of the pipeline with the files it reads and the files it writes
+	"""
+	def __init__(self, name: str, run: Callable[[], None], inputs: list[str] = None, outputs: list[str] = None, params: dict = None) -> None:
+		"""
+		:param name: unique name of the stage
+		:param run: function that does the work of the stage
+		:param inputs: files or directories the stage reads, the stages producing them run first
+		:param outputs: files or directories the stage has to produce
+		:param params: everything else the result depends on, a change reruns the stage
+		"""
+		self.name = name
+		self.run = run
+		self.inputs = [os.path.expanduser(path) for path in (inputs or [])]
+		self.outputs = [os.path.expanduser(path) for path in (outputs or [])]
+		self.params = params or {}
+
+class StageScheduler:
+	"""
+	Runs the stages of the pipeline as soon as every stage they depend on is finished,
+	so independent stages run at the same time
+	"""
+	def __init__(self, stages: list[Stage], max_workers: int = 4, checkpoints: CheckpointStore = None, keep_going: bool = False) -> None:
+		"""
+		:param stages: all stages of the pipeline
+		:param max_workers: how many stages may run at the same time
+		:param checkpoints: if given, stages whose inputs and parameters did not change since their last run are skipped
+		:param keep_going: if a stage fails only the stages that depend on it are left out, all others still run
+		"""
+		self._stages = {}
+		self._max_workers = max_workers
+		self._checkpoints = checkpoints
+		self._keep_going = keep_going
+		producers = {}
+
+		# Every stage name and every output must be unique
+		for stage in stages:
+			if stage.name in self._stages:
+				raise ValueError(f"Duplicate stage name: {stage.name}")
+			self._stages[stage.name] = stage
+			for output in stage.outputs:
+				if output in producers:
+					raise ValueError(f"{output} is produced by '{producers[output]}' and '{stage.name}'")
+				producers[output] = stage.name
+
+		# A stage depends on every stage that produces one of its inputs, inputs nobody produces have to exist already
+		self._dependencies = {
+			stage.name: {producers[path] for path in stage.inputs if path in producers}
+			for stage in stages
+		}
+		self._check_for_cycles()
+
+	def _check_for_cycles(self) -> None:
+		"""
+		Make sure the stages can be ordered, otherwise the pipeline would never finish
+		:return:
+		"""
+		resolved = set()
+		remaining = dict(self._dependencies)
+		while remaining:
+			ready = [name for name, dependencies in remaining.items() if dependencies <= resolved]
+			if not ready:
+				raise ValueError(f"Stages depend on each other in a cycle: {sorted(remaining)}")
+			for name in ready:
+				resolved.add(name)
+				del remaining[name]
+
+	def _run_stage(self, stage: Stage) -> None:
+		"""
+		Run a single stage inside a trace span
+		:param stage: the stage to run
+		:return:
+		"""
+		with tracing.span(stage.name, "stage") as info:
+			info["skipped"] = self._run_stage_unless_up_to_date(stage)
+
+	def _run_stage_unless_up_to_date(self, stage: Stage) -> bool:
+		"""
+		Run a single stage and check that it produced everything it declared
+		:param stage: the stage to run
+		:return: True if the stage was skipped because it is up to date
+		"""
+		# Skip the stage if it already ran with exactly the same inputs and parameters
+		if self._checkpoints is not None:
+			fingerprint = self._checkpoints.fingerprint(stage)
+			if self._checkpoints.is_up_to_date(stage, fingerprint):
+				print(Fore.GREEN + f"\nStage '{stage.name}' is up to date, skipping it." + Style.RESET_ALL)
+				return True
+
+		print(Fore.GREEN + f"\nStarting stage '{stage.name}'." + Style.RESET_ALL)
+		stage.run()
+		missing = [path for path in stage.outputs if not os.path.exists(path)]
+		if missing:
+			raise StageError(stage.name, f"missing outputs {missing}")
+		if self._checkpoints is not None:
+			self._checkpoints.record(stage, fingerprint)
+		print(Fore.GREEN + f"\nFinished stage '{stage.name}'." + Style.RESET_ALL)
+		return False
+
+	def run(self) -> None:
+		"""
+		Run all stages, independent stages run at the same time.
+		If a stage fails the stages that are already running are finished, nothing new is started and StageError is raised.
+		With keep_going the stages that do not depend on the failed one still run before StageError is raised.
+		:return:
+		"""
+		pending = dict(self._stages)
+		finished = set()
+		failed = set()
+		running = {}
+		failure = None
+
+		with ThreadPoolExecutor(max_workers=self._max_workers) as executor:
+			while (pending and (failure is None or self._keep_going)) or running:
+
+				# Leave out every stage that depends on a failed one, until no more stages are left out
+				left_out = True
+				while left_out:
+					left_out = [name for name in pending if self._dependencies[name] & failed]
+					for name in left_out:
+						print(Fore.YELLOW + f"\nSkipping stage '{name}', a stage it depends on failed." + Style.RESET_ALL)
+						failed.add(name)
+						del pending[name]
+
+				# Start every stage whose dependencies are all finished
+				if failure is None or self._keep_going:
+					for name, stage in list(pending.items()):
+						if self._dependencies[name] <= finished:
+							running[tracing.submit_in_context(executor, self._run_stage, stage)] = stage
+							del pending[name]
+
+				# Wait for the next stage to finish
+				if not running:
+					continue
+				done, _ = wait(running, return_when=FIRST_COMPLETED)
+				for future in done:
+					stage = running.pop(future)
+					try:
+						future.result()
+						finished.add(stage.name)
+					except Exception as e:
+						error = e if isinstance(e, StageError) else StageError(stage.name, str(e))
+						failed.add(stage.name)
+						failure = failure or error
+						if self._keep_going:
+							print(Fore.RED + f"\n{error}" + Style.RESET_ALL)
+
+		if failure is not None:
+			raise failure
@@ -0,0 +1,39 @@
+import os
+import time
+import fcntl
+from contextlib import contextmanager
+
+# Set by master.py so that every main.py it spawns shares the same pool of heavy slots
+HEAVY_SLOTS_ENV = "SHORTAUTOMATION_HEAVY_SLOTS"
+SLOT_DIR_ENV = "SHORTAUTOMATION_SLOT_DIR"
+
+@contextmanager
+def heavy_slot():
+	"""
+	Hold one of the machine wide slots for ffmpeg/whisper heavy work while the block runs.
+	The slots are lock files shared by all main.py processes of one master.py run, if main.py
+	was started on its own there are no slots and this does nothing.
+	:return:
+	"""
+	slots = int(os.environ.get(HEAVY_SLOTS_ENV) or 0)
+	slot_dir = os.environ.get(SLOT_DIR_ENV)
+	if slots <= 0 or not slot_dir:
+		yield
+		return
+
+	# Try every slot, if all of them are taken wait a bit and try again
+	while True:
+		for i in range(slots):
+			fd = os.open(os.path.join(slot_dir, f"heavy_{i}.lock"), os.O_CREAT | os.O_RDWR)
+			try:
+				fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+			except BlockingIOError:
+				os.close(fd)
+				continue
+			try:
+				yield
+			finally:
+				fcntl.flock(fd, fcntl.LOCK_UN)
+				os.close(fd)
+			return
+		time.sleep(0.5)
@@ -0,0 +1,123 @@
+import os
+import asyncio
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor, Future
+from colorama import Fore, Style
+from pipeline import tracing
+
+# While a script is reviewed, the paid calls that only depend on it (its voice and the images of its prompts) already run.
+# The results are kept by the content they were made from: a stage that needs exactly that content adopts the result,
+# a rejected script cancels what has not started yet and whatever nobody adopted is dropped at the end of the job.
+# SHORTAUTOMATION_SPECULATE=0 turns it off
+SPECULATE_ENV = "SHORTAUTOMATION_SPECULATE"
+WORKERS = int(os.environ.get("SHORTAUTOMATION_SPECULATE_WORKERS", "8"))
+
+def key(kind: str, content: str) -> str:
+	"""
+	The key of a result, e.g. key("voice", script) or key("image", prompt)
+	"""
+	return f"{kind}:{hashlib.sha256(content.encode()).hexdigest()}"
+
+class Speculation:
+	"""
+	The speculative results of one job
+	"""
+	def __init__(self, workers: int = WORKERS) -> None:
+		self.enabled = os.environ.get(SPECULATE_ENV) != "0"
+		self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="speculation")
+		self._lock = threading.Lock()
+		self._futures = {}
+		self._closed = False
+		self._counts = {"started": 0, "adopted": 0, "cancelled": 0, "dropped": 0}
+
+	def start(self, result_key: str, function, *args) -> None:
+		"""
+		Start function(*args) in the background, nothing happens if the key is already started or adopted (a cancelled one starts again)
+		:param result_key: see key, it has to describe everything the result depends on
+		:param function: the paid call
+		:param args: its arguments
+		:return:
+		"""
+		if not self.enabled:
+			return
+		with self._lock:
+			future = self._futures.get(result_key)
+			if self._closed or result_key in self._futures and (future is None or not future.cancelled()):
+				return
+			self._futures[result_key] = tracing.submit_in_context(self._executor, self._run, result_key, function, *args)
+			self._counts["started"] += 1
+
+	def _run(self, result_key: str, function, *args):
+		with tracing.span("speculation", "api", overlapping=True, kind=result_key.split(":")[0]):
+			return function(*args)
+
+	def _take(self, result_key: str) -> Future:
+		with self._lock:
+			future = self._futures.get(result_key)
+			if future is None or future.cancelled():
+				return None
+			# The key stays, so the same content is never started again in this job
+			self._futures[result_key] = None
+			self._counts["adopted"] += 1
+			return future
+
+	def _failed(self, result_key: str, error: Exception) -> None:
+		with self._lock:
+			self._counts["adopted"] -= 1
+		print(Fore.YELLOW + f"\nThe speculative {result_key.split(':')[0]} failed ({error}), it is made again." + Style.RESET_ALL)
+
+	def adopt(self, result_key: str):
+		"""
+		The result of a speculative call, waits for it if it still runs
+		:param result_key: see key
+		:return: the result, None if it was not started, was cancelled or failed (the caller makes it itself then)
+		"""
+		future = self._take(result_key)
+		if future is None:
+			return None
+		try:
+			return future.result()
+		except Exception as e:
+			self._failed(result_key, e)
+			return None
+
+	async def adopt_async(self, result_key: str):
+		"""
+		adopt for coroutines, the event loop keeps running while the result is awaited
+		"""
+		future = self._take(result_key)
+		if future is None:
+			return None
+		try:
+			return await asyncio.wrap_future(future)
+		except Exception as e:
+			self._failed(result_key, e)
+			return None
+
+	def discard(self, result_keys: list[str]) -> None:
+		"""
+		Cancel the calls of a rejected script that have not started yet.
+		Running and finished ones are paid for anyway and stay adoptable, e.g. the images of a script the user rewrote by hand.
+		"""
+		with self._lock:
+			for result_key in result_keys:
+				future = self._futures.get(result_key)
+				if future is not None and not future.cancelled() and future.cancel():
+					self._counts["cancelled"] += 1
+
+	def close(self) -> None:
+		"""
+		Drop every result nobody adopted and print what the speculation saved, nothing if it never started
+		"""
+		with self._lock:
+			self._closed = True
+			for future in self._futures.values():
+				if future is not None and not future.cancelled() and future.cancel():
+					self._counts["cancelled"] += 1
+			counts = dict(self._counts)
+		self._executor.shutdown(wait=False, cancel_futures=True)
+		if not counts["started"]:
+			return
+		counts["dropped"] = counts["started"] - counts["adopted"] - counts["cancelled"]
+		print(Fore.GREEN + f"\nSpeculation during the review: {counts['adopted']} of {counts['started']} result(s) adopted, {counts['cancelled']} cancelled, {counts['dropped']} dropped." + Style.RESET_ALL)
@@ -0,0 +1,71 @@
+import os
+import sys
+import subprocess
+from pathlib import Path
+from colorama import Fore, Style
+
+# The modules of the stages, main.py only imports them when the stage actually runs
+STAGE_MODULES = [
+	("info_gathering.scraper", "scrape"),
+	("info_gathering.gpt_rewrite", "rewrite"),
+	("voice_gathering.get_voice", "voice"),
+	("music_selection.selection", "music"),
+	("subtitles_gathering.subtitles", "subtitles"),
+	("visuals_gathering.get_visuals", "visuals"),
+	("shorts_fusion.shorts_fusion", "fusion"),
+	("yt_upload.upload_to_youtube", "upload"),
+]
+
+# How long importing main.py itself may take before the report warns, every block of master.py pays it again
+STARTUP_BUDGET_MS = float(os.environ.get("SHORTAUTOMATION_STARTUP_BUDGET_MS", "150"))
+
+def _cumulative_import_times(modules: list[str]) -> dict:
+	"""
+	Import the modules one after another in a fresh interpreter with -X importtime
+	:param modules: modules to import in this order
+	:return: cumulative import time in milliseconds of every module that was imported at the top level
+	"""
+	code = "; ".join(f"import {module}" for module in modules)
+	result = subprocess.run(
+		[sys.executable, "-X", "importtime", "-c", code],
+		cwd=Path(__file__).resolve().parent.parent,
+		stdout=subprocess.PIPE,
+		stderr=subprocess.PIPE,
+		text=True
+	)
+	if result.returncode != 0:
+		raise RuntimeError(result.stderr.strip().splitlines()[-1])
+
+	# Nested imports are indented below the module that imported them, only the top level ones are kept
+	times = {}
+	for line in result.stderr.splitlines():
+		if not line.startswith("import time:"):
+			continue
+		_, cumulative, name = line.split("|")
+		if name.startswith("  "):
+			continue
+		try:
+			times[name.strip()] = int(cumulative) / 1000
+		except ValueError:
+			continue
+	return times
+
+def print_import_report() -> None:
+	"""
+	Print what importing main.py costs at startup and what every stage adds once it runs
+	:return:
+	"""
+	try:
+		times = _cumulative_import_times(["main", *(module for module, _ in STAGE_MODULES)])
+	except RuntimeError as e:
+		print(Fore.RED + f"\nCould not import everything: {e}" + Style.RESET_ALL)
+		return
+
+	startup = times.get("main", 0.0)
+	color = Fore.GREEN if startup <= STARTUP_BUDGET_MS else Fore.RED
+	print(color + f"\nStartup (import main): {startup:.1f} ms, budget {STARTUP_BUDGET_MS:.0f} ms" + Style.RESET_ALL)
+	print("\nImported only when the stage runs:")
+	for module, stage in STAGE_MODULES:
+		print(f"{stage:<12}{module:<34}{times.get(module, 0.0):>10.1f} ms")
+	if startup > STARTUP_BUDGET_MS:
+		print(Fore.YELLOW + "\nThe startup is over budget, look for heavy top level imports with: python3 -X importtime -c 'import main'" + Style.RESET_ALL)
@@ -0,0 +1,213 @@
+import os
+import json
+import time
+import resource
+import threading
+import contextvars
+import itertools
+import subprocess
+from contextlib import contextmanager
+from colorama import Fore, Style
+
+def _read_proc_io() -> tuple[int, int]:
+	"""
+	Bytes this process read from and wrote to the disk so far, (0, 0) where /proc is not available
+	:return: (read_bytes, write_bytes)
+	"""
+	try:
+		with open("/proc/self/io", "r") as file:
+			values = dict(line.split(": ") for line in file.read().splitlines())
+		return int(values["read_bytes"]), int(values["write_bytes"])
+	except (OSError, KeyError, ValueError):
+		return 0, 0
+
+class Tracer:
+	"""
+	Collects timing spans of one run and writes them in the Chrome trace format,
+	the file opens in chrome://tracing or https://ui.perfetto.dev
+	"""
+	def __init__(self) -> None:
+		self.enabled = False
+		self._events = []
+		self._lock = threading.Lock()
+		self._ids = itertools.count(1)
+		self._pid = os.getpid()
+
+	def enable(self, label: str) -> None:
+		"""
+		Start recording spans
+		:param label: name of the process shown in the trace viewer
+		:return:
+		"""
+		self.enabled = True
+		self._pid = os.getpid()
+		self._add({"name": "process_name", "ph": "M", "pid": self._pid, "tid": 0, "args": {"name": label}})
+
+	def _add(self, event: dict) -> None:
+		with self._lock:
+			self._events.append(event)
+
+	def _now(self) -> float:
+		# Chrome traces use microseconds
+		return time.time() * 1_000_000
+
+	@contextmanager
+	def span(self, name: str, cat: str, overlapping: bool = False, **args):
+		"""
+		Time the code inside the with block.
+		Child CPU time, peak RSS and disk bytes are measured for the whole process, so spans that run at the same
+		time share them. Use run() for exact numbers of a single child process.
+		:param name: name of the span
+		:param cat: category, e.g. stage, api or subprocess
+		:param overlapping: True for spans that overlap on the same thread (asyncio), they are written as async events
+		:param args: extra values shown with the span, the with block can add more to the yielded dict
+		:return:
+		"""
+		if not self.enabled:
+			yield args
+			return
+
+		start = self._now()
+		children_before = resource.getrusage(resource.RUSAGE_CHILDREN)
+		read_before, write_before = _read_proc_io()
+		try:
+			yield args
+		finally:
+			end = self._now()
+			children_after = resource.getrusage(resource.RUSAGE_CHILDREN)
+			read_after, write_after = _read_proc_io()
+			args.setdefault("child_cpu_s", round((children_after.ru_utime + children_after.ru_stime) - (children_before.ru_utime + children_before.ru_stime), 3))
+			args.setdefault("peak_rss_kb", max(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss, children_after.ru_maxrss))
+			args.setdefault("bytes_read", read_after - read_before)
+			args.setdefault("bytes_written", write_after - write_before)
+			self.add_span(name, cat, start, end, overlapping, **args)
+
+	def add_span(self, name: str, cat: str, start: float, end: float, overlapping: bool = False, **args) -> None:
+		"""
+		Add an already measured span
+		:param start: start in microseconds since the epoch
+		:param end: end in microseconds since the epoch
+		:return:
+		"""
+		if not self.enabled:
+			return
+		tid = threading.get_native_id()
+		if overlapping:
+			span_id = next(self._ids)
+			self._add({"name": name, "cat": cat, "ph": "b", "id": span_id, "ts": start, "pid": self._pid, "tid": tid, "args": args})
+			self._add({"name": name, "cat": cat, "ph": "e", "id": span_id, "ts": end, "pid": self._pid, "tid": tid})
+		else:
+			self._add({"name": name, "cat": cat, "ph": "X", "ts": start, "dur": end - start, "pid": self._pid, "tid": tid, "args": args})
+
+	def events(self) -> list[dict]:
+		with self._lock:
+			return list(self._events)
+
+	def save(self, path: str) -> None:
+		"""
+		Write all spans as a Chrome trace file
+		:param path: where to write the trace
+		:return:
+		"""
+		if not self.enabled:
+			return
+		path = os.path.expanduser(path)
+		os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+		with open(path, "w") as file:
+			json.dump({"traceEvents": self.events(), "displayTimeUnit": "ms"}, file)
+		print(Fore.GREEN + f"\nTrace written to {path}" + Style.RESET_ALL)
+
+# One tracer per process, main.py and master.py enable it with --trace.
+# The worker (worker.py) runs several jobs in one process and gives every job its own tracer with use_tracer
+tracer = Tracer()
+_job_tracer = contextvars.ContextVar("job_tracer", default=None)
+
+def current() -> Tracer:
+	"""
+	The tracer of the running job, the one of the process if the job has none
+	"""
+	return _job_tracer.get() or tracer
+
+def use_tracer(job_tracer: Tracer) -> None:
+	"""
+	Record everything of the current context (and the stages started from it) with job_tracer
+	"""
+	_job_tracer.set(job_tracer)
+
+def span(name: str, cat: str, overlapping: bool = False, **args):
+	"""
+	Time the code inside the with block with the tracer of the running job, see Tracer.span
+	"""
+	return current().span(name, cat, overlapping, **args)
+
+def submit_in_context(executor, function, *args, **kwargs):
+	"""
+	executor.submit that runs the function in a copy of the context of the caller.
+	The threads of an executor do not inherit the context, without it the call would record into the tracer of the process
+	instead of the tracer of the job (see use_tracer). Every call gets its own copy, a context can only be entered once at a time.
+	:return: the future of the call
+	"""
+	return executor.submit(contextvars.copy_context().run, function, *args, **kwargs)
+
+def _communicate(process: subprocess.Popen, input) -> tuple:
+	"""
+	Popen.communicate without reaping the child, the pipes are read in threads so a full pipe never blocks the child
+	:return: (stdout, stderr), None for a stream that is no pipe
+	"""
+	output = {}
+	def read(name: str, stream) -> None:
+		output[name] = stream.read()
+		stream.close()
+	threads = [threading.Thread(target=read, args=(name, stream), daemon=True) for name, stream in (("stdout", process.stdout), ("stderr", process.stderr)) if stream is not None]
+	for thread in threads:
+		thread.start()
+	if process.stdin is not None:
+		try:
+			if input is not None:
+				process.stdin.write(input)
+			process.stdin.close()
+		except BrokenPipeError:
+			pass
+	for thread in threads:
+		thread.join()
+	return output.get("stdout"), output.get("stderr")
+
+def run(*popenargs, input=None, check=False, **kwargs) -> subprocess.CompletedProcess:
+	"""
+	Drop in replacement for subprocess.run that records a span with the exact CPU time,
+	peak RSS and disk bytes of the child process
+	:return: the completed process
+	"""
+	tracer = current()
+	if not tracer.enabled:
+		return subprocess.run(*popenargs, input=input, check=check, **kwargs)
+
+	command = popenargs[0] if popenargs else kwargs.get("args")
+	program = os.path.basename(str(command[0] if isinstance(command, (list, tuple)) else command).split()[0])
+	if input is not None:
+		kwargs["stdin"] = subprocess.PIPE
+
+	start = tracer._now()
+	with subprocess.Popen(*popenargs, **kwargs) as process:
+		try:
+			stdout, stderr = _communicate(process, input)
+			# The child is reaped here instead of by Popen, wait4 returns its own resource usage with its status
+			_, status, rusage = os.wait4(process.pid, 0)
+			process.returncode = os.waitstatus_to_exitcode(status)
+		except BaseException:
+			process.kill()
+			raise
+		retcode = process.returncode
+	end = tracer._now()
+
+	args = {"command": " ".join(str(part) for part in command) if isinstance(command, (list, tuple)) else str(command), "returncode": retcode}
+	# ru_maxrss is in kilobytes on Linux and the block counts are 512 byte blocks
+	args["child_cpu_s"] = round(rusage.ru_utime + rusage.ru_stime, 3)
+	args["peak_rss_kb"] = rusage.ru_maxrss
+	args["bytes_read"] = rusage.ru_inblock * 512
+	args["bytes_written"] = rusage.ru_oublock * 512
+	tracer.add_span(program, "subprocess", start, end, **args)
+
+	if check and retcode:
+		raise subprocess.CalledProcessError(retcode, process.args, output=stdout, stderr=stderr)
+	return subprocess.CompletedProcess(process.args, retcode, stdout, stderr)
@@ -3,6 +3,8 @@ import sys
 import subprocess
 import traceback
 from colorama import Fore, Style, init
+from pipeline.slots import heavy_slot
+from pipeline import tracing
 
 class ShortFusion:
 	def __init__(self, path: str):
@@ -86,7 +88,7 @@ class ShortFusion:
 		]
 		
 		 # Run ffmpeg
-		result = subprocess.run(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+		result = tracing.run(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
 		if result.returncode != 0:
 			print(Fore.RED + f"\nError creating video from images: {result.stderr}" + Style.RESET_ALL)
 		else:
@@ -94,119 +96,134 @@ class ShortFusion:
 		
 		return final_visual_output
 	
-	def video_fusion(self) -> list[str]:
+	def video_fusion(self, language: str, path_to_video: str) -> str:
 		"""
-		Cuts the main video in the right length for the different audios
-		:return: list[str]
+		Cuts the main video in the right length for the audio of one language
+		:param language: name of the language track, e.g. german
+		:param path_to_video: the video made from all images by generate_video
+		:return: str - path to the cut video
 		"""
-		path_to_video = self.generate_video()
-		audio_paths = [os.path.join(self._audio_dir, "merged_german.mp3"), os.path.join(self._audio_dir, "merged_english.mp3")]
-		output_file_names = [os.path.join(self._videos_dir, "final_video_german.mp4"), os.path.join(self._videos_dir, "final_video_english.mp4")]
+		audio = os.path.join(self._audio_dir, f"merged_{language}.mp3")
+		output_file_name = os.path.join(self._videos_dir, f"final_video_{language}.mp4")
 		duration = 0
 
-		# Get the duration of the audios to then cut the video to the same length
-		for audio, output_file_name in zip(audio_paths, output_file_names):
-			result = subprocess.run(
-				[
-					"ffprobe",
-					"-v", "error",
-					"-show_entries", "format=duration",
-					"-of", "default=noprint_wrappers=1:nokey=1",
-					audio
-				],
-				stdout=subprocess.PIPE,
-				stderr=subprocess.STDOUT,
-				text=True
-			)
-			try:
-				tmp_duration = float(result.stdout.strip())
-				duration = int(tmp_duration)
-			except ValueError:
-				print("Could not retrieve duration.")
-			
-			# Cut the video to the duration of the audio
-			command = [
-				"ffmpeg",
-				"-i", path_to_video,
-				"-t", str(duration),
-				"-y",
-				output_file_name
-			]
-			try:
-				subprocess.run(command, check=True)
-			except subprocess.CalledProcessError as e:
-				print(Fore.RED + f"\nFailed to cut {path_to_video} to {duration} seconds." + Style.RESET_ALL)
+		# Get the duration of the audio to then cut the video to the same length
+		result = tracing.run(
+			[
+				"ffprobe",
+				"-v", "error",
+				"-show_entries", "format=duration",
+				"-of", "default=noprint_wrappers=1:nokey=1",
+				audio
+			],
+			stdout=subprocess.PIPE,
+			stderr=subprocess.STDOUT,
+			text=True
+		)
+		try:
+			tmp_duration = float(result.stdout.strip())
+			duration = int(tmp_duration)
+		except ValueError:
+			print("Could not retrieve duration.")
+		
+		# Cut the video to the duration of the audio
+		command = [
+			"ffmpeg",
+			"-i", path_to_video,
+			"-t", str(duration),
+			"-y",
+			output_file_name
+		]
+		try:
+			tracing.run(command, check=True)
+		except subprocess.CalledProcessError as e:
+			print(Fore.RED + f"\nFailed to cut {path_to_video} to {duration} seconds." + Style.RESET_ALL)
 
-		return output_file_names
+		return output_file_name
 
-	def audio_fusion(self) -> list[str]:
+	def audio_fusion(self, language: str) -> str:
 		"""
-		Fuses the audio in one audio where the music is a little quieter than the ai voice
-		:return: list[str]
+		Fuses the audio of one language in one audio where the music is a little quieter than the ai voice
+		:param language: name of the language track, e.g. german
+		:return: str - path to the merged audio
 		"""
-		voiceover_filenames = [os.path.join(self._audio_dir,"cleaned_output_german.mp3"), os.path.join(self._audio_dir,"cleaned_output_english.mp3")]
-		music_filenames = [os.path.join(self._audio_dir,"cut_song_german.mp3"), os.path.join(self._audio_dir,"cut_song_english.mp3")]
-		final_audio_output = [os.path.join(self._audio_dir, "merged_german.mp3"), os.path.join(self._audio_dir, "merged_english.mp3")]
-
-		# iterate trough the ai voices and music files at the same time
-		for voice, music, final_audio in zip(voiceover_filenames, music_filenames, final_audio_output):
+		voice = os.path.join(self._audio_dir, f"cleaned_output_{language}.mp3")
+		music = os.path.join(self._audio_dir, f"cut_song_{language}.mp3")
+		final_audio = os.path.join(self._audio_dir, f"merged_{language}.mp3")
 
-			# this is the command that helps 
-			command = [
-				"ffmpeg", "-y",
-				"-i", voice,
-				"-i", music,
-				"-filter_complex", 
-				"[1:a]volume=0.05[music];[0:a][music]amix=inputs=2:duration=longest",
-				"-c:a", "libmp3lame", "-q:a", "2",
-				final_audio
-			]
+		# this is the command that helps 
+		command = [
+			"ffmpeg", "-y",
+			"-i", voice,
+			"-i", music,
+			"-filter_complex", 
+			"[1:a]volume=0.05[music];[0:a][music]amix=inputs=2:duration=longest",
+			"-c:a", "libmp3lame", "-q:a", "2",
+			final_audio
+		]
 
-			audio = subprocess.run(
-				command,
-				stdout=subprocess.PIPE,
-				stderr=subprocess.PIPE,
-				text=True
-			)
+		audio = tracing.run(
+			command,
+			stdout=subprocess.PIPE,
+			stderr=subprocess.PIPE,
+			text=True
+		)
 
-			if audio.returncode != 0:
-				print(Fore.RED + f"\nError mixing audio: {audio.stderr}!" + Style.RESET_ALL)
+		if audio.returncode != 0:
+			print(Fore.RED + f"\nError mixing audio: {audio.stderr}!" + Style.RESET_ALL)
 		
-		return final_audio_output
+		return final_audio
 
-	def fusion_visuals_and_audio(self, videos: list[str], audios: list[str]) -> None:
-		subtitle_paths = [os.path.join(self._subtitles_dir, "cleaned_output_german.srt"), os.path.join(self._subtitles_dir, "cleaned_output_english.srt")]
-		output_paths = [os.path.join(self._output_dir, "german_video.mp4"), os.path.join(self._output_dir, "english_video.mp4")]
-		print(videos)
-		print(audios)
-		for video, audio, output_path, subtitle_path in zip(videos, audios, output_paths, subtitle_paths):
-			subprocess.run(
-				[
-					"ffmpeg",
-					"-y",
-					"-i", video,
-					"-i", audio,
-					"-vf", f"subtitles={subtitle_path}:force_style='Fontname=Arial,FontSize=16,PrimaryColour=&H00FFFFFF,Bold=1,MarginV=90'",
-					"-map", "0:v:0?",
-					"-map", "1:a:0",
-					"-c:v", "libx264",
-					"-c:a", "aac",
-					"-shortest",
-					output_path
-				]
-			)
+	def fusion_visuals_and_audio(self, language: str, video: str, audio: str) -> None:
+		"""
+		Puts the cut video, the merged audio and the subtitles of one language together into the video to upload
+		:param language: name of the language track, e.g. german
+		:param video: path to the cut video
+		:param audio: path to the merged audio
+		:return:
+		"""
+		subtitle_path = os.path.join(self._subtitles_dir, f"cleaned_output_{language}.srt")
+		output_path = os.path.join(self._output_dir, f"{language}_video.mp4")
+		tracing.run(
+			[
+				"ffmpeg",
+				"-y",
+				"-i", video,
+				"-i", audio,
+				"-vf", f"subtitles={subtitle_path}:force_style='Fontname=Arial,FontSize=16,PrimaryColour=&H00FFFFFF,Bold=1,MarginV=90'",
+				"-map", "0:v:0?",
+				"-map", "1:a:0",
+				"-c:v", "libx264",
+				"-c:a", "aac",
+				"-shortest",
+				output_path
+			]
+		)
+
+	def fuse_language(self, language: str, path_to_video: str) -> None:
+		"""
+		Everything of the fusion that belongs to one language track, the video made from the images is shared
+		:param language: name of the language track, e.g. german
+		:param path_to_video: the video made from all images by generate_video
+		:return:
+		"""
+		# All encodes are heavy so they only run when a slot is free
+		with heavy_slot():
+			print(Fore.GREEN + f"\nStarting audio fusion for {language}..." + Style.RESET_ALL)
+			audio = self.audio_fusion(language)
+			print(Fore.GREEN + f"\nStarting video fusion for {language}..." + Style.RESET_ALL)
+			video = self.video_fusion(language, path_to_video)
+			print(Fore.GREEN + f"\nStarting putting video and audio together for {language} to then upload it..." + Style.RESET_ALL)
+			self.fusion_visuals_and_audio(language, video, audio)
+		print(Fore.GREEN + f"\nFinished the fusion for {language}, next step will be uploading." + Style.RESET_ALL)
 	
-	def orchestrate_fusion(self) -> None:
+	def orchestrate_fusion(self, languages: list[str]) -> None:
 		"""
 		Simplified orchestration that only processes videos and images
+		:param languages: names of the language tracks
 		:return:
 		"""
-		print(Fore.GREEN + "\nStarting audio fusion..." + Style.RESET_ALL)
-		audio = self.audio_fusion()
-		print(Fore.GREEN + "\nFinished audio fusion." + Style.RESET_ALL)
-		print(Fore.GREEN + "\nStarting video fusion..." + Style.RESET_ALL)
-		video = self.video_fusion()
-		print(Fore.GREEN + "\nFinished video fusion." + Style.RESET_ALL)
-		print(Fore.GREEN + "\nStarting putting video and audio together to the upload it..." + Style.RESET_ALL)
-		self.fusion_visuals_and_audio(video, audio)
-		print(Fore.GREEN + "\nFinished the fusion, next step will be uploading." + Style.RESET_ALL)
+		with heavy_slot():
+			path_to_video = self.generate_video()
+		for language in languages:
+			self.fuse_language(language, path_to_video)
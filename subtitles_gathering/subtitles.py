@@ -2,48 +2,75 @@ import os
 import json
 import math
 from colorama import Fore, Style
-import subprocess
+from pipeline.slots import heavy_slot
+from pipeline import tracing
+from pipeline.languages import Language
+from pipeline.clients import whisper_model, whisper_lock
+
+# Set by the worker (worker.py) so that whisper runs with a model that stays loaded between jobs
+WHISPER_IN_PROCESS_ENV = "SHORTAUTOMATION_WHISPER_IN_PROCESS"
 
 class SubtitleGenerator:
-    def __init__(self, languages: list[str], path: str):
+    def __init__(self, languages: list[Language], path: str):
         self._languages = languages
         self._path = path
 
     def get_subtitles(self):
         """
-        Gets the subtitles of the videos in German and English using whisper
+        Gets the subtitles of the voices of every language track using whisper
         :return:
         """
-        input_paths = ["/audio/cleaned_output_german.mp3", "/audio/cleaned_output_english.mp3"]
-        output_paths = ["/subtitles/german.srt", "/subtitles/english.srt"]
-
-        for i, (language, input_path, output_path) in enumerate(zip(self._languages, input_paths, output_paths)):
+        for i, language in enumerate(self._languages):
             print(Fore.GREEN + f"\nGetting subtitles {i+1}/{len(self._languages)}." + Style.RESET_ALL)
             
-            # Build the full input and output paths
-            full_input_path = os.path.expanduser(self._path + input_path)
-            full_output_dir = os.path.dirname(os.path.expanduser(self._path + output_path))
+            # Build the full input and output paths, whisper names the .srt after the input file
+            full_input_path = os.path.expanduser(self._path + f"/audio/cleaned_output_{language.name}.mp3")
+            full_output_dir = os.path.expanduser(self._path + "/subtitles")
             
             # Create output directory if it doesn't exist
             os.makedirs(full_output_dir, exist_ok=True)
             
             try:
+                # The worker (worker.py) keeps the model loaded and transcribes in its own process
+                if os.environ.get(WHISPER_IN_PROCESS_ENV) == "1":
+                    self._transcribe_in_process(language, full_input_path, full_output_dir)
+                    print(Fore.GREEN + f"Subtitle generation for {language.name} completed." + Style.RESET_ALL)
+                    continue
+
                 # Run whisper with parameters to create shorter segments
-                subprocess.run([
-                    "whisper", 
-                    full_input_path,
-                    "--model", "small",
-                    "--language", language,
-                    "--device", "cuda",
-                    "--output_dir", full_output_dir,
-                    "--output_format", "srt",
-                    # Settings to create shorter segments:
-                    "--max_line_width", "15",     # Reduced character limit to force shorter lines
-                    "--max_line_count", "1",      # Only one line per segment 
-                    "--word_timestamps", "True"   # Enable word-level timestamps for more precise segmentation
-                ])
+                # Whisper is heavy so it only runs when a slot is free
+                with heavy_slot():
+                    tracing.run([
+                        "whisper", 
+                        full_input_path,
+                        "--model", os.environ.get("WHISPER_MODEL", "small"),
+                        "--language", language.code,
+                        "--device", os.environ.get("WHISPER_DEVICE", "cuda"),
+                        "--output_dir", full_output_dir,
+                        "--output_format", "srt",
+                        # Settings to create shorter segments:
+                        "--max_line_width", "15",     # Reduced character limit to force shorter lines
+                        "--max_line_count", "1",      # Only one line per segment 
+                        "--word_timestamps", "True"   # Enable word-level timestamps for more precise segmentation
+                    ])
                 
                 
-                print(Fore.GREEN + f"Subtitle generation for {language} completed." + Style.RESET_ALL)
+                print(Fore.GREEN + f"Subtitle generation for {language.name} completed." + Style.RESET_ALL)
             except Exception as e:
-                print(Fore.RED + f"Error generating subtitles for {language}: {e}" + Style.RESET_ALL)
\ No newline at end of file
+                print(Fore.RED + f"Error generating subtitles for {language.name}: {e}" + Style.RESET_ALL)
+
+    def _transcribe_in_process(self, language: Language, input_path: str, output_dir: str) -> None:
+        """
+        Same as the whisper command line but with the model of this process, the .srt is named after the input file
+        :param language: the language of the voice
+        :param input_path: the voice to transcribe
+        :param output_dir: where the .srt is written
+        :return:
+        """
+        from whisper.utils import get_writer
+
+        model = whisper_model(os.environ.get("WHISPER_MODEL", "small"), os.environ.get("WHISPER_DEVICE", "cuda"))
+        with heavy_slot(), whisper_lock(), tracing.span("whisper.transcribe", "subprocess", language=language.code):
+            result = model.transcribe(input_path, language=language.code, word_timestamps=True)
+        writer = get_writer("srt", output_dir)
+        writer(result, input_path, {"max_line_width": 15, "max_line_count": 1, "highlight_words": False})
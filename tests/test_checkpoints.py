@@ -0,0 +1,58 @@
+from pipeline.checkpoints import CheckpointStore
+from pipeline.scheduler import Stage, StageScheduler
+
+def make_stages(tmp_path, log: list, params: dict = None) -> list[Stage]:
+	source, result = tmp_path / "source.txt", tmp_path / "result.txt"
+
+	def transform() -> None:
+		log.append("transform")
+		result.write_text(source.read_text().upper())
+
+	return [Stage("transform", transform, inputs=[str(source)], outputs=[str(result)], params=params or {})]
+
+def run(tmp_path, log: list, params: dict = None) -> None:
+	StageScheduler(make_stages(tmp_path, log, params), checkpoints=CheckpointStore(str(tmp_path))).run()
+
+def test_unchanged_stage_is_skipped_on_resume(tmp_path):
+	(tmp_path / "source.txt").write_text("hello")
+	log = []
+	run(tmp_path, log)
+	run(tmp_path, log)
+	assert log == ["transform"]
+	assert (tmp_path / ".checkpoints.json").exists()
+
+def test_changed_input_reruns_the_stage(tmp_path):
+	(tmp_path / "source.txt").write_text("hello")
+	log = []
+	run(tmp_path, log)
+	(tmp_path / "source.txt").write_text("hello again")
+	run(tmp_path, log)
+	assert log == ["transform", "transform"]
+	assert (tmp_path / "result.txt").read_text() == "HELLO AGAIN"
+
+def test_changed_params_rerun_the_stage(tmp_path):
+	(tmp_path / "source.txt").write_text("hello")
+	log = []
+	run(tmp_path, log, {"budget": 1})
+	run(tmp_path, log, {"budget": 2})
+	assert log == ["transform", "transform"]
+
+def test_changed_or_missing_output_reruns_the_stage(tmp_path):
+	(tmp_path / "source.txt").write_text("hello")
+	log = []
+	run(tmp_path, log)
+	(tmp_path / "result.txt").write_text("edited by hand")
+	run(tmp_path, log)
+	(tmp_path / "result.txt").unlink()
+	run(tmp_path, log)
+	assert log == ["transform"] * 3
+
+def test_directories_hash_their_files(tmp_path):
+	store = CheckpointStore(str(tmp_path))
+	folder = tmp_path / "images"
+	folder.mkdir()
+	(folder / "image_0.png").write_bytes(b"one")
+	before = store.hash_path(str(folder))
+	(folder / "image_1.png").write_bytes(b"two")
+	assert store.hash_path(str(folder)) != before
+	assert store.hash_path(str(tmp_path / "missing")) == "missing"
@@ -0,0 +1,65 @@
+import pytest
+from info_gathering.condense import strip_boilerplate, keep_informative, condense, count_tokens
+
+# Sentences of real news articles that mention the words banners use
+ARTICLE_SENTENCES = [
+	"Netflix added 5 million subscribers in the last quarter, more than analysts had expected.",
+	"Google will phase out third-party cookies in Chrome for one percent of its users starting in January.",
+	"Meta updated its privacy policy to allow training its AI models on public posts in Europe.",
+	"Die Datenschutzbehörde verhängte eine Strafe von 1,2 Milliarden Euro gegen den Konzern.",
+	"The company changed its terms of service after regulators in the European Union opened an investigation.",
+	"Advertisers spent less on social media this year, according to a report by the research firm.",
+	"Sponsors of the bill say it would force platforms to explain how their recommendation systems work.",
+]
+
+BANNERS = [
+	"We use cookies to improve your experience on our website.",
+	"Accept all cookies or manage your cookie settings below.",
+	"Subscribe to our newsletter and get the latest tech news every morning.",
+	"© 2026 Example Media GmbH. All rights reserved.",
+	"Read more: Apple's new chip beats every laptop we tested",
+	"By continuing you agree to our privacy policy and our terms of use.",
+	"Jetzt Newsletter abonnieren und keine Nachricht mehr verpassen.",
+	"Mehr zum Thema: Wie die neue KI-Verordnung Startups trifft",
+]
+
+def test_article_sentences_are_kept():
+	assert strip_boilerplate(ARTICLE_SENTENCES) == ARTICLE_SENTENCES
+
+def test_banners_are_dropped():
+	assert strip_boilerplate(BANNERS + ARTICLE_SENTENCES[:1]) == ARTICLE_SENTENCES[:1]
+
+def test_long_paragraph_with_phrase_is_kept():
+	paragraph = (
+		"The regulator said the banner that asked visitors to accept all cookies was designed to push them towards consent, "
+		"and it ordered the publisher to offer a reject button of the same size on every page within three months."
+	)
+	assert strip_boilerplate([paragraph]) == [paragraph]
+
+def test_short_and_repeated_paragraphs_are_dropped():
+	assert strip_boilerplate(["Share", ARTICLE_SENTENCES[0], ARTICLE_SENTENCES[0].upper()]) == [ARTICLE_SENTENCES[0]]
+
+def test_keep_informative_stays_in_budget_and_order():
+	paragraphs = [" ".join(ARTICLE_SENTENCES[:3]), " ".join(ARTICLE_SENTENCES[3:])]
+	kept = keep_informative(paragraphs, 40)
+	text = " ".join(kept)
+	assert 0 < count_tokens(text) <= 40
+	positions = [" ".join(paragraphs).index(sentence) for sentence in ARTICLE_SENTENCES if sentence in text]
+	assert positions == sorted(positions)
+
+def test_condense_keeps_short_text():
+	text = "\n".join(ARTICLE_SENTENCES)
+	assert condense(text, 10000) == text
+
+def test_condense_sends_short_paragraphs_if_nothing_else_is_left():
+	text = "iPhone 17 Pro\n\n256 GB, Titan\nAb 1.199 Euro"
+	assert condense(text, 10000) == "iPhone 17 Pro\n256 GB, Titan\nAb 1.199 Euro"
+
+def test_condense_cuts_a_too_long_sentence_to_the_budget():
+	text = " ".join(["Nvidia"] * 60 + ["unveiled", "a", "chip."])
+	condensed = condense(text, 20)
+	assert condensed and condensed.startswith("Nvidia") and count_tokens(condensed) <= 20
+
+def test_condense_fails_without_text():
+	with pytest.raises(ValueError):
+		condense(" \n\n ", 1000)
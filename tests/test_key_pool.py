@@ -0,0 +1,108 @@
+import os
+import time
+import threading
+import pytest
+from voice_gathering import key_pool
+from voice_gathering.key_pool import ApiKey, KeyPool, api_keys
+
+class ApiError(Exception):
+	def __init__(self, status_code: int, headers: dict = None) -> None:
+		super().__init__(status_code)
+		self.status_code = status_code
+		self.headers = headers or {}
+
+def make_pool(monkeypatch, quotas: dict) -> KeyPool:
+	"""
+	A pool without network, quotas maps the name of a key to its characters left (None if it may not read its quota)
+	"""
+	def read_quota(self, api_key):
+		api_key.remaining = quotas[api_key.name]
+		api_key.reset_at = None if quotas[api_key.name] is None else time.time() + 3600
+	monkeypatch.setattr(KeyPool, "_read_quota", read_quota)
+	return KeyPool([ApiKey(name, f"key-{name}") for name in quotas])
+
+def test_api_keys_are_sorted_by_number(monkeypatch):
+	for name in list(os.environ):
+		if name.startswith("ELEVEN_LABS_API_"):
+			monkeypatch.delenv(name)
+	with pytest.raises(ValueError):
+		api_keys()
+	monkeypatch.setenv("ELEVEN_LABS_API_10", "ten")
+	monkeypatch.setenv("ELEVEN_LABS_API_2", "two")
+	monkeypatch.setenv("ELEVEN_LABS_API_3", "")
+	assert [api_key.name for api_key in api_keys()] == ["ELEVEN_LABS_API_2", "ELEVEN_LABS_API_10"]
+
+def test_key_with_most_characters_left_is_taken(monkeypatch):
+	pool = make_pool(monkeypatch, {"a": 500, "b": 2000, "c": None})
+	api_key = pool.acquire(300)
+	assert api_key.name == "b" and api_key.remaining == 1700
+	# The busy key is only taken again once every other key has a conversion too
+	assert pool.acquire(300).name == "a"
+	assert pool.acquire(300).name == "c"
+	pool.release(api_key, 300)
+	assert api_key.remaining == 1700 and api_key.in_flight == 0
+
+def test_too_small_quota_is_skipped(monkeypatch):
+	pool = make_pool(monkeypatch, {"a": 100, "b": 1000})
+	assert pool.acquire(900).name == "b"
+	with pytest.raises(ValueError):
+		pool.acquire(200)
+
+def test_failed_conversion_gives_the_characters_back(monkeypatch):
+	pool = make_pool(monkeypatch, {"a": 1000})
+	api_key = pool.acquire(400)
+	pool.release(api_key, 400, ApiError(500))
+	assert api_key.remaining == 1000 and not api_key.exhausted
+
+def test_rate_limited_key_cools_down(monkeypatch):
+	pool = make_pool(monkeypatch, {"a": 5000, "b": 1000})
+	api_key = pool.acquire(100)
+	pool.release(api_key, 100, ApiError(429, {"retry-after": "60"}))
+	assert api_key.cooldown_until > time.time() + 50
+	assert pool.acquire(100).name == "b"
+
+def test_rate_limited_pool_waits_for_the_cooldown(monkeypatch):
+	pool = make_pool(monkeypatch, {"a": 1000})
+	api_key = pool.acquire(100)
+	pool.release(api_key, 100, ApiError(429, {"retry-after": "0.2"}))
+	start = time.time()
+	assert pool.acquire(100) is api_key
+	assert time.time() - start >= 0.15
+
+def test_unauthorized_key_is_exhausted(monkeypatch):
+	pool = make_pool(monkeypatch, {"a": None, "b": 100})
+	api_key = pool.acquire(200)
+	assert api_key.name == "a"
+	pool.release(api_key, 200, ApiError(401))
+	assert api_key.exhausted
+	with pytest.raises(ValueError):
+		pool.acquire(200)
+	assert pool.attempts() == 5
+
+def test_pool_is_shared_until_the_keys_change(monkeypatch):
+	monkeypatch.setattr(KeyPool, "_read_quota", lambda self, api_key: None)
+	monkeypatch.setattr(key_pool, "_pools", {})
+	monkeypatch.setattr(key_pool, "api_keys", lambda: [ApiKey("ELEVEN_LABS_API_1", "one")])
+	pool = key_pool.key_pool()
+	assert key_pool.key_pool() is pool
+	monkeypatch.setattr(key_pool, "api_keys", lambda: [ApiKey("ELEVEN_LABS_API_1", "new")])
+	assert key_pool.key_pool() is not pool
+
+def test_slow_quota_request_does_not_block_other_pools(monkeypatch):
+	started, release = threading.Event(), threading.Event()
+	def read_quota(self, api_key):
+		if api_key.key == "slow":
+			started.set()
+			release.wait(5)
+	monkeypatch.setattr(KeyPool, "_read_quota", read_quota)
+	monkeypatch.setattr(key_pool, "_pools", {})
+	monkeypatch.setattr(key_pool, "api_keys", lambda: [ApiKey("ELEVEN_LABS_API_1", "slow")])
+	slow = threading.Thread(target=key_pool.key_pool)
+	slow.start()
+	started.wait(5)
+	monkeypatch.setattr(key_pool, "api_keys", lambda: [ApiKey("ELEVEN_LABS_API_1", "fast")])
+	start = time.time()
+	key_pool.key_pool()
+	assert time.time() - start < 1
+	release.set()
+	slow.join()
@@ -0,0 +1,34 @@
+from info_gathering.link_ranking import LinkIndex, terms, slug
+
+def test_terms_and_slug():
+	assert terms("New Robots, 2026!") == ["new", "robot"]
+	assert terms("Business class") == ["business", "class"]
+	assert slug("https://techcrunch.com/2026/10/18/openai-launches-new-model/").split() == ["2026", "10", "18", "openai", "launches", "new", "model"]
+
+def make_index() -> LinkIndex:
+	index = LinkIndex()
+	index.add("https://example.com/2026/10/18/nvidia-unveils-new-ai-chip/", "Nvidia unveils a new AI chip")
+	index.add("https://example.com/2026/10/18/city-budget-approved/", "City council approves the budget")
+	index.add("https://example.com/2026/10/18/robots-in-warehouses/", "Robots take over warehouses")
+	index.add("https://example.com/2026/10/18/chip-shortage/", "")
+	return index
+
+def test_search_ranks_by_anchor_text_and_url():
+	ranked = make_index().search(["ai", "chip"])
+	urls = [url for url, _ in ranked]
+	assert urls[0].endswith("nvidia-unveils-new-ai-chip/")
+	assert urls[1].endswith("chip-shortage/")
+	assert all(score > 0 for _, score in ranked)
+	assert not any("budget" in url for url in urls)
+
+def test_search_matches_plurals_and_limits_results():
+	index = make_index()
+	assert index.search(["robot"])[0][0].endswith("robots-in-warehouses/")
+	assert len(index.search(["ai", "chip"], top_n=1)) == 1
+	assert index.search(["football"]) == []
+	assert LinkIndex().search(["chip"]) == []
+
+def test_known_url_is_not_indexed_twice():
+	index = make_index()
+	index.add("https://example.com/2026/10/18/city-budget-approved/", "chip chip chip")
+	assert not any("budget" in url for url, _ in index.search(["chip"]))
@@ -0,0 +1,38 @@
+import os
+import time
+from pipeline.retention import RetentionManager
+
+def make_workspace(tmp_path, name: str, size: int = 1000) -> str:
+	path = tmp_path / name
+	path.mkdir()
+	(path / "video.mp4").write_bytes(b"x" * size)
+	return str(path)
+
+def test_expired_workspaces_are_deleted(tmp_path):
+	manager = RetentionManager(str(tmp_path / "registry"), min_free_bytes=0)
+	expired = make_workspace(tmp_path, "expired")
+	kept = make_workspace(tmp_path, "kept")
+	manager.register(expired, 0)
+	manager.register(kept, 3600)
+	assert manager.collect() == [expired]
+	assert not os.path.exists(expired) and os.path.isdir(kept)
+
+def test_quota_deletes_the_least_recently_used(tmp_path):
+	manager = RetentionManager(str(tmp_path / "registry"), quota_bytes=2500, min_free_bytes=0)
+	workspaces = []
+	for name in ("first", "second", "third"):
+		workspaces.append(make_workspace(tmp_path, name))
+		manager.register(workspaces[-1])
+		time.sleep(0.01)
+	# The first one is resumed, so it was used last
+	manager.release(workspaces[0])
+	manager.register(workspaces[0])
+	assert manager.collect() == [workspaces[1]]
+
+def test_released_workspace_is_not_deleted_for_the_quota(tmp_path):
+	manager = RetentionManager(str(tmp_path / "registry"), quota_bytes=0, min_free_bytes=0)
+	workspace = make_workspace(tmp_path, "resumed")
+	manager.register(workspace)
+	manager.release(workspace)
+	assert manager.collect() == []
+	assert os.path.isdir(workspace)
@@ -0,0 +1,63 @@
+import threading
+import pytest
+from pipeline.scheduler import Stage, StageScheduler, StageError
+
+def writer(path, log: list, name: str, content: str = "done"):
+	def run() -> None:
+		log.append(name)
+		path.write_text(content)
+	return run
+
+def test_stages_run_after_the_stages_they_read_from(tmp_path):
+	log = []
+	a, b, c = tmp_path / "a.txt", tmp_path / "b.txt", tmp_path / "c.txt"
+	stages = [
+		Stage("c", writer(c, log, "c"), inputs=[str(a), str(b)], outputs=[str(c)]),
+		Stage("b", writer(b, log, "b"), inputs=[str(a)], outputs=[str(b)]),
+		Stage("a", writer(a, log, "a"), outputs=[str(a)]),
+	]
+	StageScheduler(stages).run()
+	assert log == ["a", "b", "c"]
+
+def test_independent_stages_run_at_the_same_time(tmp_path):
+	barrier = threading.Barrier(2, timeout=5)
+	stages = [Stage(name, barrier.wait) for name in ("left", "right")]
+	StageScheduler(stages, max_workers=2).run()
+
+def test_duplicate_outputs_and_cycles_are_rejected(tmp_path):
+	a, b = str(tmp_path / "a"), str(tmp_path / "b")
+	with pytest.raises(ValueError):
+		StageScheduler([Stage("one", lambda: None, outputs=[a]), Stage("two", lambda: None, outputs=[a])])
+	with pytest.raises(ValueError):
+		StageScheduler([Stage("one", lambda: None, inputs=[b], outputs=[a]), Stage("two", lambda: None, inputs=[a], outputs=[b])])
+
+def test_missing_output_fails_the_stage(tmp_path):
+	with pytest.raises(StageError, match="missing outputs"):
+		StageScheduler([Stage("lazy", lambda: None, outputs=[str(tmp_path / "never.txt")])]).run()
+
+def failing() -> None:
+	raise RuntimeError("boom")
+
+def test_failure_stops_new_stages(tmp_path):
+	log = []
+	a = tmp_path / "a.txt"
+	stages = [
+		Stage("fails", failing, outputs=[str(a)]),
+		Stage("after", writer(tmp_path / "b.txt", log, "after"), inputs=[str(a)], outputs=[str(tmp_path / "b.txt")]),
+	]
+	with pytest.raises(StageError, match="boom"):
+		StageScheduler(stages).run()
+	assert log == []
+
+def test_keep_going_only_leaves_out_the_dependents(tmp_path):
+	log = []
+	a, b, c, d = (tmp_path / f"{name}.txt" for name in "abcd")
+	stages = [
+		Stage("fails", failing, outputs=[str(a)]),
+		Stage("dependent", writer(b, log, "dependent"), inputs=[str(a)], outputs=[str(b)]),
+		Stage("transitive", writer(c, log, "transitive"), inputs=[str(b)], outputs=[str(c)]),
+		Stage("other", writer(d, log, "other"), outputs=[str(d)]),
+	]
+	with pytest.raises(StageError, match="fails"):
+		StageScheduler(stages, keep_going=True).run()
+	assert log == ["other"]
@@ -0,0 +1,45 @@
+from info_gathering.story_index import StoryIndex, signature, similarity, remember, workspace_id
+
+STORY = (
+	"Researchers at the university presented a new chip that runs large language models directly on a phone. "
+	"The chip uses a tenth of the energy of current designs and could reach the first devices next year, "
+	"according to the team that built the prototype in cooperation with two manufacturers."
+)
+SAME_STORY = (
+	"A new chip that runs large language models directly on a phone was presented by researchers at the university. "
+	"It uses a tenth of the energy of current designs, the team said, and could reach the first devices next year."
+)
+OTHER_STORY = (
+	"The city council approved the budget for the new tram line on Tuesday evening after a long debate. "
+	"Construction starts in spring and the first trains are expected to run through the old town in four years."
+)
+
+def test_signature_needs_enough_text():
+	assert signature("too short") is None
+	assert len(signature(STORY)) == 128
+
+def test_similarity_separates_stories():
+	assert similarity(signature(STORY), signature(STORY)) == 1.0
+	assert similarity(signature(STORY), signature(SAME_STORY)) >= 0.35
+	assert similarity(signature(STORY), signature(OTHER_STORY)) < 0.1
+
+def test_index_finds_the_same_story(tmp_path):
+	index = StoryIndex(str(tmp_path / "stories.sqlite"))
+	index.add("https://example.com/chip", signature(STORY), "job-1")
+	url, score = index.find_duplicate(signature(SAME_STORY))
+	assert url == "https://example.com/chip" and score >= index.threshold
+	assert index.find_duplicate(signature(OTHER_STORY)) is None
+
+def test_own_job_is_no_duplicate(tmp_path):
+	index = StoryIndex(str(tmp_path / "stories.sqlite"))
+	index.add("https://example.com/chip", signature(STORY), "job-1")
+	assert index.find_duplicate(signature(STORY), "job-1") is None
+	assert index.find_duplicate(signature(STORY), "job-2") is not None
+
+def test_remember_adds_the_articles_of_a_short(tmp_path, monkeypatch):
+	monkeypatch.setenv("SHORTAUTOMATION_STORY_INDEX", str(tmp_path / "stories.sqlite"))
+	remember({"https://example.com/chip": STORY, "https://example.com/empty": ""}, "job-1")
+	assert StoryIndex().find_duplicate(signature(SAME_STORY))[0] == "https://example.com/chip"
+
+def test_workspace_id_is_stable(tmp_path):
+	assert workspace_id(str(tmp_path)) == workspace_id(str(tmp_path))
@@ -0,0 +1,41 @@
+import json
+from pipeline.llm import JsonStringReader
+from info_gathering.gpt_rewrite import split_sentences, MIN_SENTENCE_CHARS
+
+def read(reader: JsonStringReader, raw: str, size: int) -> str:
+	return "".join(reader.feed(raw[i:i + size]) for i in range(0, len(raw), size))
+
+def test_reader_returns_the_value_while_it_is_streamed():
+	value = 'A "new" chip\\path\nnext line, 5 € and 🚀 Ünïcode'
+	raw = json.dumps({"title": "A \"title\"", "script": value, "prompts": ["a", "b"]})
+	for size in (1, 2, 3, 7, len(raw)):
+		reader = JsonStringReader("script")
+		assert read(reader, raw, size) == value
+		assert reader.done
+
+def test_reader_decodes_unicode_escapes_cut_in_half():
+	raw = json.dumps({"script": "5 € and 🚀"}, ensure_ascii=True)
+	reader = JsonStringReader("script")
+	assert read(reader, raw, 1) == "5 € and 🚀"
+
+def test_reader_waits_for_the_property():
+	reader = JsonStringReader("script")
+	assert reader.feed('{"title": "Chips", "scr') == ""
+	assert reader.feed('ipt": "Hello') == "Hello"
+	assert not reader.done
+	assert reader.feed(' world", "prompts": ["x"]}') == " world"
+	assert reader.done
+	assert reader.feed('"more"') == ""
+
+def test_split_sentences_keeps_the_incomplete_rest():
+	text = "Nvidia unveiled a new chip today. It is fast. It runs large language models on any phone! It is cheap. The company"
+	pieces, rest = split_sentences(text)
+	assert pieces == ["Nvidia unveiled a new chip today. It is fast.", "It runs large language models on any phone!"]
+	assert rest == "It is cheap. The company"
+	assert all(len(piece) >= MIN_SENTENCE_CHARS - 1 for piece in pieces)
+
+def test_split_sentences_needs_whitespace_after_the_end():
+	pieces, rest = split_sentences("The chip costs 3.5 billion dollars and ships next year.")
+	assert pieces == [] and rest == "The chip costs 3.5 billion dollars and ships next year."
+	pieces, rest = split_sentences("„Das ist ein großer Schritt für die ganze Branche“, sagte er. ")
+	assert pieces == ["„Das ist ein großer Schritt für die ganze Branche“, sagte er."] and rest == ""
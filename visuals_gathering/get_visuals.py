@@ -1,29 +1,94 @@
 import os
-import requests
 import subprocess
-import multiprocessing as mp
 import asyncio
 import aiohttp
 from colorama import Fore, Style
-from openai import OpenAI
 from dotenv import load_dotenv
-from yt_dlp import YoutubeDL
+from pipeline import tracing
+from pipeline import llm
+from pipeline import speculation
+from info_gathering.gpt_rewrite import read_extras
 
 # Load environment variables from .env file
 load_dotenv()
 
+# Every image is shown for 3 seconds, about 150 words are 60 seconds of voice
+SECONDS_PER_IMAGE = 3
+WORDS_PER_SECOND = 2.5
+
+async def request_image(description: str, download_name: int = None) -> bytes:
+	"""
+	Generate one image with the Stability API
+	:param description: the image prompt
+	:param download_name: number of the image, only for the trace
+	:return: the png
+	"""
+	api_key = os.environ.get("STABLE_DIFFUSION_API_KEY")
+	host = os.environ.get("STABILITY_API_HOST", "https://api.stability.ai")
+
+	# prepare the form data
+	form_data = aiohttp.FormData()
+	form_data.add_field("prompt", description +", high quality, realistic, visually engaging, modern, cinematic lighting, professional, clean background, epic composition", content_type="text/plain; charset=utf-8")
+	form_data.add_field("aspect_ratio", "9:16", content_type="text/plain; charset=utf-8")
+	form_data.add_field("output_format", "png", content_type="text/plain; charset=utf-8")
+
+	# call the api async
+	with tracing.span("stability.generate", "api", overlapping=True, image=download_name) as info:
+		async with aiohttp.ClientSession() as session:
+			async with session.post(
+				f"{host}/v2beta/stable-image/generate/core",
+				headers={
+					"authorization": f"Bearer {api_key}",
+					"accept": "image/*"
+				},
+				data=form_data
+			) as response:
+				if response.status == 200:
+					image_data = await response.read()
+					info["bytes_received"] = len(image_data)
+					return image_data
+				error_text = await response.text()
+				print(f"{Fore.RED}Error generating image: {error_text}{Style.RESET_ALL}")
+				raise Exception(error_text)
+
+def _request_image_in_thread(description: str, download_name: int) -> bytes:
+	return asyncio.run(request_image(description, download_name))
+
+def speculate_images(speculated: speculation.Speculation, script: str, prompts: list[str]) -> list[str]:
+	"""
+	Start the images of a script that is still reviewed, VideoDownloader.get_image adopts the ones of the prompts it uses.
+	The voice does not exist yet, so the number of images is estimated from the words of the script, the visuals make the
+	missing ones themselves and the ones too many are dropped.
+	:param speculated: the speculation of the job
+	:param script: the proposed script
+	:param prompts: its image prompts
+	:return: the keys of the started calls
+	"""
+	needed = int(len(script.split()) / WORDS_PER_SECOND / SECONDS_PER_IMAGE) + 2
+	result_keys = []
+	for index, description in enumerate(prompts[:needed]):
+		result_key = speculation.key("image", description)
+		speculated.start(result_key, _request_image_in_thread, description, index)
+		result_keys.append(result_key)
+	return result_keys
+
 class VideoDownloader:
-	def __init__(self, output_path: list[str], script: str) -> None:
+	def __init__(self, output_path: list[str], script: str, speculated: speculation.Speculation = None) -> None:
+		"""
+		:param output_path: the visuals folder and the output path of the short
+		:param script: path of the english script, its image prompts are next to it
+		:param speculated: the images made while the script was reviewed, see speculate_images
+		"""
 		self._output_path = output_path
 		self._script = script
+		self._speculated = speculated
 		self._number_of_picked_visuals = 0
 		self._needed_visuals = self.calculate_visuals_needed()
-		self._ai_generator_api_key = os.environ.get("STABLE_DIFFUSION_API_KEY")
 	
 	def calculate_visuals_needed(self) -> int:
 		buffer = 2
 		path = os.path.expanduser(self._output_path[1]) + "/audio/cleaned_output_german.mp3"
-		result = subprocess.run(
+		result = tracing.run(
 			[
 				"ffprobe",
 				"-v", "error",
@@ -50,67 +115,58 @@ class VideoDownloader:
 			list[str]: descrptions of what to create
 		"""
 
-		# list for the results
-		description_list = []
+		# The prompts were usually generated together with the script, a call is only needed if there are too few
+		description_list = read_extras(self._script).get("image_prompts") or []
+		if len(description_list) >= self._needed_visuals:
+			description_list = description_list[:self._needed_visuals]
+			print(f"{Fore.GREEN}Generate pictures with these descriptions: {description_list}{Style.RESET_ALL}")
+			return description_list
 
 		# read from the script file
 		with open(os.path.expanduser(self._script), "r") as file:
-			self._script = file.read()
+			script = file.read()
 		
-		# chatgpt call to generate the descpritons
-		client = OpenAI()
-		completion = client.chat.completions.create(
-			model="gpt-4o-mini-2024-07-18",
-			messages=[
+		# chatgpt call to generate the descpritons as a JSON list
+		schema = {
+			"type": "object",
+			"properties": {"image_prompts": {"type": "array", "items": {"type": "string"}}},
+			"required": ["image_prompts"],
+			"additionalProperties": False
+		}
+
+		def check(answer: dict) -> None:
+			if not answer["image_prompts"]:
+				raise llm.LLMResponseError("there are no image prompts")
+
+		answer = llm.chat_json(
+			[
 				{"role": "system", "content": "You are a professional in creating good and short descriptions for AI images."},
 				{
 					"role": "user",
-					"content": f"Generate {self._needed_visuals} vivid, symbolic image prompts that visually represent the most important ideas and themes from the following script: '{self._script}'. Only create prompts that are directly related to the main topic or its core concepts.Each prompt should be a clear, concise sentence describing a visually striking image, separated by '|'."
+					"content": f"Generate {self._needed_visuals} vivid, symbolic image prompts that visually represent the most important ideas and themes from the following script: '{script}'. Only create prompts that are directly related to the main topic or its core concepts.Each prompt should be a clear, concise sentence describing a visually striking image."
 				}
-			]
+			],
+			"image_prompts",
+			schema,
+			check
 		)
-
-		# Extract the content from the completion object
-		content = completion.choices[0].message.content
-		
-		# Split the content string with the delimiter and return the list
-		description_list = content.split('|')
+		description_list = answer["image_prompts"][:self._needed_visuals]
 		print(f"{Fore.GREEN}Generate pictures with these descriptions: {description_list}{Style.RESET_ALL}")
 		return description_list
 	
 	async def get_image(self, description: str, download_name: int) -> None:
 		"""
-		Used to make the api call to generate the image
+		Used to make the api call to generate the image, or to take the one made while the script was reviewed
 		"""
-
-		# prepare the form data
-		form_data = aiohttp.FormData()
-		form_data.add_field("prompt", description +", high quality, realistic, visually engaging, modern, cinematic lighting, professional, clean background, epic composition", content_type="text/plain; charset=utf-8")
-		form_data.add_field("aspect_ratio", "9:16", content_type="text/plain; charset=utf-8")
-		form_data.add_field("output_format", "png", content_type="text/plain; charset=utf-8")
-
-		# call the api async
-		async with aiohttp.ClientSession() as session:
-			async with session.post(
-				"https://api.stability.ai/v2beta/stable-image/generate/core",
-				headers={
-					"authorization": f"Bearer {self._ai_generator_api_key}",
-					"accept": "image/*"
-				},
-				data=form_data
-			) as response:
-				if response.status == 200:
-					image_data = await response.read()
-					output_path = f"{self._output_path[1]}/visuals/final_images/image_{download_name}.png"
-					output_path = os.path.expanduser(output_path)
-					print(output_path)
-					with open(output_path, 'wb') as file:
-						file.write(image_data)
-					print(f"{Fore.GREEN}Successfully saved image {download_name}{Style.RESET_ALL}")
-				else:
-					error_text = await response.text()
-					print(f"{Fore.RED}Error generating image: {error_text}{Style.RESET_ALL}")
-					raise Exception(error_text)
+		image_data = await self._speculated.adopt_async(speculation.key("image", description)) if self._speculated else None
+		if image_data is None:
+			image_data = await request_image(description, download_name)
+		output_path = f"{self._output_path[1]}/visuals/final_images/image_{download_name}.png"
+		output_path = os.path.expanduser(output_path)
+		print(output_path)
+		with open(output_path, 'wb') as file:
+			file.write(image_data)
+		print(f"{Fore.GREEN}Successfully saved image {download_name}{Style.RESET_ALL}")
 	
 	async def orchastrate_image_getting(self) -> None:
 		"""
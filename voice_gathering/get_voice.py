@@ -1,16 +1,31 @@
 import os
 import subprocess
-from elevenlabs.client import ElevenLabs
+from typing import Iterable
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
 from colorama import Fore, Style
+from pipeline.slots import heavy_slot
+from pipeline import tracing
+from pipeline.clients import elevenlabs_client
+from voice_gathering.key_pool import key_pool
+from pipeline import speculation
 
 # Load environment variables from .env file
 load_dotenv()
 
+# How many sentences of a streamed script are converted at the same time
+TTS_CONCURRENCY = int(os.environ.get("SHORTAUTOMATION_TTS_CONCURRENCY", "3"))
+
 class VoiceCaller:
-	def __init__(self, script_to_voices: list[str], output_paths: list[str]) -> None:
+	def __init__(self, script_to_voices: list[str], output_paths: list[str], speculated: speculation.Speculation = None) -> None:
+		"""
+		:param script_to_voices: paths of the scripts
+		:param output_paths: where the voice of every script is saved
+		:param speculated: the voices made while the scripts were reviewed, see speculate_voice
+		"""
 		self._script_to_voices = script_to_voices
 		self._output_paths = output_paths
+		self._speculated = speculated
 	
 	def cut_silence(self, input_path: str, output_path: str) -> None:
 		"""
@@ -26,67 +41,132 @@ class VoiceCaller:
 			output_path
 		]
 		try:
-			subprocess.run(command, check=True)
+			with heavy_slot():
+				tracing.run(command, check=True)
 		except subprocess.CalledProcessError as e:
 			print(f"\nFailed to remove silence from {input_path}.")
 		print(f"\nSilence removed: {input_path} -> {output_path}")
 
-	# This function will convert the text to speech using the Eleven Labs API
-	def get_voice(self) -> None:
-
-		# Cycle through all API keys and check for validity
-		api_keys = [os.getenv('ELEVEN_LABS_API_1'), os.getenv('ELEVEN_LABS_API_2'), os.getenv('ELEVEN_LABS_API_3'), os.getenv('ELEVEN_LABS_API_4'), os.getenv('ELEVEN_LABS_API_5')]
-		valid_api_keys = [key for key in api_keys if key]
-		if not valid_api_keys:
-			raise ValueError(Fore.RED + "Eleven Labs API key not found. Please set the ELEVEN_LABS_API_X environment variables." + Style.RESET_ALL)
-
-		# Cycle trough all the keys and try each one of them until one works (needed if you only use the free api keys)
-		for script, output_path in zip(self._script_to_voices, self._output_paths):
-			failed_api_keys = 0
-			with open(os.path.expanduser(script), "r") as file:
-				file_content = file.read()
-			for api_key in valid_api_keys:
-				client = ElevenLabs(api_key=api_key)
-				try:
+	def _convert(self, text: str, previous_text: str = None) -> bytes:
+		"""
+		Convert one text to speech with the healthiest API key of the pool (see key_pool.py), a rate limited or exhausted key
+		is left out and the next one is tried (needed if you only use the free api keys)
+		:param text: the text
+		:param previous_text: the text spoken right before it, so a sentence of a streamed script sounds like a continuation
+		:return: the mp3 audio
+		"""
+		pool = key_pool()
+		options = {"previous_text": previous_text} if previous_text else {}
+		for _ in range(pool.attempts()):
+			api_key = pool.acquire(len(text))
+			client = elevenlabs_client(api_key.key)
+			try:
+				# The audio is streamed while the chunks are collected, so the span covers both
+				with tracing.span("elevenlabs.convert", "api", characters=len(text), key=api_key.name) as info:
 					audio_generator = client.text_to_speech.convert(
 						voice_id= "TX3LPaxmHKxFdv7VOQHJ", # this is the voice of Liam
 						output_format="mp3_44100_128",
-						text=file_content,
+						text=text,
 						model_id="eleven_multilingual_v2",
-						voice_settings={"stability": 1.0, "similarity_boost": 0.25, "style": 0.1}
+						voice_settings={"stability": 1.0, "similarity_boost": 0.25, "style": 0.1},
+						**options
 					)
-					# Save the audio content to a file
-					expanded_output_path = os.path.expanduser(output_path)
-					with open(expanded_output_path, 'wb') as audio_file:
-						for chunk in audio_generator:
-							audio_file.write(chunk)
-					print(Fore.GREEN + f"\nAudio saved to {output_path} using API key: {api_key}" + Style.RESET_ALL)
-					break
-				except Exception as e:
-					if e.status_code == 429:
-						print(Fore.YELLOW + f"\nAPI key limit exceeded for {api_key} (429). Trying next key." + Style.RESET_ALL)
-						failed_api_keys += 1
-						continue
-					elif e.status_code == 401:
-						print(Fore.YELLOW + f"\nThe API key {api_key} is exhausted. No urgent action needed, fallback to other API keys!" + Style.RESET_ALL)
-						failed_api_keys += 1
-						continue
-					elif e.status_code == 422:
-						raise ValueError(Fore.RED + "\nThe text provided is invalid. Please check the text and try again." + Style.RESET_ALL) from e
-					else:
-						raise ValueError(Fore.RED + "\nAn unidentified error occurred while trying to convert the text to speech. Please try again later." + Style.RESET_ALL) from e
+					audio = b"".join(audio_generator)
+					info["bytes_received"] = len(audio)
+			except Exception as e:
+				pool.release(api_key, len(text), e)
+				status_code = getattr(e, "status_code", None)
+				if status_code == 429:
+					print(Fore.YELLOW + f"\nAPI key limit exceeded for {api_key.name} (429). Trying next key." + Style.RESET_ALL)
+					continue
+				elif status_code == 401:
+					print(Fore.YELLOW + f"\nThe API key {api_key.name} is exhausted. No urgent action needed, fallback to other API keys!" + Style.RESET_ALL)
+					continue
+				elif status_code == 422:
+					raise ValueError(Fore.RED + "\nThe text provided is invalid. Please check the text and try again." + Style.RESET_ALL) from e
+				else:
+					raise ValueError(Fore.RED + "\nAn unidentified error occurred while trying to convert the text to speech. Please try again later." + Style.RESET_ALL) from e
+			pool.release(api_key, len(text))
+			print(Fore.GREEN + f"\nAudio generated using API key: {api_key.name}" + Style.RESET_ALL)
+			return audio
+
+		# If the keys kept returning 429 errors
+		raise ValueError(Fore.RED + "\nAll API keys are rate limited! Make a new API key or wait." + Style.RESET_ALL)
 
-			# If all keys returned a 429 error
-			if (failed_api_keys == len(valid_api_keys)):
-				raise ValueError(Fore.RED + "\nAll API keys are exhausted! Make a new API key or wait." + Style.RESET_ALL)
+	def _clean(self, output_path: str) -> None:
+		"""
+		Remove the silence of a generated file into cleaned_<name> and delete the generated file
+		"""
+		expanded_output_path = os.path.expanduser(output_path)
+		cleaned_filename = f"cleaned_{os.path.basename(expanded_output_path)}"
+		expanded_cleaned_output_path = os.path.join(os.path.dirname(expanded_output_path), cleaned_filename)
+		self.cut_silence(expanded_output_path, expanded_cleaned_output_path)
+	
+		# After successfully processing and creating the cleaned file:
+		if os.path.exists(expanded_output_path):
+			os.remove(expanded_output_path)
+			print(Fore.GREEN + f"\nDeleted original file: {expanded_output_path}" + Style.RESET_ALL)
+
+	def _voice(self, script: str, output_path: str) -> None:
+		"""
+		Generate the voice of one script and remove its silence
+		"""
+		with open(os.path.expanduser(script), "r") as file:
+			file_content = file.read()
+
+		# Take the voice that was made while the script was reviewed, if the script was accepted as it was
+		audio = self._speculated.adopt(speculation.key("voice", file_content)) if self._speculated else None
+		if audio is not None:
+			print(Fore.GREEN + "\nThe voice was already made during the review." + Style.RESET_ALL)
+		else:
+			audio = self._convert(file_content)
+
+		# Save the audio content to a file
+		with open(os.path.expanduser(output_path), 'wb') as audio_file:
+			audio_file.write(audio)
+		print(Fore.GREEN + f"\nAudio saved to {output_path}" + Style.RESET_ALL)
+
+		# Remove silence for each generated file
+		self._clean(output_path)
+
+	# This function will convert the text to speech using the Eleven Labs API, all scripts at the same time
+	def get_voice(self) -> None:
+		with ThreadPoolExecutor(max_workers=max(len(self._script_to_voices), 1)) as executor:
+			futures = [tracing.submit_in_context(executor, self._voice, script, output_path) for script, output_path in zip(self._script_to_voices, self._output_paths)]
+			for future in futures:
+				future.result()
+
+	def get_voice_streamed(self, sentences: Iterable[str]) -> None:
+		"""
+		Convert the sentences of a script while it is still generated, every sentence is sent as soon as it arrives and the
+		audio of all sentences is joined in their order into the first output path
+		:param sentences: the sentences in the order they are spoken, e.g. GPTCaller.stream_sentences
+		:return:
+		"""
+		output_path = self._output_paths[0]
+		futures = []
+		spoken = []
+		with ThreadPoolExecutor(max_workers=TTS_CONCURRENCY) as executor:
+			for sentence in sentences:
+				futures.append(tracing.submit_in_context(executor, self._convert, sentence, " ".join(spoken[-2:])))
+				spoken.append(sentence)
+			if not futures:
+				raise ValueError(Fore.RED + "\nThe streamed script was empty." + Style.RESET_ALL)
 
+			# MP3 frames can be joined as they are, the silence removal encodes the file again anyway
+			with open(os.path.expanduser(output_path), 'wb') as audio_file:
+				for future in futures:
+					audio_file.write(future.result())
+		print(Fore.GREEN + f"\nAudio of {len(futures)} streamed sentence(s) saved to {output_path}" + Style.RESET_ALL)
+		self._clean(output_path)
 
-			# Remove silence for each generated file
-			cleaned_filename = f"cleaned_{os.path.basename(expanded_output_path)}"
-			expanded_cleaned_output_path = os.path.join(os.path.dirname(expanded_output_path), cleaned_filename)
-			self.cut_silence(expanded_output_path, expanded_cleaned_output_path)
-		
-			# After successfully processing and creating the cleaned file:
-			if os.path.exists(expanded_output_path):
-				os.remove(expanded_output_path)
-				print(Fore.GREEN + f"\nDeleted original file: {expanded_output_path}" + Style.RESET_ALL)
+def speculate_voice(speculated: speculation.Speculation, script: str) -> list[str]:
+	"""
+	Start the voice of a script that is still reviewed, VoiceCaller.get_voice adopts it if the script is accepted as it is
+	:param speculated: the speculation of the job
+	:param script: the proposed script
+	:return: the keys of the started calls
+	"""
+	result_key = speculation.key("voice", script)
+	speculated.start(result_key, VoiceCaller([], [])._convert, script)
+	return [result_key]
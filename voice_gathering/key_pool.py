@@ -0,0 +1,140 @@
+import os
+import re
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from colorama import Fore, Style
+from pipeline import tracing
+from pipeline.clients import elevenlabs_client
+
+# Every ElevenLabs API key (ELEVEN_LABS_API_1, ELEVEN_LABS_API_2, ...) with the characters that are left of its quota and
+# until when it is rate limited. A conversion goes to the healthy key with the most characters left, so no request waits
+# behind a key that is exhausted or rate limited and no request is sent to a key whose quota is too small for the text
+KEY_ENV = re.compile(r"ELEVEN_LABS_API_(\d+)$")
+COOLDOWN_S = float(os.environ.get("SHORTAUTOMATION_TTS_COOLDOWN_S", "30"))
+
+class ApiKey:
+	"""
+	One API key and what the pool knows about it
+	"""
+	def __init__(self, name: str, key: str) -> None:
+		self.name = name
+		self.key = key
+		# None while the quota is unknown (e.g. the key may not read its subscription), then it is only learned from a 401
+		self.remaining = None
+		self.reset_at = None
+		self.cooldown_until = 0.0
+		self.exhausted = False
+		self.in_flight = 0
+
+def api_keys() -> list[ApiKey]:
+	"""
+	Every ElevenLabs API key that is set, in the order of their numbers
+	"""
+	keys = sorted((int(match.group(1)), name) for name in os.environ if (match := KEY_ENV.match(name)) and os.environ[name])
+	if not keys:
+		raise ValueError(Fore.RED + "Eleven Labs API key not found. Please set the ELEVEN_LABS_API_X environment variables." + Style.RESET_ALL)
+	return [ApiKey(name, os.environ[name]) for _, name in keys]
+
+def _retry_after(error: Exception) -> float:
+	"""
+	The Retry-After of an API error in seconds, None if the answer has none
+	"""
+	try:
+		return float((getattr(error, "headers", None) or {}).get("retry-after"))
+	except (TypeError, ValueError):
+		return None
+
+class KeyPool:
+	"""
+	The API keys of the process, shared by every language, every sentence of a streamed script and every job of the worker
+	"""
+	def __init__(self, keys: list[ApiKey]) -> None:
+		self._keys = keys
+		self._condition = threading.Condition()
+		# The quota of all keys is read at the same time, once per process
+		with ThreadPoolExecutor(max_workers=len(keys)) as executor:
+			for future in [tracing.submit_in_context(executor, self._read_quota, api_key) for api_key in keys]:
+				future.result()
+
+	def _read_quota(self, api_key: ApiKey) -> None:
+		try:
+			with tracing.span("elevenlabs.subscription", "api", key=api_key.name):
+				subscription = elevenlabs_client(api_key.key).user.subscription.get()
+			api_key.remaining = subscription.character_limit - subscription.character_count
+			api_key.reset_at = subscription.next_character_count_reset_unix
+		except Exception as e:
+			print(Fore.YELLOW + f"\nThe quota of {api_key.name} is unknown ({e}), it is used until it is exhausted." + Style.RESET_ALL)
+
+	def _usable(self, api_key: ApiKey, characters: int, now: float) -> bool:
+		# A new month gives the key its quota back
+		if api_key.reset_at is not None and now >= api_key.reset_at:
+			api_key.remaining, api_key.reset_at, api_key.exhausted = None, None, False
+		return not api_key.exhausted and (api_key.remaining is None or api_key.remaining >= characters)
+
+	def acquire(self, characters: int) -> ApiKey:
+		"""
+		Take the key for one conversion, wait if every usable key is rate limited
+		:param characters: the length of the text, reserved from the quota of the key
+		:return: the key, give it back with release
+		"""
+		with self._condition:
+			while True:
+				now = time.time()
+				usable = [api_key for api_key in self._keys if self._usable(api_key, characters, now)]
+				if not usable:
+					raise ValueError(Fore.RED + "\nAll API keys are exhausted! Make a new API key or wait." + Style.RESET_ALL)
+				ready = [api_key for api_key in usable if api_key.cooldown_until <= now]
+				if ready:
+					# The least busy key with the most characters left, keys with an unknown quota after the known ones
+					api_key = min(ready, key=lambda api_key: (api_key.in_flight, api_key.remaining is None, -(api_key.remaining or 0)))
+					if api_key.remaining is not None:
+						api_key.remaining -= characters
+					api_key.in_flight += 1
+					return api_key
+				self._condition.wait(min(api_key.cooldown_until for api_key in usable) - now)
+
+	def release(self, api_key: ApiKey, characters: int, error: Exception = None) -> None:
+		"""
+		Give a key back after its conversion
+		:param api_key: the key of acquire
+		:param characters: the characters that were reserved
+		:param error: the error of the conversion, None if it worked. A 429 rate limits the key, a 401 means it is exhausted,
+			the reserved characters are given back if nothing was converted
+		:return:
+		"""
+		status_code = getattr(error, "status_code", None)
+		with self._condition:
+			api_key.in_flight -= 1
+			if error is not None and api_key.remaining is not None:
+				api_key.remaining += characters
+			if status_code == 429:
+				api_key.cooldown_until = time.time() + (_retry_after(error) or COOLDOWN_S)
+			elif status_code == 401:
+				api_key.exhausted = True
+			self._condition.notify_all()
+
+	def attempts(self) -> int:
+		"""
+		How often a conversion is tried before it gives up, every key may be rate limited twice
+		"""
+		return 2 * len(self._keys) + 1
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+def key_pool() -> KeyPool:
+	"""
+	The pool of the API keys that are set, created once per process (a new one if the keys change)
+	"""
+	keys = api_keys()
+	signature = tuple((api_key.name, api_key.key) for api_key in keys)
+	with _pools_lock:
+		pool = _pools.get(signature)
+	if pool is not None:
+		return pool
+	# The quotas are read outside the lock, so a slow quota request never stops the conversions of a pool that exists.
+	# If two threads build the first pool at the same time, the pool of the first one is used by both
+	pool = KeyPool(keys)
+	with _pools_lock:
+		return _pools.setdefault(signature, pool)
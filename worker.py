@@ -0,0 +1,319 @@
+import os
+import sys
+import json
+import time
+import queue
+import shutil
+import signal
+import socket
+import argparse
+import tempfile
+import itertools
+import threading
+import traceback
+import contextvars
+import socketserver
+from pathlib import Path
+from pipeline import tracing
+from pipeline.slots import HEAVY_SLOTS_ENV, SLOT_DIR_ENV
+from subtitles_gathering.subtitles import WHISPER_IN_PROCESS_ENV
+from colorama import Fore, Style, init
+
+# Initialize colorama
+init()
+
+# The worker keeps one interpreter with its imports, HTTP connections, OAuth clients and the whisper model warm
+# and runs the jobs of master.py (or of `python3 worker.py submit`) in it instead of starting main.py for every block
+REPO_ROOT = Path(__file__).resolve().parent
+SOCKET_ENV = "SHORTAUTOMATION_WORKER_SOCKET"
+DEFAULT_SOCKET = os.environ.get(SOCKET_ENV, os.path.join(tempfile.gettempdir(), "shortautomation_worker.sock"))
+
+# The log file of the job that runs in the current context, the stage threads of the job inherit it
+_job_output = contextvars.ContextVar("job_output", default=None)
+
+class _RoutedStream:
+	"""
+	Replaces sys.stdout and sys.stderr of the worker, what a job prints goes into the log file of the job
+	"""
+	def __init__(self, stream) -> None:
+		self._stream = stream
+
+	def write(self, text: str) -> int:
+		return (_job_output.get() or self._stream).write(text)
+
+	def flush(self) -> None:
+		(_job_output.get() or self._stream).flush()
+
+	def __getattr__(self, name: str):
+		return getattr(self._stream, name)
+
+class Job:
+	"""
+	One run of main.py inside the worker
+	"""
+	def __init__(self, job_id: int, argv: list[str], log_path: Path) -> None:
+		self.id = job_id
+		self.argv = argv
+		self.log_path = log_path
+		self.state = "queued"
+		self.exit_code = None
+		self.submitted = time.time()
+		self.started = None
+		self.finished = None
+		self.done = threading.Event()
+
+	def to_dict(self) -> dict:
+		return {
+			"id": self.id,
+			"argv": self.argv,
+			"log": str(self.log_path),
+			"state": self.state,
+			"exit_code": self.exit_code,
+			"queued_s": round((self.started or time.time()) - self.submitted, 3),
+			"run_s": round((self.finished or time.time()) - self.started, 3) if self.started else None,
+		}
+
+class Worker:
+	"""
+	Runs the submitted jobs with a fixed number of threads, every job is main.main() with the arguments of the job
+	"""
+	def __init__(self, jobs: int, log_dir: Path) -> None:
+		"""
+		:param jobs: how many jobs run at the same time
+		:param log_dir: where the output of every job is written
+		"""
+		self._log_dir = log_dir
+		self._queue = queue.Queue()
+		self._jobs = {}
+		self._ids = itertools.count(1)
+		self._lock = threading.Lock()
+		self._threads = [threading.Thread(target=self._loop, daemon=True) for _ in range(max(1, jobs))]
+		self.started = time.time()
+
+	def start(self) -> None:
+		for thread in self._threads:
+			thread.start()
+
+	def submit(self, argv: list[str], log_path: str = None) -> Job:
+		"""
+		Queue a job, nobody can answer prompts in the worker so every job runs headless
+		:param argv: the arguments of main.py
+		:param log_path: where the output of the job is written, a file in the log directory if not given
+		:return: the queued job
+		"""
+		if not argv:
+			raise ValueError("A job needs at least the arguments of main.py.")
+		if "--headless" not in argv:
+			argv = [*argv, "--headless"]
+		with self._lock:
+			job_id = next(self._ids)
+			log_path = Path(log_path).expanduser() if log_path else self._log_dir / f"{job_id}_{Path(argv[0]).expanduser().name}.log"
+			job = Job(job_id, argv, log_path)
+			self._jobs[job_id] = job
+		self._queue.put(job)
+		return job
+
+	def get(self, job_id: int) -> Job:
+		with self._lock:
+			if job_id not in self._jobs:
+				raise ValueError(f"Unknown job: {job_id}")
+			return self._jobs[job_id]
+
+	def status(self) -> dict:
+		"""
+		Queue depth, the running jobs and how the finished ones ended
+		:return: the status of the worker
+		"""
+		with self._lock:
+			jobs = list(self._jobs.values())
+		return {
+			"pid": os.getpid(),
+			"uptime_s": round(time.time() - self.started, 1),
+			"threads": len(self._threads),
+			"queue_depth": sum(1 for job in jobs if job.state == "queued"),
+			"running": [job.to_dict() for job in jobs if job.state == "running"],
+			"finished": [job.to_dict() for job in jobs if job.state == "finished"],
+		}
+
+	def handle(self, request: dict) -> dict:
+		"""
+		Answer one request of a client
+		:param request: {"cmd": "submit", "argv": [...], "log": optional}, {"cmd": "status"} or {"cmd": "wait", "id": 1, "timeout": optional}
+		:return: the answer, {"error": "..."} if the request is invalid
+		"""
+		try:
+			command = request.get("cmd")
+			if command == "submit":
+				return self.submit(list(request.get("argv") or []), request.get("log")).to_dict()
+			if command == "status":
+				return self.status()
+			if command == "wait":
+				job = self.get(int(request["id"]))
+				job.done.wait(request.get("timeout"))
+				return job.to_dict()
+			raise ValueError(f"Unknown command: {command}")
+		except (ValueError, KeyError, TypeError) as e:
+			return {"error": str(e)}
+
+	def _loop(self) -> None:
+		while True:
+			job = self._queue.get()
+			# Every job gets a fresh context so its log file and tracer do not leak into the next job of this thread
+			contextvars.Context().run(self._run, job)
+
+	def _run(self, job: Job) -> None:
+		import main
+
+		job.state = "running"
+		job.started = time.time()
+		print(Fore.GREEN + f"\nJob {job.id} started: main.py {' '.join(job.argv)}" + Style.RESET_ALL)
+		job.log_path.parent.mkdir(parents=True, exist_ok=True)
+		with open(job.log_path, "w", buffering=1) as log_file:
+			token = _job_output.set(log_file)
+			tracing.use_tracer(tracing.Tracer())
+			try:
+				main.main(job.argv)
+				exit_code = 0
+			except SystemExit as e:
+				exit_code = e.code if isinstance(e.code, int) else (0 if e.code is None else 1)
+			except Exception:
+				traceback.print_exc()
+				exit_code = 1
+			finally:
+				_job_output.reset(token)
+		job.exit_code = exit_code
+		job.finished = time.time()
+		job.state = "finished"
+		job.done.set()
+		color = Fore.GREEN if exit_code == 0 else Fore.RED
+		print(color + f"\nJob {job.id} finished with exit code {exit_code} after {job.finished - job.started:.1f}s." + Style.RESET_ALL)
+
+class _RequestHandler(socketserver.StreamRequestHandler):
+	"""
+	Every line a client sends is one JSON request, every answer is one JSON line
+	"""
+	def handle(self) -> None:
+		for line in self.rfile:
+			try:
+				answer = self.server.worker.handle(json.loads(line))
+			except json.JSONDecodeError as e:
+				answer = {"error": f"Invalid request: {e}"}
+			self.wfile.write((json.dumps(answer) + "\n").encode())
+
+class _Server(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+	daemon_threads = True
+
+def request(socket_path: str, message: dict) -> dict:
+	"""
+	Send one request to a running worker
+	:param socket_path: the socket of the worker
+	:param message: the request, see Worker.handle
+	:return: the answer of the worker
+	"""
+	with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as connection:
+		connection.connect(os.path.expanduser(socket_path))
+		connection.sendall((json.dumps(message) + "\n").encode())
+		with connection.makefile("r") as answers:
+			answer = json.loads(answers.readline())
+	if "error" in answer:
+		raise RuntimeError(answer["error"])
+	return answer
+
+def serve(options: argparse.Namespace) -> None:
+	"""
+	Run the worker until SIGINT or SIGTERM
+	:param options: the parsed arguments of `worker.py serve`
+	:return:
+	"""
+	# main.py reads its data (music, tokens, ...) relative to the repository like when master.py starts it
+	os.chdir(REPO_ROOT)
+	sys.path.insert(0, str(REPO_ROOT))
+	os.environ[WHISPER_IN_PROCESS_ENV] = "1"
+
+	# The jobs share the heavy slots like the blocks of master.py, the slots are lock files so threads can hold them too
+	slot_dir = tempfile.mkdtemp(prefix="shortautomation_slots_")
+	os.environ[HEAVY_SLOTS_ENV] = str(max(1, options.heavy_workers))
+	os.environ[SLOT_DIR_ENV] = slot_dir
+
+	# Import main.py once, every job reuses the imported modules and the clients in pipeline/clients.py
+	import main  # noqa: F401
+	sys.stdout = _RoutedStream(sys.stdout)
+	sys.stderr = _RoutedStream(sys.stderr)
+
+	socket_path = os.path.expanduser(options.socket)
+	if os.path.exists(socket_path):
+		try:
+			request(socket_path, {"cmd": "status"})
+			print(Fore.RED + f"\nA worker is already listening on {socket_path}." + Style.RESET_ALL)
+			sys.exit(1)
+		except (ConnectionRefusedError, FileNotFoundError):
+			os.unlink(socket_path)
+
+	worker = Worker(options.jobs, Path(options.log_dir).expanduser())
+	server = _Server(socket_path, _RequestHandler)
+	server.worker = worker
+	signal.signal(signal.SIGTERM, lambda sig, frame: sys.exit(0))
+	worker.start()
+	print(Fore.GREEN + f"\nWorker listening on {socket_path} with {options.jobs} job(s) at a time." + Style.RESET_ALL)
+	try:
+		server.serve_forever()
+	except KeyboardInterrupt:
+		pass
+	finally:
+		print(Fore.GREEN + "\nStopping the worker." + Style.RESET_ALL)
+		server.server_close()
+		if os.path.exists(socket_path):
+			os.unlink(socket_path)
+		shutil.rmtree(slot_dir, ignore_errors=True)
+
+def main() -> None:
+	parser = argparse.ArgumentParser(description="Long-lived worker that runs main.py jobs in one warm process")
+	parser.add_argument("--socket", default=DEFAULT_SOCKET, help=f"socket of the worker (default {DEFAULT_SOCKET}, or ${SOCKET_ENV})")
+	commands = parser.add_subparsers(dest="command", required=True)
+
+	serve_parser = commands.add_parser("serve", help="start the worker")
+	serve_parser.add_argument("--jobs", type=int, default=2, help="how many jobs run at the same time")
+	serve_parser.add_argument("--heavy-workers", type=int, default=1, help="how many ffmpeg/whisper heavy steps may run at the same time across all jobs")
+	serve_parser.add_argument("--log-dir", default="logs", help="where the output of every job is written")
+
+	submit_parser = commands.add_parser("submit", help="queue a job, the arguments are the ones of main.py")
+	submit_parser.add_argument("--wait", action="store_true", help="wait until the job finished and exit with its exit code")
+	submit_parser.add_argument("argv", nargs=argparse.REMAINDER, help="arguments of main.py")
+
+	commands.add_parser("status", help="print the queue depth, the running and the finished jobs")
+
+	wait_parser = commands.add_parser("wait", help="wait until a job finished and exit with its exit code")
+	wait_parser.add_argument("id", type=int, help="id of the job")
+
+	options = parser.parse_args()
+	if options.command == "serve":
+		serve(options)
+		return
+
+	try:
+		if options.command == "status":
+			print(json.dumps(request(options.socket, {"cmd": "status"}), indent=1))
+			return
+		if options.command == "submit":
+			argv = options.argv[1:] if options.argv[:1] == ["--"] else options.argv
+			job = request(options.socket, {"cmd": "submit", "argv": argv})
+			print(Fore.GREEN + f"\nJob {job['id']} queued, its output is written to {job['log']}" + Style.RESET_ALL)
+			if not options.wait:
+				return
+			job_id = job["id"]
+		else:
+			job_id = options.id
+		job = request(options.socket, {"cmd": "wait", "id": job_id})
+	except (ConnectionRefusedError, FileNotFoundError):
+		print(Fore.RED + f"\nNo worker is listening on {options.socket}, start one with: python3 worker.py serve" + Style.RESET_ALL)
+		sys.exit(1)
+	except RuntimeError as e:
+		print(Fore.RED + f"\n{e}" + Style.RESET_ALL)
+		sys.exit(1)
+
+	color = Fore.GREEN if job["exit_code"] == 0 else Fore.RED
+	print(color + f"\nJob {job['id']} finished with exit code {job['exit_code']}." + Style.RESET_ALL)
+	sys.exit(job["exit_code"])
+
+if __name__ == "__main__":
+	main()
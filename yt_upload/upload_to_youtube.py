@@ -1,47 +1,100 @@
 import os
 import time
+import threading
 import pathlib
 import subprocess
 from colorama import Fore, Style
 from pathlib import Path
-from openai import OpenAI
 import google_auth_httplib2
 import google_auth_oauthlib
+import google_auth_oauthlib.flow
+import google.auth.credentials
+import google.auth.exceptions
+import google.auth.transport.requests
+import google.oauth2.credentials
 import googleapiclient.discovery
 import datetime
 import googleapiclient.errors
 import googleapiclient.http
 from dotenv import load_dotenv
+from pipeline.console import console_lock
+from pipeline.languages import Language
+from pipeline import tracing
+from pipeline import llm
+from info_gathering.gpt_rewrite import read_extras
 
 #load the env variabled
 load_dotenv()
 
 SCOPES = ["https://www.googleapis.com/auth/youtube.upload"]
-TOKEN_FILE = 'token.json'
+TOKEN_DIR = pathlib.Path(__file__).resolve().parent / "tokens"
+
+# Authenticated clients per client json, kept for the whole process so the worker (worker.py) logs in only once
+_youtube_services = {}
+_youtube_services_lock = threading.Lock()
 
 class YoutubeUploader:
-    def __init__(self, output_path: str, name_of_client_json: list[str], script: str) -> None:
+    def __init__(self, output_path: str, name_of_client_json: list[str], scripts: list[str], languages: list[Language], publish_in_days: int = None) -> None:
         self._output_path = output_path
+        self._publish_in_days = publish_in_days
         self._name_of_client_json = name_of_client_json
-        self._script = script
+        self._scripts = scripts
+        self._languages = languages
     
     def authenticate_youtube(self, client_json_path: str, port_input: int):
         """
-        Authenticate on youtube with google acc
+        Authenticate on youtube with google acc, the client is reused for every later upload of the process
         """
-        flow = google_auth_oauthlib.flow.InstalledAppFlow.from_client_secrets_file(
-            os.path.join(pathlib.Path().resolve() / "yt_upload/youtube_jsons" / client_json_path),
-            scopes=["https://www.googleapis.com/auth/youtube.upload"]
-        )
-        flow.redirect_uri = "http://localhost:" + str(port_input) + "/"
-        credentials = flow.run_local_server(port=port_input)
+        with _youtube_services_lock:
+            if client_json_path not in _youtube_services:
+                _youtube_services[client_json_path] = self._build_youtube_service(client_json_path, port_input)
+            return _youtube_services[client_json_path]
+
+    def _build_youtube_service(self, client_json_path: str, port_input: int):
+        """
+        Log in and build the youtube client.
+        The token is saved per client json, so only the first upload of a channel needs the browser.
+        """
+        # A local stand-in of the API (used by the benchmarks) needs no login
+        api_endpoint = os.environ.get("YOUTUBE_API_ENDPOINT")
+        if api_endpoint:
+            return googleapiclient.discovery.build(
+                "youtube", "v3",
+                credentials=google.auth.credentials.AnonymousCredentials(),
+                client_options={"api_endpoint": api_endpoint}
+            )
+
+        token_path = TOKEN_DIR / f"{pathlib.Path(client_json_path).stem}.json"
+        credentials = None
+        if token_path.exists():
+            credentials = google.oauth2.credentials.Credentials.from_authorized_user_file(str(token_path), SCOPES)
+            if not credentials.valid and credentials.expired and credentials.refresh_token:
+                try:
+                    credentials.refresh(google.auth.transport.requests.Request())
+                except google.auth.exceptions.RefreshError:
+                    credentials = None
+
+        # Without a usable token the user has to log in once in the browser
+        if credentials is None or not credentials.valid:
+            flow = google_auth_oauthlib.flow.InstalledAppFlow.from_client_secrets_file(
+                os.path.join(pathlib.Path().resolve() / "yt_upload/youtube_jsons" / client_json_path),
+                scopes=SCOPES
+            )
+            flow.redirect_uri = "http://localhost:" + str(port_input) + "/"
+            credentials = flow.run_local_server(port=port_input)
+        TOKEN_DIR.mkdir(parents=True, exist_ok=True)
+        token_path.write_text(credentials.to_json())
         return googleapiclient.discovery.build("youtube", "v3", credentials=credentials)
     
     def get_future_date(self) -> str:
         """
         Prompts the user for input between 0 and 6, where 0 represents today
         and 6 represents one week from today. Returns the corresponding date.
+        In the headless mode the offset of the job is used instead.
         """
+        if self._publish_in_days is not None:
+            return datetime.date.today() + datetime.timedelta(days=min(max(self._publish_in_days, 0), 6))
+
         while True:
             try:
                 days_input = input("Enter a number between 0 and 6 (0 for today, 6 for one week from today): ")
@@ -57,27 +110,32 @@ class YoutubeUploader:
                 today = datetime.date.today()
                 return today
 
-    def upload_video(self, youtube, language, mp4_name) -> None:
+    def upload_video(self, youtube, language, mp4_name, script_path) -> str:
         """
         Uploads the video to youtube
+        :return: the id of the uploaded video
         """
-        client = OpenAI()
-        get_upload_date = self.get_future_date()
-        script = Path(os.path.expanduser(self._script)).read_text()
-        completion = client.chat.completions.create(
-            model="gpt-4o-mini-2024-07-18",
-            messages=[
+        with console_lock:
+            if self._publish_in_days is None:
+                print(Fore.GREEN + f"\nWhen should the {language} video be published?" + Style.RESET_ALL)
+            get_upload_date = self.get_future_date()
+        script = Path(os.path.expanduser(script_path)).read_text()
+        # The title was usually generated together with the script
+        title = read_extras(script_path).get("title") or llm.chat(
+            [
                 {"role": "system", "content": "Sie sind ein professioneller Autor und haben die Aufgabe, den folgenden Text sachlich neu zu verfassen."},
                 {
                     "role": "user",
                     "content": script + f"\n\n-Fasse das Skript in eine interessante Überschrift zusammen. Der Text sollte nicht laenger als 10 Wörter sein. Es muss in der Sprache {language} sein!"
                 }
-            ]
+            ],
+            "title",
+            language=language
         )
         request_body = {
             "snippet": {
                 "categoryId": "24",
-                "title": completion.choices[0].message.content,
+                "title": title,
                 "description": "",
                 "tags": ["shorts", "trending", "viral", "fyp", "breakingnews", "historyfacts","worldnews", "currentevents", "politicalnews", "headlines", "dailyupdate","historylovers", "didyouknow", "historybuff", "onthisday","traveltips", "travelvlog", "hiddenplaces", "amazingdestinations"]
             },
@@ -101,22 +159,24 @@ class YoutubeUploader:
         # Upload the video
         response = None 
         while response is None:
-            status, response = request.next_chunk()
+            with tracing.span("youtube.next_chunk", "api", language=language, file_bytes=os.path.getsize(media_file)):
+                status, response = request.next_chunk()
             if status:
                 print(Fore.GREEN + f"\nUpload progress: {int(status.progress()*100)}%" + Style.RESET_ALL)
                 time.sleep(2)
             print(Fore.GREEN + f"\nVideo succesfully uploaded with ID: {response['id']}" + Style.RESET_ALL)
+        return response['id']
 
-    def upload_to_youtube(self) -> None:
+    def upload_to_youtube(self) -> list[str]:
         """
         Upload the output files to YouTube.
+        :return: the ids of the uploaded videos
         """
         print(Fore.GREEN + f"\nUploading output files to YouTube" + Style.RESET_ALL)
+        video_ids = []
 
-        languages = ["german", "english"]
-        mp4_names = ["german_video.mp4", "english_video.mp4"]
-        ports = [8081, 8080]
-        for i, (account, language, mp4_name, port) in enumerate(zip(self._name_of_client_json, languages, mp4_names, ports)):
-            print(Fore.GREEN + f"\nUpload started for video {i + 1} of {len(languages)}." + Style.RESET_ALL)
-            youtube = self.authenticate_youtube(account, port)
-            self.upload_video(youtube, language, mp4_name)
+        for i, (account, language, script_path) in enumerate(zip(self._name_of_client_json, self._languages, self._scripts)):
+            print(Fore.GREEN + f"\nUpload started for video {i + 1} of {len(self._languages)}." + Style.RESET_ALL)
+            youtube = self.authenticate_youtube(account, language.upload_port)
+            video_ids.append(self.upload_video(youtube, language.name, f"{language.name}_video.mp4", script_path))
+        return video_ids